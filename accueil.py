@@ -0,0 +1,24 @@
+"""
+Point d'entrée unique : les cinq assistants dans un seul processus Streamlit.
+
+    streamlit run accueil.py
+
+Toutes les pages partagent le même moteur (un seul index, une seule instance
+de chaque modèle d'embedding), ce qui permet de tout héberger sur une petite instance.
+Une page peut aussi être lancée seule, depuis le dépôt complet (elle importe le
+paquet `moteur` de la racine) : `streamlit run comprendre-paie/app.py`. Sur Streamlit
+Cloud, choisir ce fichier comme point d'entrée ; le requirements.txt du dossier, copie
+de celui de la racine, est alors utilisé. Un dossier 'comprendre-*' copié sans `moteur`
+ne fonctionne plus.
+"""
+import streamlit as st
+
+pages = [
+    st.Page("comprendre-impots/app.py", title="Mes Impôts", icon="🏛️", url_path="impots", default=True),
+    st.Page("comprendre-paie/app.py", title="Ma Paie", icon="💡", url_path="paie"),
+    st.Page("comprendre-chomage/app.py", title="Mon Chômage", icon="💼", url_path="chomage"),
+    st.Page("comprendre-logement/app.py", title="Mon Logement", icon="🏠", url_path="logement"),
+    st.Page("comprendre-aides-caf/app.py", title="Mes Aides CAF", icon="🏦", url_path="caf"),
+]
+
+st.navigation(pages).run()
@@ -1,17 +1,15 @@
 import os
 import sys
 
-# --- 1. CORRECTIF POUR LE CLOUD (Obligatoire pour Linux/Streamlit Cloud) ---
-try:
-    __import__('pysqlite3')
-    sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
-except ImportError:
-    pass 
-
 import streamlit as st
-import google.generativeai as genai
-import chromadb
-import time
+
+# --- 1. MOTEUR PARTAGÉ (dossier 'moteur' à la racine du dépôt) ---
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from moteur import api_google, obtenir_moteur
+from moteur.interface import (
+    afficher_en_flux, afficher_historique, etat_du_moteur, historique_de_session, session_courante,
+    signaler_erreur, suivi_de_file,
+)
 
 # --- 2. CONFIGURATION DE LA PAGE ---
 st.set_page_config(page_title="Comprendre Mes Impôts", page_icon="🏛️", layout="centered")
@@ -36,144 +34,69 @@ with st.sidebar:
         api_key = st.text_input("Entrez votre clé API Google", type="password")
     
     if api_key:
-        genai.configure(api_key=api_key)
+        # Le SDK Google n'est importé qu'en arrière-plan, au préchauffage
+        api_google.configurer(api_key)
 
     st.info("ℹ️ **Note :** Cet assistant couvre les régimes courants (Salariés, Retraités, Micro-Entrepreneurs). Pour les montages complexes (Sociétés IS, Holding), consultez un expert-comptable.")
 
+    # Latence perçue : délai entre la question et le premier mot de la réponse
+    ttft = obtenir_moteur().stats_premier_fragment("impots")
+    if ttft:
+        st.caption(f"⏱️ Premier mot en {ttft['p50']:.2f} s (médiane), {ttft['p95']:.2f} s (p95) sur {ttft['n']} réponses")
+
 if not api_key:
     st.warning("⬅️ Veuillez configurer votre clé API pour commencer.")
     st.stop()
 
-# --- 4. LE CERVEAU (Base de données vectorielle) ---
-@st.cache_resource(show_spinner=False)
-def charger_cerveau():
-    client = chromadb.Client()
-    # On change de version pour forcer l'intégration du fichier Micro-Entrepreneur
-    nom_collection = "impots_expert_v5_final" 
-
-    try:
-        client.delete_collection(nom_collection)
-    except:
-        pass
-    
-    collection = client.create_collection(nom_collection)
-
-    # --- LE CORRECTIF GPS ---
-    # Permet de trouver les fichiers .txt même si l'app est lancée depuis ailleurs
-    dossier_actuel = os.path.dirname(os.path.abspath(__file__))
-    
-    try:
-        tous_les_fichiers = [f for f in os.listdir(dossier_actuel) if f.endswith('.txt')]
-    except FileNotFoundError:
-        return None
-    
-    if not tous_les_fichiers:
-        return None
-
-    docs_globaux = []
-    ids_globaux = []
-    compteur = 0
-    
-    # Lecture et découpage
-    for fichier in tous_les_fichiers:
-        chemin_complet = os.path.join(dossier_actuel, fichier)
-        
-        with open(chemin_complet, "r", encoding="utf-8") as f:
-            contenu = f.read()
-        
-        taille_bloc = 1000
-        chevauchement = 100
-        
-        for i in range(0, len(contenu), taille_bloc - chevauchement):
-            morceau = contenu[i : i + taille_bloc]
-            if len(morceau.strip()) > 10:
-                docs_globaux.append(f"Source [{fichier}] : {morceau}")
-                ids_globaux.append(f"doc_{compteur}")
-                compteur += 1
-
-    if not docs_globaux:
-        return None
-
-    # Vectorisation (Embedding)
-    embeddings = []
-    total = len(docs_globaux)
-    barre = st.progress(0, text=f"Analyse des règles fiscales ({total} extraits)...")
-    
-    modele_embedding = "models/text-embedding-004"
-
-    for i, doc in enumerate(docs_globaux):
-        try:
-            res = genai.embed_content(model=modele_embedding, content=doc, task_type="retrieval_document")
-            embeddings.append(res['embedding'])
-            time.sleep(0.05) # Rapide car quota illimité
-        except:
-            pass
-        barre.progress(min((i + 1) / total, 1.0))
-    
-    barre.empty()
-    
-    if len(embeddings) > 0:
-        collection.add(documents=docs_globaux, ids=ids_globaux, embeddings=embeddings)
-        return collection
-    return None
+# --- 4. LE CERVEAU (Base de données vectorielle, construite en arrière-plan) ---
+# L'interface s'affiche tout de suite ; seule une question posée avant la fin attend l'index
+moteur = obtenir_moteur()
+moteur.prechauffer("impots")
+etat_du_moteur(moteur, "impots")
 
 # --- 5. INTERFACE DE CHAT ---
-with st.spinner("Initialisation de l'expert fiscal..."):
-    db = charger_cerveau()
-
-if db:
+etat_index = moteur.etats["impots"]["etat"]
+if etat_index == "pret":
     st.success("✅ Assistant prêt à répondre (Salariés & Micro-Entrepreneurs) !")
-else:
+elif etat_index in ("vide", "erreur"):
     st.error("❌ Aucun document trouvé. Vérifiez la présence des fichiers .txt dans le dossier 'comprendre-impots'.")
+else:
+    st.info("⏳ L'expert fiscal termine sa préparation : vous pouvez déjà poser votre question.")
 
-# Historique de conversation
-if "messages" not in st.session_state:
-    st.session_state.messages = [{"role": "assistant", "content": "Bonjour ! Je suis à jour des barèmes 2025. Une question sur votre avis ou votre statut d'indépendant ?"}]
-
-for msg in st.session_state.messages:
-    icone = "🏛️" if msg["role"] == "assistant" else "👤"
-    st.chat_message(msg["role"], avatar=icone).write(msg["content"])
+# Historique de conversation (seuls les derniers messages sont redessinés à chaque interaction)
+historique = historique_de_session("impots", "Bonjour ! Je suis à jour des barèmes 2025. Une question sur votre avis ou votre statut d'indépendant ?")
+afficher_historique(historique, avatars={"assistant": "🏛️", "user": "👤"})
 
 # Zone de saisie
 if question := st.chat_input("Votre question (ex: Je suis auto-entrepreneur, comment déclarer ?..."):
-    st.session_state.messages.append({"role": "user", "content": question})
+    historique.ajouter("user", question)
     st.chat_message("user", avatar="👤").write(question)
 
+    # N'attend que si l'index est encore en préparation
+    with st.spinner("Initialisation de l'expert fiscal..."):
+        try:
+            db = moteur.attendre("impots")
+        except Exception as e:
+            db = None
+            signaler_erreur("Une erreur technique est survenue", "impots", e, etape="index")
+
     if db:
         try:
-            # 1. Recherche RAG
-            q_vec = genai.embed_content(model="models/text-embedding-004", content=question, task_type="retrieval_query")
-            res = db.query(query_embeddings=[q_vec['embedding']], n_results=5)
-            
-            if res['documents'] and res['documents'][0]:
-                contexte = "\n\n".join(res['documents'][0])
-                
-                # 2. Prompt Expert & Pédagogue
-                prompt = f"""Tu es un Expert Fiscaliste Pédagogue (Assistant DGFiP).
-                Ta mission : Aider le contribuable à comprendre son impôt 2025 (sur revenus 2024).
-
-                RÈGLES D'OR :
-                1. Base tes réponses UNIQUEMENT sur le contexte fourni.
-                2. Si on te demande un calcul, utilise le barème 2025 du contexte.
-                3. Pour les Micro-Entrepreneurs : sois très vigilant à distinguer le régime "Classique" (Abattement forfaitaire) du "Versement Libératoire".
-                4. Sois clair, pédagogique et rassurant.
-                5. Rappelle toujours que tu donnes une estimation informative.
-                
-                CONTEXTE DOCUMENTAIRE :
-                {contexte}
-                
-                QUESTION DU CONTRIBUABLE : {question}"""
-                
-                # --- LE MOTEUR ---
-                model = genai.GenerativeModel('models/gemini-2.0-flash-exp')
-                
-                reponse = model.generate_content(prompt)
-                
-                st.chat_message("assistant", avatar="🏛️").write(reponse.text)
-                st.session_state.messages.append({"role": "assistant", "content": reponse.text})
+            # Cache sémantique → Recherche RAG → Prompt Expert → Gemini (tout est dans le moteur)
+            # Une question quasi identique à une question déjà traitée est servie sans appel à Gemini
+            fragments = moteur.repondre(
+                "impots", question, stream=True, session=session_courante(), en_attente=suivi_de_file()
+            )
+
+            if fragments is not None:
+                # Affichage au fil de l'eau, comme les autres assistants
+                with st.chat_message("assistant", avatar="🏛️"):
+                    reponse = afficher_en_flux(st.empty(), fragments, "impots")
+
+                historique.ajouter("assistant", reponse)
             else:
                 st.warning("Je n'ai pas trouvé cette information précise dans ma base documentaire (Fichiers textes).")
         
         # C'est cette partie qui manquait probablement :
         except Exception as e:
-            st.error(f"Une erreur technique est survenue : {e}")
\ No newline at end of file
+            signaler_erreur("Une erreur technique est survenue", "impots", e)
\ No newline at end of file
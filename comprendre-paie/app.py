@@ -1,17 +1,15 @@
 import os
 import sys
 
-# --- 1. CORRECTIF CLOUD ---
-try:
-    __import__('pysqlite3')
-    sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
-except ImportError:
-    pass 
-
 import streamlit as st
-import google.generativeai as genai
-import chromadb
-import time
+
+# --- 1. MOTEUR PARTAGÉ (dossier 'moteur' à la racine du dépôt) ---
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from moteur import api_google, obtenir_moteur
+from moteur.interface import (
+    afficher_en_flux, afficher_historique, etat_du_moteur, historique_de_session, session_courante,
+    signaler_erreur, suivi_de_file,
+)
 
 # --- 2. CONFIG PAGE ---
 st.set_page_config(page_title="Comprendre Ma Paie", page_icon="💡", layout="centered")
@@ -33,127 +31,63 @@ with st.sidebar:
         api_key = st.text_input("Clé API Google", type="password")
     
     if api_key:
-        genai.configure(api_key=api_key)
+        # Le SDK Google n'est importé qu'en arrière-plan, au préchauffage
+        api_google.configurer(api_key)
+
+    # Latence perçue : délai entre la question et le premier mot de la réponse
+    ttft = obtenir_moteur().stats_premier_fragment("paie")
+    if ttft:
+        st.caption(f"⏱️ Premier mot en {ttft['p50']:.2f} s (médiane), {ttft['p95']:.2f} s (p95) sur {ttft['n']} réponses")
 
 if not api_key:
     st.warning("⬅️ Veuillez configurer votre clé API.")
     st.stop()
 
-# --- 4. LE CERVEAU (GPS INTÉGRÉ) ---
-@st.cache_resource(show_spinner=False)
-def charger_cerveau():
-    client = chromadb.Client()
-    nom_collection = "paie_expert_v6_fix" # Nouvelle version
-
-    try:
-        client.delete_collection(nom_collection)
-    except:
-        pass
-    
-    collection = client.create_collection(nom_collection)
-
-    # --- LE CORRECTIF GPS (Cherche DANS le dossier comprendre-paie) ---
-    dossier_actuel = os.path.dirname(os.path.abspath(__file__))
-    
-    try:
-        tous_les_fichiers = [f for f in os.listdir(dossier_actuel) if f.endswith('.txt')]
-    except FileNotFoundError:
-        return None
-
-    if not tous_les_fichiers:
-        return None
-
-    docs_globaux = []
-    ids_globaux = []
-    compteur = 0
-    
-    # Lecture des fichiers
-    for fichier in tous_les_fichiers:
-        chemin_complet = os.path.join(dossier_actuel, fichier)
-        with open(chemin_complet, "r", encoding="utf-8") as f:
-            contenu = f.read()
-        
-        taille_bloc = 1000
-        chevauchement = 100
-        
-        for i in range(0, len(contenu), taille_bloc - chevauchement):
-            morceau = contenu[i : i + taille_bloc]
-            if len(morceau.strip()) > 10:
-                docs_globaux.append(f"Source [{fichier}] : {morceau}")
-                ids_globaux.append(f"doc_{compteur}")
-                compteur += 1
-
-    if not docs_globaux:
-        return None
-
-    # Vectorisation
-    embeddings = []
-    total = len(docs_globaux)
-    barre = st.progress(0, text=f"Analyse des règles de paie ({total} extraits)...")
-    modele_embedding = "models/text-embedding-004"
-
-    for i, doc in enumerate(docs_globaux):
-        try:
-            res = genai.embed_content(model=modele_embedding, content=doc, task_type="retrieval_document")
-            embeddings.append(res['embedding'])
-            time.sleep(0.05)
-        except:
-            pass
-        barre.progress(min((i + 1) / total, 1.0))
-    
-    barre.empty()
-    
-    if len(embeddings) > 0:
-        collection.add(documents=docs_globaux, ids=ids_globaux, embeddings=embeddings)
-        return collection
-    return None
+# --- 4. LE CERVEAU (GPS INTÉGRÉ, construit en arrière-plan) ---
+# L'interface s'affiche tout de suite ; seule une question posée avant la fin attend l'index
+moteur = obtenir_moteur()
+moteur.prechauffer("paie")
+etat_du_moteur(moteur, "paie")
 
 # --- 5. CHAT ---
-with st.spinner("Initialisation de l'expert paie..."):
-    db = charger_cerveau()
-
-if db:
+etat_index = moteur.etats["paie"]["etat"]
+if etat_index == "pret":
     st.success("✅ Assistant Paie opérationnel !")
-else:
+elif etat_index in ("vide", "erreur"):
     st.error("❌ Erreur : Fichiers .txt introuvables dans le dossier 'comprendre-paie'.")
+else:
+    st.info("⏳ L'expert paie termine sa préparation : vous pouvez déjà poser votre question.")
 
-if "messages" not in st.session_state:
-    st.session_state.messages = [{"role": "assistant", "content": "Bonjour ! Je suis l'expert Paie. Une ligne de votre bulletin vous intrigue ?"}]
-
-for msg in st.session_state.messages:
-    icone = "👔" if msg["role"] == "assistant" else "👤"
-    st.chat_message(msg["role"], avatar=icone).write(msg["content"])
+historique = historique_de_session("paie", "Bonjour ! Je suis l'expert Paie. Une ligne de votre bulletin vous intrigue ?")
+afficher_historique(historique, avatars={"assistant": "👔", "user": "👤"})
 
 if question := st.chat_input("Votre question sur la paie..."):
-    st.session_state.messages.append({"role": "user", "content": question})
+    historique.ajouter("user", question)
     st.chat_message("user", avatar="👤").write(question)
 
+    # N'attend que si l'index est encore en préparation
+    with st.spinner("Initialisation de l'expert paie..."):
+        try:
+            db = moteur.attendre("paie")
+        except Exception as e:
+            db = None
+            signaler_erreur("Une erreur technique est survenue", "paie", e, etape="index")
+
     if db:
         try:
-            # RAG
-            q_vec = genai.embed_content(model="models/text-embedding-004", content=question, task_type="retrieval_query")
-            res = db.query(query_embeddings=[q_vec['embedding']], n_results=5)
-            
-            if res['documents'] and res['documents'][0]:
-                contexte = "\n\n".join(res['documents'][0])
-                
-                # Prompt Expert
-                prompt = f"""Tu es un Expert Paie Pédagogue.
-                Réponds à la question en utilisant les barèmes officiels ci-dessous.
-                Sois précis sur les chiffres (Taux 2025) et clair dans l'explication.
-                
-                CONTEXTE :
-                {contexte}
-                
-                QUESTION : {question}"""
-                
-                # Moteur Stable
-                model = genai.GenerativeModel('models/gemini-2.0-flash-exp')
-                reponse = model.generate_content(prompt)
-                
-                st.chat_message("assistant", avatar="👔").write(reponse.text)
-                st.session_state.messages.append({"role": "assistant", "content": reponse.text})
+            # Cache sémantique → Recherche RAG → Prompt Expert → Gemini (tout est dans le moteur)
+            # Une question quasi identique à une question déjà traitée est servie sans appel à Gemini
+            fragments = moteur.repondre(
+                "paie", question, stream=True, session=session_courante(), en_attente=suivi_de_file()
+            )
+
+            if fragments is not None:
+                # Affichage au fil de l'eau, comme les autres assistants
+                with st.chat_message("assistant", avatar="👔"):
+                    reponse = afficher_en_flux(st.empty(), fragments, "paie")
+
+                historique.ajouter("assistant", reponse)
             else:
                 st.warning("Je n'ai pas l'info dans mes fiches.")
         except Exception as e:
-            st.error(f"Erreur : {e}")
\ No newline at end of file
+            signaler_erreur("Erreur", "paie", e)
\ No newline at end of file
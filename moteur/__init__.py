@@ -0,0 +1,3 @@
+"""Moteur partagé des assistants « Comprendre ... » (indexation, recherche, génération)."""
+from .coeur import Moteur, obtenir_moteur
+from .domaines import DOMAINES, Domaine
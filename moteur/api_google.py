@@ -0,0 +1,36 @@
+"""
+Accès différé au SDK Google (`google.generativeai`), dont l'import est lent :
+les apps enregistrent seulement la clé, le module est importé et configuré au
+premier appel réel (en pratique pendant le préchauffage, en arrière-plan).
+"""
+import threading
+
+_cle = None
+_cle_configuree = None
+_substitut = None
+_verrou = threading.Lock()
+
+
+def configurer(api_key):
+    global _cle
+    _cle = api_key
+
+
+def remplacer(substitut):
+    """Remplace le SDK par un objet de même interface (banc d'essai hors ligne), ou le rétablit avec None."""
+    global _substitut
+    _substitut = substitut
+
+
+def genai():
+    """Le module `google.generativeai`, configuré avec la dernière clé enregistrée."""
+    global _cle_configuree
+    if _substitut is not None:
+        return _substitut
+    import google.generativeai as genai
+
+    with _verrou:
+        if _cle and _cle != _cle_configuree:
+            genai.configure(api_key=_cle)
+            _cle_configuree = _cle
+    return genai
@@ -0,0 +1,177 @@
+"""
+Artefact d'index préconstruit, partagé par tous les processus d'une machine.
+
+Construction hors ligne (une fois par déploiement, pas à chaque démarrage) :
+
+    GOOGLE_API_KEY=... python -m moteur.artefact [domaine ...] [--sortie artefacts]
+
+Pour chaque domaine, on écrit `artefacts/<domaine>/<version>/` :
+- `extraits.jsonl` : texte et métadonnées de chaque extrait ;
+- `embeddings.npy` : matrice des vecteurs normalisés (une ligne par extrait), en float32
+  ou en float16 selon le modèle d'embedding (`dtype_stockage`) ;
+- `manifest.json`  : modèle d'embedding, dimension, empreintes du corpus et des fichiers.
+Le fichier `artefacts/<domaine>/COURANT` désigne la version active.
+
+Au démarrage, les apps ouvrent `embeddings.npy` en mmap lecture seule : pas de calcul
+d'embedding, et les pages mémoire sont partagées entre tous les processus.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+
+from . import api_google, index
+from .domaines import DOMAINES
+from .embeddings import obtenir_embeddings
+from .ingestion import RapportIngestion
+from .recherche import IndexNumpy, _Instantane
+
+journal = logging.getLogger(__name__)
+
+DOSSIER_ARTEFACTS = os.environ.get("MOTEUR_ARTEFACTS", os.path.join(index.RACINE, "artefacts"))
+
+
+def _empreinte_fichier(chemin):
+    somme = hashlib.sha256()
+    with open(chemin, "rb") as f:
+        while bloc := f.read(index.TAILLE_LECTURE):
+            somme.update(bloc)
+    return somme.hexdigest()
+
+
+def construire(nom, sortie=DOSSIER_ARTEFACTS, progression=None):
+    """Vectorise le corpus du domaine et écrit une nouvelle version de l'artefact. Renvoie son dossier."""
+    domaine = DOMAINES[nom]
+    empreinte_corpus = index.empreinte_ids(
+        index.ids_dossier(domaine.chemin, domaine.fichiers, domaine.decoupage, domaine.modele_embedding)
+    )
+    version = empreinte_corpus[:12]
+    dossier = os.path.join(sortie, nom, version)
+    if os.path.exists(os.path.join(dossier, "manifest.json")):
+        # Corpus inchangé : la version existe déjà (et peut être ouverte en mmap par des processus en
+        # service), on ne la réécrit pas
+        journal.info("%s : version %s déjà construite", nom, version)
+        _basculer(sortie, nom, version)
+        return dossier
+
+    embeddings = obtenir_embeddings(domaine.modele_embedding)
+
+    memoire = IndexNumpy(dtype=embeddings.dtype_stockage)
+    rapport = RapportIngestion()
+    extraits = index.iterer_extraits(domaine.chemin, domaine.fichiers, domaine.decoupage, rapport)
+    _, echecs = index.synchroniser(memoire, extraits, embeddings, progression, rapport)
+    if echecs:
+        raise RuntimeError(f"{nom} : {echecs} extraits non vectorisés, artefact non écrit")
+
+    etat = memoire._etat
+    # Écriture dans un dossier temporaire, renommé une fois complet : une version n'est jamais
+    # visible (ni ouverte en mmap) à moitié écrite
+    temporaire = f"{dossier}.{os.getpid()}.tmp"
+    shutil.rmtree(temporaire, ignore_errors=True)
+    os.makedirs(temporaire)
+
+    np.save(os.path.join(temporaire, "embeddings.npy"), np.ascontiguousarray(etat.matrice))
+    with open(os.path.join(temporaire, "extraits.jsonl"), "w", encoding="utf-8") as f:
+        for id_doc, texte, meta in zip(etat.ids, etat.documents, etat.metadatas):
+            f.write(json.dumps({"id": id_doc, "texte": texte, "meta": meta}, ensure_ascii=False) + "\n")
+
+    fichiers = sorted({meta["source"] for meta in etat.metadatas})
+    manifest = {
+        "domaine": nom,
+        "version": version,
+        "modele_embedding": domaine.modele_embedding,
+        "decoupage": domaine.decoupage,
+        "dimension": int(etat.matrice.shape[1]),
+        "dtype": str(etat.matrice.dtype),
+        "nb_extraits": len(etat.ids),
+        "empreinte_corpus": empreinte_corpus,
+        "fichiers": {f: _empreinte_fichier(os.path.join(domaine.chemin, f)) for f in fichiers},
+        "construit_le": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+    with open(os.path.join(temporaire, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    try:
+        os.replace(temporaire, dossier)
+    except OSError:
+        # Version construite entre-temps par un autre processus (dossier non vide) : on garde la sienne
+        shutil.rmtree(temporaire, ignore_errors=True)
+        if not os.path.exists(os.path.join(dossier, "manifest.json")):
+            raise
+    _basculer(sortie, nom, version)
+    return dossier
+
+
+def _basculer(sortie, nom, version):
+    # Bascule atomique vers la version
+    courant = os.path.join(sortie, nom, "COURANT")
+    with open(f"{courant}.tmp", "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(f"{courant}.tmp", courant)
+
+
+def ouvrir(nom, modele, empreinte_corpus, dossier=DOSSIER_ARTEFACTS):
+    """
+    Index en lecture seule (matrice en mmap) depuis la version courante de l'artefact,
+    ou None s'il n'existe pas ou ne correspond plus au corpus / au modèle.
+    """
+    try:
+        with open(os.path.join(dossier, nom, "COURANT"), "r", encoding="utf-8") as f:
+            version = f.read().strip()
+        chemin = os.path.join(dossier, nom, version)
+        with open(os.path.join(chemin, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        a_jour = manifest["modele_embedding"] == modele and manifest["empreinte_corpus"] == empreinte_corpus
+    except (OSError, ValueError, KeyError, TypeError):
+        # Artefact absent, illisible ou manifest incomplet : index reconstruit localement
+        return None
+
+    if not a_jour:
+        journal.warning("Artefact %s/%s périmé (corpus ou modèle modifié) : reconstruction locale", nom, version)
+        return None
+
+    ids, documents, metadatas = [], [], []
+    try:
+        with open(os.path.join(chemin, "extraits.jsonl"), "r", encoding="utf-8") as f:
+            for ligne in f:
+                e = json.loads(ligne)
+                ids.append(e["id"])
+                documents.append(e["texte"])
+                metadatas.append(e["meta"])
+        matrice = np.load(os.path.join(chemin, "embeddings.npy"), mmap_mode="r")
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        journal.warning("Artefact %s/%s illisible (%s) : reconstruction locale", nom, version, e)
+        return None
+    if len(matrice) != len(ids):
+        journal.warning("Artefact %s/%s incohérent (%d vecteurs, %d extraits) : reconstruction locale",
+                        nom, version, len(matrice), len(ids))
+        return None
+
+    artefact = IndexNumpy(dtype=matrice.dtype)
+    artefact._etat = _Instantane(ids, documents, metadatas, matrice)
+    return artefact
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Construit les artefacts d'index des assistants.")
+    parser.add_argument("domaines", nargs="*", default=list(DOMAINES), help="par défaut : tous")
+    parser.add_argument("--sortie", default=DOSSIER_ARTEFACTS)
+    args = parser.parse_args(argv)
+
+    api_google.configurer(os.environ.get("GOOGLE_API_KEY"))
+
+    for nom in args.domaines:
+        debut = time.perf_counter()
+        dossier = construire(nom, args.sortie)
+        print(f"{nom} : {dossier} ({time.perf_counter() - debut:.1f} s)")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,279 @@
+"""
+Banc d'essai hors ligne : mesure ce qu'un changement fait à la latence, sans réseau
+ni clé API. Les API Google et les modèles d'embedding locaux sont remplacés par les
+doublures de `moteur.faux_google` (débits et erreurs réglables).
+
+    python -m moteur.banc [domaine ...] [--index numpy] [--repetitions 5] [--premier-token 0.4]
+
+Pour chaque domaine :
+- démarrage à froid (découpage + vectorisation + indexation, index vide) et débit d'ingestion ;
+- démarrage à chaud (même index, nouveau moteur) ;
+- p50 / p95 / p99 de chaque étape d'une question : embedding, recherche, prompt,
+  premier fragment, génération complète, total ; taille des prompts envoyés.
+
+`--contexte prefixe|cache` compare le mode « corpus entier » (voir `moteur.contexte_complet`)
+au RAG classique ; `--latence-token-prompt` simule le coût de lecture du prompt.
+
+Les résultats sont écrits dans `resultats-banc/banc-<date>-<commit>.json`, et une ligne
+de synthèse est ajoutée à `resultats-banc/historique.jsonl` pour comparer les commits.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import replace
+
+import numpy as np
+
+from . import api_google, embeddings, index
+from .domaines import DOMAINES
+from .faux_google import FauxEmbeddings, FauxGenai
+from .metriques import estimer_tokens
+
+journal = logging.getLogger(__name__)
+
+DOSSIER_RESULTATS = os.path.join(index.RACINE, "resultats-banc")
+
+QUESTIONS = {
+    "impots": [
+        "Comment est calculé le prélèvement à la source ?",
+        "Je suis auto-entrepreneur, comment déclarer mon chiffre d'affaires ?",
+        "Combien de parts pour un couple marié avec deux enfants ?",
+        "Quelles dépenses donnent droit à un crédit d'impôt ?",
+    ],
+    "paie": [
+        "Pourquoi mon salaire net est-il inférieur au brut ?",
+        "Quel est le taux de la CSG déductible ?",
+        "À quoi correspond la cotisation vieillesse plafonnée ?",
+        "Comment sont payées les heures supplémentaires ?",
+    ],
+    "chomage": [
+        "Combien de temps faut-il avoir travaillé pour toucher le chômage ?",
+        "Comment est calculé le montant de l'allocation ?",
+        "Qu'est-ce que le différé d'indemnisation congés payés ?",
+        "Combien de temps vais-je être indemnisé ?",
+    ],
+    "logement": [
+        "Quel est le préavis pour quitter un logement meublé ?",
+        "Dans quel délai le propriétaire doit-il rendre le dépôt de garantie ?",
+        "Qui paie le remplacement du chauffe-eau ?",
+        "Mon loyer respecte-t-il l'encadrement des loyers ?",
+    ],
+    "caf": [
+        "Ai-je droit à la prime d'activité ?",
+        "Quel est le montant du RSA pour une personne seule ?",
+        "Quelles ressources déclarer à la CAF ?",
+        "Comment est calculée l'APL ?",
+    ],
+}
+
+ETAPES = ("embedding_requete", "recherche", "prompt", "premier_fragment", "generation", "total")
+
+
+def centiles(valeurs):
+    """Résumé d'une série de durées (secondes)."""
+    if not valeurs:
+        return {"n": 0}
+    v = np.asarray(valeurs, dtype=np.float64)
+    p50, p95, p99 = np.percentile(v, [50, 95, 99])
+    return {"n": len(v), "moyenne": float(v.mean()), "p50": float(p50), "p95": float(p95), "p99": float(p99),
+            "max": float(v.max())}
+
+
+def version_du_code():
+    """Commit courant (abrégé) et présence de modifications locales non commitées."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=index.RACINE,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        modifie = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=index.RACINE,
+                                      capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, modifie
+
+
+def installer_doublures(latence_embedding=0.0, latence_embedding_locale=0.0, premier_token=0.0, tokens_par_s=1000.0,
+                        tokens_reponse=120, latence_token_prompt=0.0, erreurs_embedding=0.0, erreurs_generation=0.0,
+                        graine=0):
+    """Remplace le SDK Google et les modèles d'embedding locaux par les doublures du banc."""
+    faux = FauxGenai(
+        latence_embedding=latence_embedding, premier_token=premier_token, tokens_par_s=tokens_par_s,
+        tokens_reponse=tokens_reponse, latence_token_prompt=latence_token_prompt, taux_erreur_embedding=erreurs_embedding,
+        taux_erreur_generation=erreurs_generation, graine=graine,
+    )
+    api_google.remplacer(faux)
+    locaux = {}
+    for domaine in DOMAINES.values():
+        modele = domaine.modele_embedding
+        if not modele.startswith("models/") and modele not in locaux:
+            locaux[modele] = FauxEmbeddings(
+                modele, latence_appel=latence_embedding_locale, taux_erreur=erreurs_embedding, graine=graine
+            )
+            embeddings.remplacer(modele, locaux[modele])
+    return faux, locaux
+
+
+def mesurer_domaine(nom, args, dossier_index):
+    from .coeur import Moteur
+
+    domaine = DOMAINES[nom]
+    modele = embeddings.obtenir_embeddings(domaine.modele_embedding)
+
+    # Démarrage à froid : index vide, tout le corpus est vectorisé
+    moteur = Moteur(dossier_index=dossier_index, backend=args.index)
+    debut = time.perf_counter()
+    collection, echecs = moteur.charger(nom)
+    froid = time.perf_counter() - debut
+    if collection is None:
+        return {"erreur": "index vide"}
+    nb_extraits = collection.count()
+    caracteres = sum(len(t) for t, _ in index.decouper_dossier(domaine.chemin, domaine.fichiers, domaine.decoupage))
+
+    # Démarrage à chaud : même index sur disque, nouveau moteur
+    debut = time.perf_counter()
+    Moteur(dossier_index=dossier_index, backend=args.index).charger(nom)
+    chaud = time.perf_counter() - debut
+
+    durees = {etape: [] for etape in ETAPES}
+    tokens_prompt = []
+    erreurs = {}
+    for _ in range(args.repetitions):
+        for question in QUESTIONS.get(nom, []):
+            etape = "embedding_requete"
+            try:
+                t0 = time.perf_counter()
+                q_vec = modele.vectoriser_requete(question)
+                t1 = time.perf_counter()
+                if domaine.contexte != "rag":
+                    # Corpus entier en contexte : pas de recherche (None : repli sur le RAG)
+                    etape = "prompt"
+                    t2 = t1
+                    prompt = moteur.contexte_complet(nom).prompt(question)
+                if domaine.contexte == "rag" or prompt is None:
+                    etape = "recherche"
+                    docs = collection.rechercher(q_vec, question, domaine.n_results)
+                    t2 = time.perf_counter()
+                    etape = "prompt"
+                    prompt = moteur.construire_prompt(nom, "\n\n".join(docs), question)
+                t3 = time.perf_counter()
+                etape = "generation"
+                premier = None
+                for _fragment in moteur.generer_fragments(nom, prompt):
+                    if premier is None:
+                        premier = time.perf_counter()
+                t4 = time.perf_counter()
+            except Exception as e:
+                erreurs[etape] = erreurs.get(etape, 0) + 1
+                journal.debug("%s / %s : %s", nom, etape, e)
+                continue
+            durees["embedding_requete"].append(t1 - t0)
+            durees["recherche"].append(t2 - t1)
+            durees["prompt"].append(t3 - t2)
+            durees["premier_fragment"].append((premier or t4) - t3)
+            durees["generation"].append(t4 - t3)
+            durees["total"].append(t4 - t0)
+            tokens_prompt.append(estimer_tokens(prompt))
+
+    return {
+        "modele_embedding": domaine.modele_embedding,
+        "contexte": domaine.contexte,
+        "demarrage_froid_s": froid,
+        "demarrage_chaud_s": chaud,
+        "ingestion": {
+            "extraits": nb_extraits,
+            "caracteres": caracteres,
+            "echecs": echecs,
+            "extraits_par_s": nb_extraits / froid if froid else None,
+            "caracteres_par_s": caracteres / froid if froid else None,
+        },
+        "etapes": {etape: centiles(valeurs) for etape, valeurs in durees.items()},
+        "tokens_prompt": centiles(tokens_prompt),
+        "erreurs": erreurs,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc d'essai hors ligne des assistants (API Google simulées).")
+    parser.add_argument("domaines", nargs="*", default=list(DOMAINES), help="par défaut : tous")
+    parser.add_argument("--index", choices=("chroma", "numpy"), default=os.environ.get("MOTEUR_INDEX", "chroma"))
+    parser.add_argument("--repetitions", type=int, default=5, help="passages sur les questions de chaque domaine")
+    parser.add_argument("--premier-token", type=float, default=0.4, help="délai avant le premier fragment (s)")
+    parser.add_argument("--tokens-par-s", type=float, default=80.0)
+    parser.add_argument("--tokens-reponse", type=int, default=120)
+    parser.add_argument("--latence-token-prompt", type=float, default=0.00002, help="lecture du prompt, par token (s)")
+    parser.add_argument("--contexte", choices=("rag", "prefixe", "cache"), help="par défaut : celui de chaque domaine")
+    parser.add_argument("--latence-embedding", type=float, default=0.05, help="par appel embed_content (s)")
+    parser.add_argument("--latence-embedding-locale", type=float, default=0.0, help="par lot du modèle local (s)")
+    parser.add_argument("--erreurs-embedding", type=float, default=0.0, help="probabilité d'échec par appel")
+    parser.add_argument("--erreurs-generation", type=float, default=0.0, help="probabilité d'échec par appel")
+    parser.add_argument("--graine", type=int, default=0)
+    parser.add_argument("--sortie", default=DOSSIER_RESULTATS)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="banc-") as temporaire:
+        # Jamais d'artefact préconstruit : le démarrage à froid doit tout recalculer
+        os.environ["MOTEUR_ARTEFACTS"] = os.path.join(temporaire, "artefacts")
+        faux, locaux = installer_doublures(
+            latence_embedding=args.latence_embedding, latence_embedding_locale=args.latence_embedding_locale,
+            premier_token=args.premier_token, tokens_par_s=args.tokens_par_s, tokens_reponse=args.tokens_reponse,
+            latence_token_prompt=args.latence_token_prompt, erreurs_embedding=args.erreurs_embedding,
+            erreurs_generation=args.erreurs_generation, graine=args.graine,
+        )
+        if args.contexte:
+            for nom in args.domaines:
+                DOMAINES[nom] = replace(DOMAINES[nom], contexte=args.contexte)
+
+        debut = time.perf_counter()
+        resultats = {}
+        for nom in args.domaines:
+            resultats[nom] = mesurer_domaine(nom, args, os.path.join(temporaire, nom))
+            print(f"{nom} : froid {resultats[nom].get('demarrage_froid_s', 0):.2f} s, "
+                  f"total p50 {resultats[nom].get('etapes', {}).get('total', {}).get('p50', 0):.3f} s")
+        duree = time.perf_counter() - debut
+
+    commit, modifie = version_du_code()
+    rapport = {
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "modifications_locales": modifie,
+        "python": platform.python_version(),
+        "plateforme": platform.platform(),
+        "parametres": {k: v for k, v in vars(args).items() if k != "sortie"},
+        "duree_s": duree,
+        "appels": {
+            "embed_content": faux.embeddings.appels,
+            "generate_content": faux.generations,
+            "tokens_prompt": faux.tokens_prompt,
+            "contextes_crees": faux.creations_contexte,
+            "embeddings_locaux": sum(f.appels for f in locaux.values()),
+        },
+        "domaines": resultats,
+    }
+
+    os.makedirs(args.sortie, exist_ok=True)
+    chemin = os.path.join(args.sortie, f"banc-{time.strftime('%Y%m%d-%H%M%S')}-{commit or 'inconnu'}.json")
+    with open(chemin, "w", encoding="utf-8") as f:
+        json.dump(rapport, f, ensure_ascii=False, indent=2)
+
+    synthese = {"date": rapport["date"], "commit": commit, "modifications_locales": modifie, "index": args.index,
+                "contexte": args.contexte}
+    for nom, r in resultats.items():
+        synthese[nom] = {
+            "froid_s": r.get("demarrage_froid_s"),
+            "chaud_s": r.get("demarrage_chaud_s"),
+            **{f"{etape}_p95": r.get("etapes", {}).get(etape, {}).get("p95") for etape in ("recherche", "total")},
+        }
+    with open(os.path.join(args.sortie, "historique.jsonl"), "a", encoding="utf-8") as f:
+        f.write(json.dumps(synthese, ensure_ascii=False) + "\n")
+
+    print(f"Résultats : {chemin}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
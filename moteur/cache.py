@@ -0,0 +1,59 @@
+"""Cache LRU borné avec durée de vie (TTL) et compteurs de succès / échecs."""
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+def normaliser_question(texte):
+    """« C'est quoi la DÉCOTE ?? » et « c est quoi la decote » donnent la même clé."""
+    texte = unicodedata.normalize("NFKD", texte)
+    texte = "".join(c for c in texte if not unicodedata.combining(c)).casefold()
+    return " ".join(re.sub(r"[^\w€%]+", " ", texte).split())
+
+
+class CacheLRU:
+    def __init__(self, taille_max=1024, ttl=None):
+        self.taille_max = taille_max
+        self.ttl = ttl  # secondes, None = pas d'expiration
+        self.succes = 0
+        self.echecs = 0
+        self._entrees = OrderedDict()  # cle -> (horodatage, valeur)
+        self._verrou = threading.Lock()
+
+    def get(self, cle, defaut=None):
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is not None and self.ttl is not None and time.monotonic() - entree[0] > self.ttl:
+                del self._entrees[cle]
+                entree = None
+            if entree is None:
+                self.echecs += 1
+                return defaut
+            self._entrees.move_to_end(cle)
+            self.succes += 1
+            return entree[1]
+
+    def put(self, cle, valeur):
+        with self._verrou:
+            self._entrees[cle] = (time.monotonic(), valeur)
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille_max:
+                self._entrees.popitem(last=False)
+
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
+
+    def __len__(self):
+        return len(self._entrees)
+
+    def stats(self):
+        total = self.succes + self.echecs
+        return {
+            "taille": len(self._entrees),
+            "succes": self.succes,
+            "echecs": self.echecs,
+            "taux_succes": self.succes / total if total else 0.0,
+        }
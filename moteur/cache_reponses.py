@@ -0,0 +1,158 @@
+"""
+Cache sémantique des réponses : une question assez proche (similarité cosinus
+de son embedding au-dessus du seuil) d'une question déjà traitée reçoit la même
+réponse, sans appel à Gemini.
+
+Un cache par domaine, vidé dès que l'empreinte du corpus change (fiches modifiées).
+Éviction LRU, sauvegarde optionnelle sur disque (un fichier JSON par domaine).
+
+Chaque entrée occupe une ligne fixe d'une matrice préallouée : une recherche est un
+seul produit matrice-vecteur, un succès ne fait que déplacer la clé dans l'ordre LRU.
+La sauvegarde est différée (au plus toutes les CACHE_REPONSES_ECRITURE secondes) et
+faite hors du verrou, dans un thread à part.
+"""
+import atexit
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+ECRITURE = float(os.environ.get("CACHE_REPONSES_ECRITURE", "5"))
+
+
+class CacheReponses:
+    def __init__(self, domaine, seuil=0.95, taille_max=500, dossier=None, ecriture=ECRITURE):
+        self.domaine = domaine
+        self.seuil = seuil
+        self.taille_max = max(taille_max, 1)
+        self.chemin = os.path.join(dossier, f"reponses_{domaine}.json") if dossier else None
+        self.ecriture = ecriture
+        self.empreinte_corpus = None
+        self.succes = 0
+        self.echecs = 0
+        self._entrees = OrderedDict()  # question normalisée -> (ligne de la matrice, réponse), ordre LRU
+        self._matrice = None  # (taille_max, dimension), allouée au premier vecteur
+        self._cles = []  # ligne -> question normalisée
+        self._occupees = np.zeros(self.taille_max, dtype=bool)
+        self._libres = list(range(self.taille_max - 1, -1, -1))
+        self._verrou = threading.Lock()
+        self._minuteur = None  # sauvegarde différée en attente
+        self._lire()
+        if self.chemin:
+            atexit.register(self.sauvegarder)
+
+    @staticmethod
+    def _unitaire(vecteur):
+        v = np.asarray(vecteur, dtype=np.float32)
+        norme = np.linalg.norm(v)
+        return v / norme if norme else v
+
+    def _vider(self):
+        self._entrees.clear()
+        self._occupees[:] = False
+        self._libres = list(range(self.taille_max - 1, -1, -1))
+
+    def valider_corpus(self, empreinte_corpus):
+        """Vide le cache si le corpus a changé depuis la mise en cache des réponses."""
+        with self._verrou:
+            if empreinte_corpus != self.empreinte_corpus:
+                self._vider()
+                self.empreinte_corpus = empreinte_corpus
+                self._programmer_ecriture()
+
+    def chercher(self, vecteur, seuil=None):
+        """Renvoie la réponse de la question la plus proche si elle dépasse le seuil, sinon None."""
+        with self._verrou:
+            if not self._entrees or len(vecteur) != self._matrice.shape[1]:
+                self.echecs += 1
+                return None
+            scores = np.where(self._occupees, self._matrice @ self._unitaire(vecteur), -np.inf)
+            ligne = int(np.argmax(scores))
+            if scores[ligne] < (self.seuil if seuil is None else seuil):
+                self.echecs += 1
+                return None
+            self.succes += 1
+            return self._rafraichir(ligne)
+
+    def _rafraichir(self, ligne):
+        # Ligne -> clé sans parcourir les entrées : la clé est rangée avec la ligne
+        cle = self._cles[ligne]
+        self._entrees.move_to_end(cle)
+        return self._entrees[cle][1]
+
+    def ajouter(self, cle, vecteur, reponse):
+        with self._verrou:
+            self._placer(cle, self._unitaire(vecteur), reponse)
+            self._programmer_ecriture()
+
+    def _placer(self, cle, vecteur, reponse):
+        if self._matrice is None or self._matrice.shape[1] != len(vecteur):
+            # Premier vecteur (ou changement de modèle d'embedding) : nouvelle matrice
+            self._matrice = np.zeros((self.taille_max, len(vecteur)), dtype=np.float32)
+            self._cles = [None] * self.taille_max
+            self._vider()
+        if cle in self._entrees:
+            ligne = self._entrees[cle][0]
+        elif self._libres:
+            ligne = self._libres.pop()
+        else:
+            # Cache plein : la ligne de l'entrée la moins récemment utilisée est réutilisée
+            _, (ligne, _) = self._entrees.popitem(last=False)
+        self._matrice[ligne] = vecteur
+        self._occupees[ligne] = True
+        self._cles[ligne] = cle
+        self._entrees[cle] = (ligne, reponse)
+        self._entrees.move_to_end(cle)
+
+    def stats(self):
+        total = self.succes + self.echecs
+        return {
+            "taille": len(self._entrees),
+            "succes": self.succes,
+            "echecs": self.echecs,
+            "taux_succes": self.succes / total if total else 0.0,
+        }
+
+    # --- Sauvegarde sur disque (optionnelle) ---
+    def _lire(self):
+        if not self.chemin or not os.path.exists(self.chemin):
+            return
+        try:
+            with open(self.chemin, "r", encoding="utf-8") as f:
+                donnees = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.empreinte_corpus = donnees.get("empreinte_corpus")
+        for e in donnees.get("entrees", [])[-self.taille_max:]:
+            self._placer(e["cle"], self._unitaire(e["vecteur"]), e["reponse"])
+
+    def _programmer_ecriture(self):
+        # Appelé sous `_verrou` : une seule sauvegarde en attente, quel que soit le nombre d'ajouts
+        if self.chemin and self._minuteur is None:
+            self._minuteur = threading.Timer(self.ecriture, self.sauvegarder)
+            self._minuteur.daemon = True
+            self._minuteur.start()
+
+    def sauvegarder(self):
+        """Écrit le cache sur disque ; la sérialisation JSON se fait hors du verrou."""
+        if not self.chemin:
+            return
+        with self._verrou:
+            if self._minuteur is None:
+                return  # rien de nouveau depuis la dernière sauvegarde
+            self._minuteur.cancel()
+            self._minuteur = None
+            empreinte_corpus = self.empreinte_corpus
+            entrees = [(cle, self._matrice[ligne].copy(), r) for cle, (ligne, r) in self._entrees.items()]
+        donnees = {
+            "empreinte_corpus": empreinte_corpus,
+            "entrees": [{"cle": cle, "vecteur": v.tolist(), "reponse": r} for cle, v, r in entrees],
+        }
+        os.makedirs(os.path.dirname(self.chemin), exist_ok=True)
+        # Écriture atomique : un autre processus ne lit jamais un fichier à moitié écrit
+        temporaire = f"{self.chemin}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporaire, "w", encoding="utf-8") as f:
+            json.dump(donnees, f, ensure_ascii=False)
+        os.replace(temporaire, self.chemin)
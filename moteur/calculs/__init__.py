@@ -0,0 +1,110 @@
+"""
+Calculs exacts pour les questions chiffrées (« combien je paie avec 40 000 € et 2 parts ? ») :
+plutôt que de laisser Gemini faire l'arithmétique à partir des fiches, un moteur local
+applique les barèmes en quelques microsecondes.
+
+Chaque module de ce paquet expose `detecter(question)`, qui renvoie un `Calcul` ou None :
+- `direct` : la question n'est qu'un calcul, la réponse du moteur suffit (aucun appel à Gemini) ;
+- sinon le résultat exact est ajouté au prompt, et Gemini se charge de l'explication.
+
+Le module d'un domaine est désigné par `Domaine.calculateur`.
+"""
+import importlib
+import re
+import unicodedata
+from dataclasses import dataclass
+
+CONSIGNE_RESULTAT = "RÉSULTAT EXACT DU MOTEUR DE CALCUL (à reprendre tel quel, sans le recalculer) :"
+
+
+@dataclass(frozen=True)
+class Calcul:
+    reponse: str  # Réponse complète (markdown), affichée telle quelle si `direct`
+    resume: str  # Résultat exact, inséré dans le prompt sinon
+    direct: bool = False
+
+
+def detecter(calculateur, question):
+    """Calcul correspondant à la question pour le module `calculateur` (ex. "impots"), ou None."""
+    if not calculateur:
+        return None
+    return importlib.import_module(f"{__name__}.{calculateur}").detecter(question)
+
+
+def enrichir_question(question, calcul):
+    """Tour de l'utilisateur augmenté du résultat exact, pour le prompt."""
+    return f"{question}\n\n{CONSIGNE_RESULTAT}\n{calcul.resume}"
+
+
+# --- Lecture des montants dans une question ---
+def simplifier(texte):
+    """Minuscules sans accents, ponctuation conservée (« 2,5 parts », « 40.000 € »)."""
+    texte = unicodedata.normalize("NFKD", texte)
+    return "".join(c for c in texte if not unicodedata.combining(c)).casefold().replace("’", "'")
+
+
+_NOMBRE = re.compile(
+    r"(?<![\d,.])(\d{1,3}(?:[ \u00a0\u202f.]\d{3})+|\d+)(?:,(\d{1,2}))?"
+    r"(\s*(?:k\s*€?|keur|€|euros?\b|eur\b))?"
+)
+_PAR_MOIS = re.compile(r"^\s*(?:€|euros?)?\s*(?:nets?|bruts?)?\s*(?:par mois|/\s*mois|mensuels?|chaque mois)")
+_PAR_AN = re.compile(r"^\s*(?:€|euros?)?\s*(?:nets?|bruts?)?\s*(?:par an|/\s*an\b|annuels?|l'annee|dans l'annee)")
+_PAR_JOUR = re.compile(r"^\s*(?:€|euros?)?\s*(?:nets?|bruts?)?\s*(?:par jour|/\s*jour|journaliers?)")
+
+
+_PERIODES = (("mois", _PAR_MOIS), ("an", _PAR_AN), ("jour", _PAR_JOUR))
+
+
+@dataclass(frozen=True)
+class Montant:
+    valeur: float
+    en_euros: bool  # suivi de « € », « euros » ou « k »
+    periode: str  # "mois", "an", "jour" ou "" (non précisée)
+    debut: int
+    fin: int
+
+
+def montants(texte):
+    """Nombres d'un texte simplifié, avec leur unité (« 40 000 € », « 2 500 euros par mois », « 40k »)."""
+    trouves = []
+    for m in _NOMBRE.finditer(texte):
+        entier, decimales, unite = m.group(1), m.group(2), (m.group(3) or "").strip()
+        valeur = float(re.sub(r"[ \u00a0\u202f.]", "", entier) + (f".{decimales}" if decimales else ""))
+        if unite.startswith("k"):
+            valeur *= 1000
+        suite = texte[m.end():m.end() + 30]
+        periode = next((p for p, motif in _PERIODES if motif.match(suite)), "")
+        trouves.append(Montant(valeur, bool(unite), periode, m.start(), m.end()))
+    return trouves
+
+
+_ENFANTS = re.compile(r"\b(\d+|un|une|deux|trois|quatre|cinq|six)\s+(?:enfants?|gosses?|petits?)\b")
+_SANS_ENFANT = re.compile(r"\b(sans|pas d'|aucun) enfants?\b")
+_CHIFFRES = {"un": 1, "une": 1, "deux": 2, "trois": 3, "quatre": 4, "cinq": 5, "six": 6}
+_COUPLE = re.compile(r"\b(marie\w*|pacse\w*|couple|concubin\w*|mon conjoint|ma conjointe|ma femme|mon mari)\b")
+
+
+def nombre_enfants(texte):
+    """« 2 enfants », « trois enfants », « sans enfant » (0) ; None si le texte simplifié n'en dit rien."""
+    m = _ENFANTS.search(texte)
+    if m:
+        return _CHIFFRES.get(m.group(1)) or int(m.group(1))
+    return 0 if _SANS_ENFANT.search(texte) else None
+
+
+def en_couple(texte):
+    return bool(_COUPLE.search(texte))
+
+
+def euros(valeur, decimales=0):
+    """1234.5 -> « 1 235 € » (espaces insécables fines, à la française)."""
+    texte = f"{valeur:,.{decimales}f}".replace(",", "\u202f").replace(".", ",")
+    return f"{texte} €"
+
+
+def pourcentage(taux, decimales=1):
+    """0.3 -> « 30 % », 0.1125 -> « 11,3 % »."""
+    texte = f"{taux * 100:.{decimales}f}"
+    if "." in texte:
+        texte = texte.rstrip("0").rstrip(".")
+    return texte.replace(".", ",") + " %"
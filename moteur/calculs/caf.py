@@ -0,0 +1,199 @@
+"""
+RSA d'après la fiche caf_rsa_socle.txt : montant forfaitaire selon la composition du
+foyer (personne seule, couple, enfants à charge), moins le forfait logement pour les
+foyers aidés ou logés gratuitement, moins les ressources du foyer (allocation différentielle).
+
+- `calculer(ressources, ...)` : un foyer, avec le détail ;
+- `simuler(ressources, ...)` : vectorisé avec NumPy ;
+- `detecter(question)` : « combien de RSA pour un couple avec 2 enfants et 400 € de revenus ? ».
+
+Hors majoration pour parent isolé et conditions d'éligibilité (âge, résidence).
+"""
+import re
+from dataclasses import dataclass
+
+from . import Calcul, en_couple, euros, montants, nombre_enfants, simplifier
+
+FORFAIT_SEUL = 635
+FORFAIT_COUPLE = 953
+MAJORATION_ENFANT = 254  # 1er et 2e enfant (ou personne à charge)
+MAJORATION_ENFANT_SUIVANT = 381  # à partir du 3e
+# Forfait logement par taille du foyer : 1 personne, 2 personnes, 3 ou plus
+FORFAIT_LOGEMENT = (76, 152, 188)
+
+
+def montant_forfaitaire(couple=False, enfants=0):
+    return (FORFAIT_COUPLE if couple else FORFAIT_SEUL) + MAJORATION_ENFANT * min(enfants, 2) \
+        + MAJORATION_ENFANT_SUIVANT * max(enfants - 2, 0)
+
+
+def forfait_logement(personnes):
+    return FORFAIT_LOGEMENT[min(personnes, len(FORFAIT_LOGEMENT)) - 1]
+
+
+@dataclass(frozen=True)
+class ResultatRsa:
+    forfaitaire: float
+    forfait_logement: float
+    ressources: float
+    rsa: float
+
+
+def calculer(ressources=0.0, couple=False, enfants=0, aide_logement=False):
+    """RSA mensuel : forfaitaire - forfait logement (si aide au logement ou logé gratuitement) - ressources."""
+    forfaitaire = montant_forfaitaire(couple, enfants)
+    logement = forfait_logement((2 if couple else 1) + enfants) if aide_logement else 0
+    return ResultatRsa(
+        forfaitaire=forfaitaire, forfait_logement=logement, ressources=ressources,
+        rsa=max(forfaitaire - logement - ressources, 0.0),
+    )
+
+
+def simuler(ressources, couple=False, enfants=0, aide_logement=False):
+    """RSA mensuel de chaque foyer (tableaux ou scalaires diffusés les uns sur les autres)."""
+    import numpy as np
+
+    ressources = np.maximum(np.asarray(ressources, dtype=np.float64), 0.0)
+    couple = np.asarray(couple, dtype=bool)
+    enfants = np.asarray(enfants, dtype=np.int64)
+    forfaitaire = (np.where(couple, FORFAIT_COUPLE, FORFAIT_SEUL) + MAJORATION_ENFANT * np.minimum(enfants, 2)
+                   + MAJORATION_ENFANT_SUIVANT * np.maximum(enfants - 2, 0))
+    personnes = np.where(couple, 2, 1) + enfants
+    logement = np.where(
+        np.asarray(aide_logement, dtype=bool),
+        np.asarray(FORFAIT_LOGEMENT)[np.minimum(personnes, len(FORFAIT_LOGEMENT)) - 1], 0,
+    )
+    return {
+        "forfaitaire": forfaitaire,
+        "forfait_logement": logement,
+        "rsa": np.maximum(forfaitaire - logement - ressources, 0.0),
+    }
+
+
+# --- Détection dans le chat ---
+_INTENTION = re.compile(r"\b(combien|montant|calcul\w*|estim\w*|simul\w*|touch\w*|percevr\w*|droit a)\b")
+_EXPLICATION = re.compile(r"\b(pourquoi|comment|expliqu\w*|conditions?|demarche\w*|declar\w*|jeune|etudiant)\b")
+_AIDE_LOGEMENT = re.compile(
+    r"\b(apl|als|alf|aides? (au|aux|de) logement|loge\w* gratuitement|heberge\w*|proprietaire)\b"
+)
+_SANS_AIDE = re.compile(r"\b(sans|pas d'|pas de|aucune) (apl|aides? (au|aux) logement)\b")
+_RSA = re.compile(r"\brsa\b")
+# Un montant est une ressource du foyer s'il est accolé à l'un de ces mots...
+_REVENUS = re.compile(r"\b(revenus?|salaires?|gagne\w*|ressources?|remunere\w*|pensions?|indemnites?|chomage)\b")
+# ... et n'en est pas une s'il est plus près de l'un de ceux-ci (aides, loyer, charges)
+_AUTRES_MONTANTS = re.compile(r"\b(apl|als|alf|aides?|allocations?|loyers?|charges?|credits?|dettes?)\b")
+_COUPURE = re.compile(r"[;!?]|[.,]\s")  # fin de proposition (pas la virgule décimale de « 1 234,50 »)
+PROXIMITE = 40  # caractères entre un montant et le mot qui le qualifie
+
+
+def _distance(texte, montant, motif):
+    """
+    Écart `(caractères, rang)` entre le montant et le plus proche mot de `motif` dans la même
+    proposition, ou None ; à écart égal, le mot qui suit (« 500 € de salaire ») passe avant
+    celui qui précède (rang 0 contre 1).
+    """
+    ecarts = []
+    for mot in motif.finditer(texte):
+        if mot.start() >= montant.fin:
+            debut, fin, rang = montant.fin, mot.start(), 0
+        elif mot.end() <= montant.debut:
+            debut, fin, rang = mot.end(), montant.debut, 1
+        else:
+            continue
+        if not _COUPURE.search(texte, debut, fin):
+            ecarts.append((fin - debut, rang))
+    return min(ecarts, default=None)
+
+
+def _montants_du_foyer(texte):
+    """
+    Montants en euros de la question : `(ressources, non_qualifies)` ; les aides et loyers
+    sont écartés, et un montant qu'on ne sait pas rattacher est non qualifié (jamais ignoré).
+    """
+    ressources, non_qualifies = [], []
+    for m in montants(texte):
+        if not (m.en_euros or m.periode):
+            continue
+        revenu, autre = _distance(texte, m, _REVENUS), _distance(texte, m, _AUTRES_MONTANTS)
+        revenu = revenu if revenu is not None and revenu[0] <= PROXIMITE else None
+        autre = autre if autre is not None and autre[0] <= PROXIMITE else None
+        if revenu is not None and (autre is None or revenu < autre):
+            ressources.append(m)
+        elif autre is None or revenu == autre:
+            non_qualifies.append(m)
+    return ressources, non_qualifies
+
+
+def detecter(question):
+    texte = simplifier(question)
+    if not _RSA.search(texte) or not _INTENTION.search(texte):
+        return None
+    # Ressources mensuelles du foyer (un montant annuel est ramené au mois) ; aucune si rien n'est indiqué
+    candidats, non_qualifies = _montants_du_foyer(texte)
+    ressource = max(candidats, key=lambda m: m.valeur, default=None)
+    ressources = 0.0
+    if ressource is not None:
+        ressources = ressource.valeur / 12 if ressource.periode == "an" else ressource.valeur
+    couple = en_couple(texte)
+    enfants = nombre_enfants(texte)
+    aide_logement = bool(_AIDE_LOGEMENT.search(texte)) and not _SANS_AIDE.search(texte)
+    r = calculer(ressources, couple, enfants or 0, aide_logement)
+
+    foyer = "couple" if couple else "personne seule"
+    if enfants:
+        foyer += f" avec {enfants} enfant{'s' if enfants > 1 else ''} à charge"
+    lignes = [f"- Montant forfaitaire ({foyer}) : {euros(r.forfaitaire)}"]
+    if r.forfait_logement:
+        lignes.append(f"- Forfait logement (aide au logement ou logement gratuit) : − {euros(r.forfait_logement)}")
+    lignes.append(f"- Ressources du foyer : − {euros(r.ressources)}"
+                  + ("" if ressource else " (aucune ressource indiquée)"))
+    if non_qualifies:
+        lignes.append(f"- Non pris en compte : {', '.join(euros(m.valeur) for m in non_qualifies)} "
+                      "(montant dont on ne sait pas s'il s'agit d'un revenu)")
+    lignes.append(f"- **RSA estimé : {euros(r.rsa)} par mois**"
+                  + (" (vos ressources dépassent le montant forfaitaire)" if not r.rsa else ""))
+    resume = "\n".join(lignes)
+    precisions = []
+    if enfants is None:
+        precisions.append("sans enfant à charge")
+    if not _AIDE_LOGEMENT.search(texte):
+        precisions.append("sans aide au logement")
+    reponse = (
+        "**Estimation de votre RSA** (allocation différentielle) :\n\n" + resume
+        + (f"\n\nCalcul fait {' et '.join(precisions)} : précisez votre situation pour l'affiner." if precisions else "")
+        + "\n\n*Estimation informative (montants 2025 de la fiche CAF) : seule la CAF calcule vos droits, "
+        "à partir des ressources des trois derniers mois.*"
+    )
+    # Montant ambigu (nature inconnue, plusieurs revenus) : Gemini complète l'explication
+    ambigu = bool(non_qualifies) or len(candidats) > 1
+    return Calcul(reponse=reponse, resume=resume, direct=not _EXPLICATION.search(texte) and not ambigu)
+
+
+# --- Vérification (python -m moteur.calculs.caf) ---
+# Formulations où un montant a déjà été mal attribué : (question, RSA attendu, réponse directe)
+CAS_DE_REFERENCE = (
+    ("combien de RSA avec 300 € d APL et 500 € de salaire", 59, True),
+    ("combien de RSA avec 500 € de salaire et 300 € d'APL", 59, True),
+    ("combien de rsa avec 300 € d'apl et 500 € de revenus par mois", 59, True),
+    ("combien de RSA pour une personne seule avec 400 € de salaire", 235, True),
+    ("combien de RSA avec 450 € de loyer", 635, True),
+    ("combien de RSA si je touche 200 €", 635, False),
+)
+
+
+def verifier():
+    """Liste des écarts sur `CAS_DE_REFERENCE` (vide si tout est juste)."""
+    ecarts = []
+    for question, rsa, direct in CAS_DE_REFERENCE:
+        calcul = detecter(question)
+        attendu = f"RSA estimé : {euros(rsa)} par mois"
+        if calcul is None or attendu not in calcul.resume or calcul.direct != direct:
+            ecarts.append(f"{question!r} : attendu {attendu} (direct={direct}), obtenu "
+                          f"{calcul.resume if calcul else None!r} (direct={calcul.direct if calcul else None})")
+    return ecarts
+
+
+if __name__ == "__main__":
+    ecarts = verifier()
+    print("\n".join(ecarts) or f"{len(CAS_DE_REFERENCE)} cas conformes")
+    raise SystemExit(1 if ecarts else 0)
@@ -0,0 +1,147 @@
+"""
+Allocation d'aide au retour à l'emploi (ARE) d'après la fiche chomage_calcul_montant.txt :
+salaire journalier de référence (SJR), formule la plus favorable entre 40,4 % du SJR
++ 13,11 € et 57 % du SJR, plancher de 31,97 €, plafond de 75 % du SJR, dégressivité de
+30 % à partir du 7e mois pour les anciens salaires de plus de 4 900 € brut par mois.
+
+- `calculer(sjr)` : une allocation journalière, avec le détail ;
+- `simuler(sjrs)` : vectorisé avec NumPy ;
+- `detecter(question)` : « combien vais-je toucher avec 2 500 € brut par mois ? ».
+
+Montants bruts, avant les prélèvements sociaux ; hors temps partiel et cumul avec une activité.
+"""
+import re
+from dataclasses import dataclass
+
+from . import Calcul, euros, montants, simplifier
+
+TAUX_PROPORTIONNEL = 0.404
+PARTIE_FIXE = 13.11
+TAUX_SEUL = 0.57
+PLANCHER = 31.97
+PLAFOND_SJR = 0.75
+
+SEUIL_DEGRESSIVITE = 4900  # salaire brut mensuel
+REDUCTION_DEGRESSIVITE = 0.30
+MOIS_DEGRESSIVITE = 7
+AGE_SANS_DEGRESSIVITE = 57
+
+JOURS_PAR_AN = 365
+JOURS_PAR_MOIS = 30
+
+
+def salaire_journalier(salaires, jours):
+    """Salaires bruts des 24 derniers mois divisés par les jours calendaires de la période."""
+    return salaires / jours
+
+
+def sjr_mensuel(brut_mensuel):
+    """SJR d'un salaire brut mensuel constant."""
+    return brut_mensuel * 12 / JOURS_PAR_AN
+
+
+@dataclass(frozen=True)
+class ResultatAre:
+    sjr: float
+    formule_mixte: float  # 40,4 % du SJR + partie fixe
+    formule_proportionnelle: float  # 57 % du SJR
+    plafond: float
+    journaliere: float
+    regle: str  # "mixte", "proportionnelle", "plancher" ou "plafond"
+    degressive: float  # à partir du 7e mois, égale à `journaliere` si la dégressivité ne s'applique pas
+
+    @property
+    def mensuelle(self):
+        return self.journaliere * JOURS_PAR_MOIS
+
+
+def calculer(sjr, moins_de_57_ans=True):
+    mixte = TAUX_PROPORTIONNEL * sjr + PARTIE_FIXE
+    proportionnelle = TAUX_SEUL * sjr
+    plafond = PLAFOND_SJR * sjr
+    journaliere = max(mixte, proportionnelle, PLANCHER)
+    regle = "mixte" if mixte >= proportionnelle else "proportionnelle"
+    if journaliere == PLANCHER and PLANCHER > max(mixte, proportionnelle):
+        regle = "plancher"
+    if journaliere > plafond:
+        journaliere, regle = plafond, "plafond"
+    degressif = moins_de_57_ans and sjr * JOURS_PAR_AN / 12 > SEUIL_DEGRESSIVITE
+    return ResultatAre(
+        sjr=sjr, formule_mixte=mixte, formule_proportionnelle=proportionnelle, plafond=plafond,
+        journaliere=journaliere, regle=regle,
+        degressive=journaliere * (1 - REDUCTION_DEGRESSIVITE) if degressif else journaliere,
+    )
+
+
+def simuler(sjrs, moins_de_57_ans=True):
+    """Allocations journalières (avant et après dégressivité) et mensuelles pour un tableau de SJR."""
+    import numpy as np
+
+    sjrs = np.maximum(np.asarray(sjrs, dtype=np.float64), 0.0)
+    journaliere = np.maximum(np.maximum(TAUX_PROPORTIONNEL * sjrs + PARTIE_FIXE, TAUX_SEUL * sjrs), PLANCHER)
+    journaliere = np.minimum(journaliere, PLAFOND_SJR * sjrs)
+    degressif = np.asarray(moins_de_57_ans, dtype=bool) & (sjrs * JOURS_PAR_AN / 12 > SEUIL_DEGRESSIVITE)
+    return {
+        "journaliere": journaliere,
+        "mensuelle": journaliere * JOURS_PAR_MOIS,
+        "degressive": np.where(degressif, journaliere * (1 - REDUCTION_DEGRESSIVITE), journaliere),
+    }
+
+
+# --- Détection dans le chat ---
+_INTENTION = re.compile(r"\b(combien|montant|calcul\w*|estim\w*|simul\w*|touch\w*|percevr\w*|allocation|are)\b")
+_HORS_SUJET = re.compile(
+    r"\b(combien de (temps|jours|mois)|duree|quand|delai|intermittent\w*|temps partiel|mi-temps|cumul\w*)\b"
+)
+_EXPLICATION = re.compile(r"\b(pourquoi|comment|expliqu\w*|conditions?|droits?|demarche\w*|differe|carence)\b")
+_AGE = re.compile(r"\b(\d{2})\s*ans\b")
+
+
+def detecter(question):
+    texte = simplifier(question)
+    if not _INTENTION.search(texte) or _HORS_SUJET.search(texte):
+        return None
+    candidats = [m for m in montants(texte) if m.valeur >= 20 and (m.en_euros or m.periode)]
+    if not candidats:
+        return None
+    salaire = max(candidats, key=lambda m: m.valeur)
+
+    # Montant donné par jour (SJR), par an ou, par défaut, par mois
+    if salaire.periode == "jour" or re.search(r"\bsjr\b", texte):
+        base, origine = salaire.valeur, f"SJR indiqué : {euros(salaire.valeur, 2)}"
+    elif salaire.periode == "an" or (not salaire.periode and salaire.valeur >= 15000):
+        base = salaire.valeur / JOURS_PAR_AN
+        origine = f"{euros(salaire.valeur)} brut par an ÷ {JOURS_PAR_AN} jours"
+    else:
+        base = sjr_mensuel(salaire.valeur)
+        origine = f"{euros(salaire.valeur)} brut par mois × 12 ÷ {JOURS_PAR_AN} jours"
+    age = _AGE.search(texte)
+    moins_de_57_ans = not age or int(age.group(1)) < AGE_SANS_DEGRESSIVITE
+    r = calculer(base, moins_de_57_ans)
+
+    formules = {
+        "mixte": "formule la plus favorable : 40,4 % du SJR + 13,11 €",
+        "proportionnelle": "formule la plus favorable : 57 % du SJR",
+        "plancher": f"montant minimum de {euros(PLANCHER, 2)} par jour",
+        "plafond": "plafonnée à 75 % du SJR",
+    }
+    lignes = [
+        f"- Salaire journalier de référence (SJR) : **{euros(r.sjr, 2)}** ({origine})",
+        f"- 40,4 % du SJR + 13,11 € = {euros(r.formule_mixte, 2)} ; 57 % du SJR = {euros(r.formule_proportionnelle, 2)}",
+        f"- **Allocation journalière : {euros(r.journaliere, 2)}** ({formules[r.regle]})",
+        f"- Soit environ **{euros(r.mensuelle)} par mois** de {JOURS_PAR_MOIS} jours",
+    ]
+    if r.degressive < r.journaliere:
+        lignes.append(
+            f"- Dégressivité (ancien salaire > {euros(SEUIL_DEGRESSIVITE)} brut par mois"
+            + ("" if age else f", sauf si vous avez {AGE_SANS_DEGRESSIVITE} ans ou plus")
+            + f") : {euros(r.degressive, 2)} par jour à partir du {MOIS_DEGRESSIVITE}e mois, "
+            f"soit environ {euros(r.degressive * JOURS_PAR_MOIS)} par mois"
+        )
+    resume = "\n".join(lignes)
+    reponse = (
+        "**Estimation de votre allocation chômage (ARE)** :\n\n" + resume
+        + "\n\n*Estimation informative en montant brut, avant prélèvements sociaux, pour un salaire "
+        "constant sur la période de référence. Seule France Travail peut calculer vos droits exacts.*"
+    )
+    return Calcul(reponse=reponse, resume=resume, direct=not _EXPLICATION.search(texte))
@@ -0,0 +1,286 @@
+"""
+Impôt sur le revenu 2025 (revenus 2024) : barème progressif, quotient familial (avec
+son plafonnement), décote et seuil de recouvrement de 61 €.
+
+- `calculer(revenu, parts)` : un foyer, en Python pur ;
+- `simuler(revenus, parts)` : des milliers de foyers d'un coup, vectorisé avec NumPy ;
+- `detecter(question)` : reconnaît une demande de calcul dans une question du chat.
+
+Hors réductions et crédits d'impôt, revenus du capital et régimes micro.
+"""
+import re
+from dataclasses import dataclass
+
+from . import Calcul, en_couple, euros, montants, nombre_enfants, pourcentage, simplifier
+
+# Barème de la fiche impots_calcul_prelevement.txt : (plafond de la tranche, taux)
+BAREME = ((11520, 0.0), (29373, 0.11), (83951, 0.30), (179814, 0.41), (float("inf"), 0.45))
+
+# Avantage maximal par demi-part au-delà des parts de base (1 ou 2) ; la part entière
+# du premier enfant d'un parent isolé a son propre plafond
+PLAFOND_DEMI_PART = 1791
+PLAFOND_PARENT_ISOLE = 4224
+
+# Tous les paramètres sont ceux de la loi de finances 2025 (imposition des revenus 2024)
+# Décote : forfait - 45,25 % de l'impôt brut (seuil ≈ 1 965 € pour une personne seule, ≈ 3 249 € pour un couple)
+DECOTE_SEUL = 889
+DECOTE_COUPLE = 1470
+TAUX_DECOTE = 0.4525
+
+SEUIL_RECOUVREMENT = 61
+
+# Déduction forfaitaire de 10 % sur les salaires (fiche impots_revenus_salaires.txt)
+DEDUCTION_SALAIRES = 0.10
+DEDUCTION_MIN = 504
+DEDUCTION_MAX = 14426
+
+
+def nombre_parts(couple=False, enfants=0, parent_isole=False, invalides=0):
+    """Parts du foyer : 1 (2 en couple), +0,5 pour chacun des deux premiers enfants, +1 ensuite."""
+    parts = 2.0 if couple else 1.0
+    parts += 0.5 * min(enfants, 2) + max(enfants - 2, 0)
+    if parent_isole and not couple and enfants:
+        parts += 0.5
+    return parts + 0.5 * invalides
+
+
+def revenu_salaires(salaires):
+    """Revenu net imposable après la déduction forfaitaire de 10 %."""
+    return salaires - min(max(salaires * DEDUCTION_SALAIRES, DEDUCTION_MIN), DEDUCTION_MAX, salaires)
+
+
+def bareme(quotient):
+    """Impôt pour une part ; renvoie aussi le détail par tranche et le taux marginal."""
+    impot, plancher, tranches, tmi = 0.0, 0.0, [], 0.0
+    for plafond, taux in BAREME:
+        if quotient <= plancher:
+            break
+        assiette = min(quotient, plafond) - plancher
+        impot += assiette * taux
+        tranches.append((plancher, min(quotient, plafond), taux, assiette * taux))
+        tmi = taux
+        plancher = plafond
+    return impot, tranches, tmi
+
+
+@dataclass(frozen=True)
+class ResultatImpot:
+    revenu: float  # revenu net imposable du foyer
+    parts: float
+    quotient: float
+    tranches: tuple  # (de, à, taux, impôt par part)
+    taux_marginal: float
+    impot_brut: float  # après plafonnement du quotient familial
+    plafonnement: float  # avantage du quotient familial retiré par le plafonnement
+    decote: float
+    impot: float  # impôt dû, arrondi à l'euro
+    recouvre: bool  # False sous le seuil de 61 €
+
+    @property
+    def taux_moyen(self):
+        return self.impot / self.revenu if self.revenu > 0 else 0.0
+
+
+def calculer(revenu, parts=1.0, couple=None, parent_isole=False):
+    """
+    Impôt d'un foyer. `couple` vaut par défaut `parts >= 2` (parts de base 2 au lieu de 1) ;
+    `parent_isole` : la part entière du premier enfant (case T) a son propre plafond.
+    """
+    revenu = max(float(revenu), 0.0)
+    couple = parts >= 2 if couple is None else couple
+    base = 2.0 if couple else 1.0
+    quotient = revenu / parts
+    impot_par_part, tranches, tmi = bareme(quotient)
+    impot = impot_par_part * parts
+
+    # Plafonnement : l'avantage des parts supplémentaires est borné
+    plafonnement = 0.0
+    if parts > base:
+        impot_base = bareme(revenu / base)[0] * base
+        plafond = _plafond_avantage(parts - base, parent_isole)
+        if impot_base - impot > plafond:
+            plafonnement = impot_base - plafond - impot
+            impot = impot_base - plafond
+
+    # Décote, dans la limite de l'impôt
+    forfait = DECOTE_COUPLE if couple else DECOTE_SEUL
+    decote = min(max(forfait - TAUX_DECOTE * impot, 0.0), impot)
+    net = round(impot - decote)
+    return ResultatImpot(
+        revenu=revenu, parts=parts, quotient=quotient, tranches=tuple(tranches), taux_marginal=tmi,
+        impot_brut=impot, plafonnement=plafonnement, decote=decote, impot=float(net),
+        recouvre=net >= SEUIL_RECOUVREMENT,
+    )
+
+
+def _plafond_avantage(parts_en_plus, parent_isole):
+    demi_parts = round(parts_en_plus * 2)
+    if parent_isole and demi_parts >= 2:
+        return PLAFOND_PARENT_ISOLE + (demi_parts - 2) * PLAFOND_DEMI_PART
+    return demi_parts * PLAFOND_DEMI_PART
+
+
+def simuler(revenus, parts=1.0, couple=None, parent_isole=False):
+    """
+    Version vectorisée de `calculer` : tableaux (ou scalaires) diffusés les uns sur les autres.
+    Renvoie un dictionnaire de tableaux : impot_brut, plafonnement, decote, impot, recouvre,
+    taux_marginal, taux_moyen.
+    """
+    import numpy as np
+
+    revenus = np.maximum(np.asarray(revenus, dtype=np.float64), 0.0)
+    parts = np.asarray(parts, dtype=np.float64)
+    couple = parts >= 2 if couple is None else np.asarray(couple, dtype=bool)
+    parent_isole = np.asarray(parent_isole, dtype=bool)
+    base = np.where(couple, 2.0, 1.0)
+
+    planchers = np.array([0.0] + [plafond for plafond, _ in BAREME[:-1]])
+    plafonds = np.array([plafond for plafond, _ in BAREME])
+    taux = np.array([t for _, t in BAREME])
+
+    def impot_bareme(quotient):
+        assiettes = np.clip(quotient[..., None] - planchers, 0.0, plafonds - planchers)
+        return assiettes @ taux
+
+    revenus, parts, base, couple, parent_isole = np.broadcast_arrays(revenus, parts, base, couple, parent_isole)
+    impot = impot_bareme(revenus / parts) * parts
+    impot_base = impot_bareme(revenus / base) * base
+    demi_parts = np.maximum(np.round((parts - base) * 2), 0.0)
+    plafond = np.where(
+        parent_isole & (demi_parts >= 2),
+        PLAFOND_PARENT_ISOLE + (demi_parts - 2) * PLAFOND_DEMI_PART,
+        demi_parts * PLAFOND_DEMI_PART,
+    )
+    plafonne = impot_base - impot > plafond
+    plafonnement = np.where(plafonne, impot_base - plafond - impot, 0.0)
+    impot = np.where(plafonne, impot_base - plafond, impot)
+
+    forfait = np.where(couple, DECOTE_COUPLE, DECOTE_SEUL)
+    decote = np.minimum(np.maximum(forfait - TAUX_DECOTE * impot, 0.0), impot)
+    net = np.round(impot - decote)
+    taux_marginal = taux[np.searchsorted(plafonds, revenus / parts, side="left")]
+    return {
+        "impot_brut": impot,
+        "plafonnement": plafonnement,
+        "decote": decote,
+        "impot": net,
+        "recouvre": net >= SEUIL_RECOUVREMENT,
+        "taux_marginal": np.where(revenus > 0, taux_marginal, 0.0),
+        "taux_moyen": np.divide(net, revenus, out=np.zeros_like(net), where=revenus > 0),
+    }
+
+
+# --- Détection dans le chat ---
+_INTENTION = re.compile(r"\b(combien|calcul\w*|estim\w*|simul\w*|montant|payer|paie|paye|dois|devr\w*|quel\w* impot)\b")
+_EXPLICATION = re.compile(
+    r"\b(pourquoi|comment|expliqu\w*|declar\w*|difference|conseil\w*|optimis\w*|reduire|reduction|credit|"
+    r"frais reels|case|prelevement a la source|taux personnalise)\b"
+)
+# Revenus que le barème seul ne couvre pas (abattements micro, flat tax, pensions...)
+_HORS_CHAMP = re.compile(
+    r"\b(micro|auto.?entrepreneur|chiffre d'affaires|ca|dividendes?|interets?|pensions?|"
+    r"retraites?|foncier|loyers?|bic|bnc|pfu|flat tax)\b"
+)
+# Autres impôts et prélèvements : jamais calculés avec le barème de l'impôt sur le revenu
+_AUTRES_IMPOTS = re.compile(
+    r"\b(csg|crds|prelevements? sociaux|taxes?|tva|ifi|fortune|societes|succession|donations?|heritage|"
+    r"droits? de mutation|frais de notaire|plus.?values?)\b"
+)
+# Le calcul suppose une question sur l'impôt sur le revenu (revenu, salaire, barème, parts...)
+_CONTEXTE_REVENU = re.compile(
+    r"\b(impots?|imposables?|imposition|ir|revenus?|salaires?|salarie\w*|gagne\w*|bareme|tranches?|tmi|"
+    r"parts?|quotient)\b"
+)
+_SALAIRES = re.compile(r"\b(salaires?|salarie\w*|gagne\w*|payee?s?)\b")
+_REVENU_IMPOSABLE = re.compile(r"\b(revenus? (net )?imposables?|rni|revenu fiscal|quotient)\b")
+_PARTS = re.compile(r"(\d+(?:[,.]5)?)\s*parts?\b")
+_SEUL = re.compile(r"\b(celibataire|divorce\w*|separe\w*|veu(f|ve)|seule?)\b")
+_PARENT_ISOLE = re.compile(r"\b(parent isole|case t|seule? avec|eleve seule?)\b")
+
+
+def detecter(question):
+    texte = simplifier(question)
+    if not _INTENTION.search(texte) or not _CONTEXTE_REVENU.search(texte) or _AUTRES_IMPOTS.search(texte):
+        return None
+    if _HORS_CHAMP.search(texte) and not _REVENU_IMPOSABLE.search(texte):
+        return None
+
+    # Revenu : le plus gros montant en euros (ou, à défaut, le plus gros nombre plausible)
+    candidats = [m for m in montants(texte) if m.valeur >= 1000 and not _annee(m)]
+    en_euros = [m for m in candidats if m.en_euros]
+    revenu = max(en_euros or candidats, key=lambda m: m.valeur, default=None)
+    if revenu is None:
+        return None
+    montant = revenu.valeur * (12 if revenu.periode == "mois" else 1)
+
+    # Composition du foyer : parts explicites, sinon situation et enfants
+    parts_explicites = _PARTS.search(texte)
+    enfants = nombre_enfants(texte)
+    nb_enfants = enfants or 0
+    couple = en_couple(texte)
+    parent_isole = bool(nb_enfants and not couple and _PARENT_ISOLE.search(texte))
+    if parts_explicites:
+        parts = float(parts_explicites.group(1).replace(",", "."))
+        couple = couple or (parts >= 2 and not _SEUL.search(texte) and not parent_isole)
+        situation = "nombre indiqué"
+    else:
+        parts = nombre_parts(couple, nb_enfants, parent_isole)
+        situation = _situation(couple, nb_enfants, parent_isole)
+    if parts <= 0 or parts > 20:
+        return None
+    renseigne = bool(parts_explicites or couple or enfants is not None or _SEUL.search(texte))
+
+    # Salaires : la déduction forfaitaire de 10 % s'applique avant le barème
+    salaires = _SALAIRES.search(texte) and not _REVENU_IMPOSABLE.search(texte)
+    imposable = revenu_salaires(montant) if salaires else montant
+    resultat = calculer(imposable, parts, couple=couple, parent_isole=parent_isole)
+
+    lignes = []
+    if salaires:
+        lignes.append(f"- Salaires déclarés : {euros(montant)}, moins la déduction forfaitaire de 10 % "
+                      f"({euros(montant - imposable)}) : revenu net imposable de **{euros(imposable)}**")
+    else:
+        lignes.append(f"- Revenu net imposable : **{euros(imposable)}**"
+                      + (" (montant mensuel × 12)" if revenu.periode == "mois" else ""))
+    lignes.append(f"- Nombre de parts : **{_parts(parts)}** ({situation})"
+                  + ("" if renseigne else " : précisez votre situation familiale pour affiner"))
+    lignes.append(f"- Quotient familial : {euros(resultat.quotient)} par part")
+    for de, a, taux, impot in resultat.tranches:
+        if taux:
+            lignes.append(f"  - tranche à {pourcentage(taux)} : ({euros(a)} − {euros(de)}) × {pourcentage(taux)} "
+                          f"= {euros(impot)} par part")
+    lignes.append(f"- Impôt selon le barème : {euros(resultat.impot_brut - resultat.plafonnement)} "
+                  f"(tranche marginale : {pourcentage(resultat.taux_marginal)})")
+    if resultat.plafonnement:
+        lignes.append(f"- Plafonnement du quotient familial : + {euros(resultat.plafonnement)}")
+    if resultat.decote:
+        lignes.append(f"- Décote : − {euros(resultat.decote)}")
+    if resultat.impot and not resultat.recouvre:
+        lignes.append(f"- **Impôt : {euros(resultat.impot)}, non recouvré** (inférieur à {SEUIL_RECOUVREMENT} €)")
+    else:
+        lignes.append(f"- **Impôt sur le revenu : {euros(resultat.impot)}** "
+                      f"(taux moyen : {pourcentage(resultat.taux_moyen)})")
+    resume = "\n".join(lignes)
+
+    reponse = (
+        "**Estimation de votre impôt 2025 (revenus 2024)**, d'après le barème progressif :\n\n"
+        + resume
+        + "\n\n*Estimation informative, hors réductions et crédits d'impôt (dons, emploi à domicile, garde "
+        "d'enfants...) et hors revenus du capital. Le montant définitif figure sur votre avis d'imposition.*"
+    )
+    return Calcul(reponse=reponse, resume=resume, direct=renseigne and not _EXPLICATION.search(texte))
+
+
+def _annee(montant):
+    return not montant.en_euros and 1990 <= montant.valeur <= 2100 and montant.valeur.is_integer()
+
+
+def _parts(parts):
+    return f"{parts:g}".replace(".", ",")
+
+
+def _situation(couple, enfants, parent_isole):
+    foyer = "couple marié ou pacsé" if couple else "parent isolé" if parent_isole else "personne seule"
+    if enfants:
+        foyer += f", {enfants} enfant{'s' if enfants > 1 else ''} à charge"
+    return foyer
@@ -0,0 +1,413 @@
+"""
+Bulletin de paie : du brut au net (et du net au brut) avec les taux de la fiche
+comprendre-paie/taux_cotisations_officiels.txt.
+
+La fiche est lue et vérifiée au chargement (`lire_bareme`) : chaque taux, plafond et seuil
+de taux réduit utilisé vient du texte, et la version du barème (date d'application et
+empreinte du fichier) accompagne chaque résultat. Une fiche modifiée est relue au
+calcul suivant ; un taux devenu introuvable lève `BaremeIncomplet` plutôt qu'un calcul faux.
+
+- `simuler(bruts, ...)` : toutes les lignes du bulletin (bases, tranches plafonnées,
+  parts salariale et patronale) pour des tableaux de salaires mensuels bruts (NumPy) ;
+- `bulletin(brut, ...)` : un salarié, ligne par ligne ;
+- `brut_pour_net(nets, ...)` : salaire brut correspondant à un net avant impôt (vectorisé) ;
+- `detecter(question)` : demande de conversion brut / net dans le chat.
+
+Hors réduction générale des cotisations, heures supplémentaires, mutuelle et prévoyance.
+"""
+import hashlib
+import os
+import re
+import threading
+from dataclasses import dataclass
+
+from ..index import RACINE
+from . import Calcul, euros, montants, pourcentage, simplifier
+
+FICHIER = os.path.join(RACINE, "comprendre-paie", "taux_cotisations_officiels.txt")
+
+
+class BaremeIncomplet(ValueError):
+    """La fiche des taux ne contient plus un taux attendu : le calcul est refusé."""
+
+
+# --- Lecture de la fiche ---
+_POURCENT = re.compile(r"(\d+(?:,\d+)?)\s*%")
+
+
+def _nombre(texte):
+    return float(re.sub(r"[\s  ]", "", texte).replace(",", "."))
+
+
+class _Fiche:
+    """Rubriques numérotées de la fiche : (section, titre) simplifiés -> {libellé simplifié: valeur}."""
+
+    def __init__(self, texte):
+        self.texte = simplifier(texte)
+        self.rubriques = {}
+        section, rubrique = "", None
+        for ligne in self.texte.splitlines():
+            ligne = ligne.strip()
+            if re.match(r"^[ivx]+\.\s", ligne):
+                section, rubrique = ligne, None
+            elif m := re.match(r"^\d+\.\s+(.*)", ligne):
+                rubrique = self.rubriques.setdefault((section, m.group(1)), {})
+            elif rubrique is not None and ligne.startswith("-") and ":" in ligne:
+                libelle, valeur = ligne[1:].split(":", 1)
+                rubrique[libelle.strip()] = valeur.strip()
+
+    def rubrique(self, titre):
+        trouvees = [(t, r) for (_, t), r in self.rubriques.items() if titre in t]
+        if len(trouvees) != 1:
+            raise BaremeIncomplet(f"rubrique « {titre} » {'introuvable' if not trouvees else 'ambiguë'}")
+        return trouvees[0]
+
+    def valeur(self, titre, libelle):
+        nom, rubrique = self.rubrique(titre)
+        valeurs = [v for l, v in rubrique.items() if libelle in l]
+        if not valeurs:
+            raise BaremeIncomplet(f"« {libelle} » introuvable dans « {nom} »")
+        return valeurs[0]
+
+    def taux(self, titre, libelle, part=None):
+        """Premier pourcentage de la ligne (ou celui de la part « pat. » / « sal. »), en fraction."""
+        valeur = self.valeur(titre, libelle)
+        m = re.search(rf"part {part}\.?\s*(\d+(?:,\d+)?)\s*%", valeur) if part else _POURCENT.search(valeur)
+        if not m:
+            raise BaremeIncomplet(f"taux « {libelle} » illisible dans « {titre} » : {valeur}")
+        return _nombre(m.group(1)) / 100
+
+    def cherche(self, motif, quoi):
+        m = re.search(motif, self.texte)
+        if not m:
+            raise BaremeIncomplet(f"{quoi} introuvable")
+        return _nombre(m.group(1))
+
+
+@dataclass(frozen=True)
+class Bareme:
+    version: str  # date d'application + empreinte du fichier
+    pmss: float
+    smic_mensuel: float
+    plafond_chomage: float  # en PMSS
+    plafond_t2: float  # en PMSS
+    abattement_csg: float
+    plafond_abattement_csg: float  # en PMSS (4 PASS annuels = 4 PMSS par mois)
+    seuil_maladie: float  # en SMIC, taux réduit en dessous
+    seuil_famille: float
+    taux: dict  # code -> (taux salarial, taux patronal)
+
+
+def lire_bareme(chemin=FICHIER):
+    with open(chemin, "r", encoding="utf-8") as f:
+        brut = f.read()
+    fiche = _Fiche(brut)
+    date = re.search(r"date d'application\s*:\s*(.+)", fiche.texte)
+    pmss = fiche.cherche(r"\(pmss\)\s*:\s*([\d\s  ,]+?)\s*€", "PMSS")
+
+    f = fiche
+    taux = {
+        "maladie": (f.taux("assurance maladie", "part salariale"), f.taux("assurance maladie", "taux normal")),
+        "maladie_reduit": (0.0, f.taux("assurance maladie", "taux reduit")),
+        "maladie_alsace_moselle": (_nombre(re.search(r"alsace-moselle\s*:\s*([\d,]+)", f.valeur(
+            "assurance maladie", "part salariale")).group(1)) / 100, 0.0),
+        "csa": (f.taux("autonomie", "part salariale"), f.taux("autonomie", "part patronale")),
+        "famille": (f.taux("allocations familiales", "part salariale"), f.taux("allocations familiales", "taux normal")),
+        "famille_reduit": (0.0, f.taux("allocations familiales", "taux reduit")),
+        "vieillesse_deplafonnee": (f.taux("vieillesse deplafonnee", "part salariale"),
+                                   f.taux("vieillesse deplafonnee", "part patronale")),
+        "vieillesse_plafonnee": (f.taux("vieillesse plafonnee", "part salariale"),
+                                 f.taux("vieillesse plafonnee", "part patronale")),
+        "csg_deductible": (f.taux("csg deductible", "part salariale"), 0.0),
+        "csg_non_deductible": (f.taux("csg non deductible", "part salariale"), 0.0),
+        "crds": (f.taux("crds", "part salariale"), 0.0),
+        "chomage": (f.taux("assurance chomage", "part salariale"), f.taux("assurance chomage", "part patronale")),
+        "ags": (f.taux("ags", "part salariale"), f.taux("ags", "part patronale")),
+        "retraite_t1": (f.taux("tranche 1", "cotisation points", "sal"), f.taux("tranche 1", "cotisation points", "pat")),
+        "ceg_t1": (f.taux("tranche 1", "ceg", "sal"), f.taux("tranche 1", "ceg", "pat")),
+        "retraite_t2": (f.taux("tranche 2", "cotisation points", "sal"), f.taux("tranche 2", "cotisation points", "pat")),
+        "ceg_t2": (f.taux("tranche 2", "ceg", "sal"), f.taux("tranche 2", "ceg", "pat")),
+        "cet": (f.taux("cet", "part salariale"), f.taux("cet", "part patronale")),
+        "apec": (f.taux("apec", "part salariale"), f.taux("apec", "part patronale")),
+        "fnal_moins_50": (0.0, f.taux("fnal", "moins de 50")),
+        "fnal_50": (0.0, f.taux("fnal", "50 salaries et plus")),
+        "dialogue_social": (0.0, f.taux("dialogue social", "part patronale")),
+        "formation_moins_11": (0.0, f.taux("formation professionnelle", "moins de 11")),
+        "formation_11": (0.0, f.taux("formation professionnelle", "11 salaries et plus")),
+        "apprentissage": (0.0, f.taux("formation professionnelle", "taxe d'apprentissage")),
+        "cpf_cdd": (0.0, f.taux("formation professionnelle", "cpf-cdd")),
+        "peec": (0.0, f.taux("construction", "50 salaries et plus")),
+    }
+    titre_t2, _ = fiche.rubrique("tranche 2")
+    bornes_t2 = re.findall(r"(\d[\d\s  ]*)\s*€", titre_t2)
+    return Bareme(
+        version=f"{date.group(1).strip() if date else 'date inconnue'} ({hashlib.sha256(brut.encode('utf-8')).hexdigest()[:8]})",
+        pmss=pmss,
+        smic_mensuel=fiche.cherche(r"base 35h\s*:\s*([\d\s  ,]+?)\s*€", "SMIC mensuel"),
+        plafond_chomage=_nombre(re.search(r"(\d+)\s*pmss", fiche.valeur("assurance chomage", "assiette")).group(1)),
+        plafond_t2=_nombre(bornes_t2[-1]) / pmss if bornes_t2 else 8.0,
+        abattement_csg=fiche.cherche(r"abattement de ([\d,]+)\s*%", "abattement CSG") / 100,
+        plafond_abattement_csg=fiche.cherche(r"abattement de [\d,]+\s*% limite a (\d+) pass", "plafond de l'abattement CSG"),
+        seuil_maladie=_nombre(re.search(r"<=\s*([\d,]+)\s*smic", fiche.valeur("assurance maladie", "taux reduit")).group(1)),
+        seuil_famille=_nombre(re.search(r"<=\s*([\d,]+)\s*smic", fiche.valeur("allocations familiales", "taux reduit")).group(1)),
+        taux=taux,
+    )
+
+
+_verrou = threading.Lock()
+_courant = {}  # chemin -> (date de modification, Bareme)
+
+
+def bareme_courant(chemin=FICHIER):
+    """Barème de la fiche, relu si le fichier a changé depuis la dernière lecture."""
+    mtime = os.stat(chemin).st_mtime_ns
+    with _verrou:
+        connu = _courant.get(chemin)
+        if connu is None or connu[0] != mtime:
+            connu = _courant[chemin] = (mtime, lire_bareme(chemin))
+        return connu[1]
+
+
+# --- Calcul ---
+RUBRIQUES = ("Santé", "Accidents du travail", "Retraite", "Famille", "Chômage", "CSG / CRDS", "Autres contributions")
+
+
+def _lignes(np, brut, b, cadre, effectif, taux_atmp, versement_mobilite, alsace_moselle, cdd):
+    """(code, libellé, rubrique, base, taux salarial, taux patronal) ; bases et taux sont des tableaux."""
+    t = b.taux
+    pmss, smic = b.pmss, b.smic_mensuel
+    plafonne = np.minimum(brut, pmss)
+    quatre_pmss = np.minimum(brut, b.plafond_chomage * pmss)
+    zero = np.zeros_like(brut)
+
+    maladie_reduit = brut <= b.seuil_maladie * smic
+    yield ("maladie", "Assurance maladie, maternité, invalidité, décès", "Santé", brut,
+           t["maladie_alsace_moselle"][0] if alsace_moselle else t["maladie"][0],
+           np.where(maladie_reduit, t["maladie_reduit"][1], t["maladie"][1]))
+    yield ("csa", "Contribution solidarité autonomie", "Santé", brut, *t["csa"])
+    if taux_atmp:
+        yield ("atmp", "Accidents du travail, maladies professionnelles", "Accidents du travail", brut, 0.0, taux_atmp)
+    yield ("vieillesse_plafonnee", "Assurance vieillesse plafonnée", "Retraite", plafonne, *t["vieillesse_plafonnee"])
+    yield ("vieillesse_deplafonnee", "Assurance vieillesse déplafonnée", "Retraite", brut, *t["vieillesse_deplafonnee"])
+    tranche_2 = np.clip(brut - pmss, 0.0, (b.plafond_t2 - 1) * pmss)
+    yield ("retraite_t1", "Retraite complémentaire Agirc-Arrco T1", "Retraite", plafonne, *t["retraite_t1"])
+    yield ("ceg_t1", "Contribution d'équilibre général T1", "Retraite", plafonne, *t["ceg_t1"])
+    yield ("retraite_t2", "Retraite complémentaire Agirc-Arrco T2", "Retraite", tranche_2, *t["retraite_t2"])
+    yield ("ceg_t2", "Contribution d'équilibre général T2", "Retraite", tranche_2, *t["ceg_t2"])
+    # CET : due seulement au-delà d'un PMSS, sur T1 + T2
+    yield ("cet", "Contribution d'équilibre technique", "Retraite",
+           np.where(brut > pmss, plafonne + tranche_2, zero), *t["cet"])
+    if cadre:
+        yield ("apec", "APEC", "Retraite", quatre_pmss, *t["apec"])
+    yield ("famille", "Allocations familiales", "Famille", brut, t["famille"][0],
+           np.where(brut <= b.seuil_famille * smic, t["famille_reduit"][1], t["famille"][1]))
+    yield ("chomage", "Assurance chômage", "Chômage", quatre_pmss, *t["chomage"])
+    yield ("ags", "AGS (garantie des salaires)", "Chômage", quatre_pmss, *t["ags"])
+    assiette_csg = brut - b.abattement_csg * np.minimum(brut, b.plafond_abattement_csg * pmss)
+    yield ("csg_deductible", "CSG déductible", "CSG / CRDS", assiette_csg, *t["csg_deductible"])
+    yield ("csg_non_deductible", "CSG non déductible", "CSG / CRDS", assiette_csg, *t["csg_non_deductible"])
+    yield ("crds", "CRDS", "CSG / CRDS", assiette_csg, *t["crds"])
+    if effectif < 50:
+        yield ("fnal", "FNAL", "Autres contributions", plafonne, *t["fnal_moins_50"])
+    else:
+        yield ("fnal", "FNAL", "Autres contributions", brut, *t["fnal_50"])
+        yield ("peec", "Participation à l'effort de construction", "Autres contributions", brut, *t["peec"])
+    yield ("dialogue_social", "Contribution au dialogue social", "Autres contributions", brut, *t["dialogue_social"])
+    yield ("formation", "Formation professionnelle", "Autres contributions", brut,
+           *t["formation_moins_11" if effectif < 11 else "formation_11"])
+    yield ("apprentissage", "Taxe d'apprentissage", "Autres contributions", brut, *t["apprentissage"])
+    if cdd:
+        yield ("cpf_cdd", "CPF-CDD", "Autres contributions", brut, *t["cpf_cdd"])
+    if versement_mobilite:
+        yield ("versement_mobilite", "Versement mobilité", "Autres contributions", brut, 0.0, versement_mobilite)
+
+
+# Contributions salariales non déductibles du revenu imposable
+NON_DEDUCTIBLES = ("csg_non_deductible", "crds")
+
+
+def simuler(bruts, cadre=False, effectif=20, taux_atmp=0.0, versement_mobilite=0.0, alsace_moselle=False,
+            cdd=False, bareme=None):
+    """
+    Bulletins de paie pour des salaires mensuels bruts (tableau ou scalaire). Renvoie
+    {"version", "lignes": {code: {libelle, rubrique, base, taux_salarial, taux_patronal, salarial, patronal}},
+    "cotisations_salariales", "cotisations_patronales", "net_avant_impot", "net_imposable", "cout_employeur"}.
+    Le taux AT/MP et le versement mobilité dépendent de l'entreprise : 0 s'ils ne sont pas fournis.
+    """
+    import numpy as np
+
+    b = bareme or bareme_courant()
+    brut = np.maximum(np.asarray(bruts, dtype=np.float64), 0.0)
+    lignes = {}
+    salariales = np.zeros_like(brut)
+    patronales = np.zeros_like(brut)
+    non_deductibles = np.zeros_like(brut)
+    for code, libelle, rubrique, base, taux_sal, taux_pat in _lignes(
+        np, brut, b, cadre, effectif, taux_atmp, versement_mobilite, alsace_moselle, cdd
+    ):
+        salarial = base * taux_sal
+        patronal = base * taux_pat
+        lignes[code] = {
+            "libelle": libelle, "rubrique": rubrique, "base": base,
+            "taux_salarial": np.broadcast_to(taux_sal, brut.shape), "taux_patronal": np.broadcast_to(taux_pat, brut.shape),
+            "salarial": salarial, "patronal": patronal,
+        }
+        salariales = salariales + salarial
+        patronales = patronales + patronal
+        if code in NON_DEDUCTIBLES:
+            non_deductibles = non_deductibles + salarial
+    net = brut - salariales
+    return {
+        "version": b.version,
+        "lignes": lignes,
+        "cotisations_salariales": salariales,
+        "cotisations_patronales": patronales,
+        "net_avant_impot": net,
+        "net_imposable": net + non_deductibles,
+        "cout_employeur": brut + patronales,
+    }
+
+
+@dataclass(frozen=True)
+class Ligne:
+    code: str
+    libelle: str
+    rubrique: str
+    base: float
+    taux_salarial: float
+    salarial: float
+    taux_patronal: float
+    patronal: float
+
+
+@dataclass(frozen=True)
+class Bulletin:
+    version: str
+    brut: float
+    lignes: tuple
+    cotisations_salariales: float
+    cotisations_patronales: float
+    net_avant_impot: float
+    net_imposable: float
+    cout_employeur: float
+
+
+def bulletin(brut, **options):
+    """Bulletin d'un salarié (montants arrondis au centime), options comme `simuler`."""
+    r = simuler(brut, **options)
+    lignes = tuple(
+        Ligne(code, l["libelle"], l["rubrique"], round(float(l["base"]), 2), float(l["taux_salarial"]),
+              round(float(l["salarial"]), 2), float(l["taux_patronal"]), round(float(l["patronal"]), 2))
+        for code, l in r["lignes"].items()
+    )
+    return Bulletin(
+        version=r["version"], brut=float(brut), lignes=lignes,
+        **{cle: round(float(r[cle]), 2) for cle in (
+            "cotisations_salariales", "cotisations_patronales", "net_avant_impot", "net_imposable", "cout_employeur"
+        )},
+    )
+
+
+def brut_pour_net(nets, iterations=60, **options):
+    """
+    Salaire brut donnant le net avant impôt voulu (tableau ou scalaire). Le net croît avec
+    le brut (fonction affine par morceaux) : bissection vectorisée, précise au centime.
+    """
+    import numpy as np
+
+    nets = np.asarray(nets, dtype=np.float64)
+    options.setdefault("bareme", bareme_courant())
+    bas = nets.copy()
+    haut = np.maximum(nets * 2.0, 1.0)
+    for _ in range(iterations):
+        milieu = (bas + haut) / 2
+        trop = simuler(milieu, **options)["net_avant_impot"] > nets
+        haut = np.where(trop, milieu, haut)
+        bas = np.where(trop, bas, milieu)
+    return np.round((bas + haut) / 2, 2)
+
+
+# --- Détection dans le chat ---
+_SUJET = re.compile(r"\b(brut|net|cotisations?|charges?|cout employeur|cout total|super.?brut)\b")
+_EXPLICATION = re.compile(
+    r"\b(pourquoi|comment|expliqu\w*|difference|a quoi|c'est quoi|qu'est-ce|definition|obligatoire|mention|"
+    r"heures? sup\w*|conge\w*|prime\w*|mutuelle|prevoyance)\b"
+)
+_CADRE = re.compile(r"\b(?<!non )(?<!non-)cadres?\b")
+_EFFECTIF = re.compile(r"(\d+)\s*(?:salaries|employes|personnes)\b")
+
+
+def detecter(question):
+    texte = simplifier(question)
+    if not _SUJET.search(texte):
+        return None
+    candidats = [m for m in montants(texte) if m.valeur >= 100 and not (not m.en_euros and 1990 <= m.valeur <= 2100)]
+    if not candidats:
+        return None
+    montant = max(candidats, key=lambda m: (m.en_euros, m.valeur))
+
+    # Montant annuel (« 40 000 € brut par an ») : ramené au mois
+    suite = texte[montant.fin:montant.fin + 40]
+    annuel = montant.periode == "an" or bool(re.search(r"\b(par an|annuel\w*|/an)\b", suite)) or (
+        montant.periode != "mois" and montant.valeur >= 15000
+    )
+    mensuel = montant.valeur / 12 if annuel else montant.valeur
+
+    # Sens de la conversion : le mot qui qualifie le montant (« 2 000 € net », « net de 2 000 € »)
+    autour = texte[max(montant.debut - 25, 0):montant.debut] + " " + suite[:25]
+    mot_apres = re.match(r"\s*(?:€|euros?)?\s*(?:par mois|mensuels?|par an|annuels?)?\s*(brut|net)", suite)
+    if mot_apres:
+        donne = mot_apres.group(1)
+    else:
+        avant = re.findall(r"\b(brut|net)\b", texte[max(montant.debut - 25, 0):montant.debut])
+        donne = avant[-1] if avant else ("net" if "net" in autour and "brut" not in texte else "brut")
+
+    options = {
+        "cadre": bool(_CADRE.search(texte)),
+        "alsace_moselle": bool(re.search(r"\b(alsace|moselle|bas-rhin|haut-rhin)\b", texte)),
+        "cdd": bool(re.search(r"\bcdd\b", texte)),
+    }
+    if effectif := _EFFECTIF.search(texte):
+        options["effectif"] = int(effectif.group(1))
+
+    if donne == "net":
+        brut = float(brut_pour_net(mensuel, **options))
+    else:
+        brut = mensuel
+    b = bulletin(brut, **options)
+
+    lignes = [
+        "| Cotisation | Base | Taux salarial | Part salariale | Taux patronal | Part patronale |",
+        "|---|---:|---:|---:|---:|---:|",
+    ]
+    for l in b.lignes:
+        if l.salarial or l.patronal:
+            lignes.append(
+                f"| {l.libelle} | {euros(l.base, 2)} | {pourcentage(l.taux_salarial, 3) if l.taux_salarial else '-'} | "
+                f"{euros(l.salarial, 2) if l.salarial else '-'} | {pourcentage(l.taux_patronal, 3)} | "
+                f"{euros(l.patronal, 2)} |"
+            )
+    profil = ", ".join(filter(None, [
+        "cadre" if options["cadre"] else "non-cadre",
+        f"entreprise de {options['effectif']} salariés" if "effectif" in options else "entreprise de moins de 50 salariés",
+        "Alsace-Moselle" if options["alsace_moselle"] else "",
+        "CDD" if options["cdd"] else "",
+    ]))
+    synthese = [
+        f"- Salaire brut mensuel : **{euros(b.brut, 2)}**" + (f" (net de {euros(mensuel, 2)} demandé)" if donne == "net" else ""),
+        f"- Cotisations salariales : − {euros(b.cotisations_salariales, 2)}",
+        f"- **Net à payer avant impôt : {euros(b.net_avant_impot, 2)}**",
+        f"- Net imposable : {euros(b.net_imposable, 2)}",
+        f"- Cotisations patronales : {euros(b.cotisations_patronales, 2)} ; coût employeur : {euros(b.cout_employeur, 2)}",
+    ]
+    if annuel:
+        synthese.append(f"- Sur l'année (× 12) : brut {euros(b.brut * 12)}, net avant impôt {euros(b.net_avant_impot * 12)}")
+    resume = (
+        f"Profil : {profil} ; barème du {b.version}.\n" + "\n".join(synthese) + "\n\n" + "\n".join(lignes)
+    )
+    reponse = (
+        "**Du brut au net, ligne par ligne** (taux officiels 2025) :\n\n" + resume
+        + "\n\n*Estimation informative : hors réduction générale des cotisations, accidents du travail "
+        "(taux propre à l'entreprise), versement mobilité, mutuelle, prévoyance et heures supplémentaires.*"
+    )
+    return Calcul(reponse=reponse, resume=resume, direct=not _EXPLICATION.search(texte))
@@ -0,0 +1,148 @@
+"""
+Client du service HTTP (`moteur.service`) avec les mêmes méthodes que `Moteur` pour
+les pages Streamlit : avec MOTEUR_API_URL, `obtenir_moteur()` le renvoie à la place du
+moteur local, et les pages ne font plus qu'afficher (ni index ni modèle dans le processus).
+
+Bibliothèque standard uniquement (urllib) ; la réponse de /ask est lue au fil des
+Server-Sent Events, fragment par fragment.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from .domaines import DOMAINES
+
+journal = logging.getLogger(__name__)
+
+URL = os.environ.get("MOTEUR_API_URL", "").rstrip("/")
+DELAI = float(os.environ.get("MOTEUR_API_DELAI", "120"))  # lecture d'une réponse (secondes)
+DELAI_ETAT = 2.0
+DUREE_ETAT = 1.0  # l'état des index est partagé par les éléments d'une même page
+ATTENTE_MAX = float(os.environ.get("MOTEUR_API_ATTENTE", "300"))
+
+
+class ServiceIndisponible(RuntimeError):
+    pass
+
+
+class MoteurDistant:
+    def __init__(self, url=URL):
+        self.url = url
+        self._verrou = threading.Lock()
+        self._etats, self._lu = {}, 0.0
+
+    def _requete(self, chemin, corps=None, delai=DELAI):
+        donnees = None if corps is None else json.dumps(corps, ensure_ascii=False).encode("utf-8")
+        requete = urllib.request.Request(
+            self.url + chemin, data=donnees, method="GET" if corps is None else "POST",
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            return urllib.request.urlopen(requete, timeout=delai)
+        except urllib.error.HTTPError as e:
+            if e.code == 503:
+                return e  # /readyz : index en préparation, le corps décrit l'état
+            raise ServiceIndisponible(f"{e.code} {e.read().decode('utf-8', 'replace')}") from e
+        except OSError as e:
+            raise ServiceIndisponible(f"service {self.url} injoignable : {e}") from e
+
+    # --- État des index ---
+    @property
+    def etats(self):
+        with self._verrou:
+            if time.monotonic() - self._lu > DUREE_ETAT:
+                try:
+                    with self._requete("/readyz", delai=DELAI_ETAT) as reponse:
+                        domaines = json.load(reponse)["domaines"]
+                except ServiceIndisponible as e:
+                    domaines = {nom: {"etat": "erreur", "erreur": str(e)} for nom in DOMAINES}
+                maintenant = time.perf_counter()
+                for etat in domaines.values():
+                    # Horloge locale pour l'affichage du temps écoulé (voir interface.etat_du_moteur)
+                    etat["debut"] = maintenant - etat.pop("ecoule", 0.0)
+                self._etats, self._lu = domaines, time.monotonic()
+            return self._etats
+
+    def prechauffer(self, nom):
+        # Le service préchauffe ses index à son démarrage
+        pass
+
+    def attendre(self, nom):
+        """Attend que l'index du domaine soit prêt côté service ; True, ou None si le domaine n'a aucune fiche."""
+        limite = time.monotonic() + ATTENTE_MAX
+        while True:
+            etat = self.etats.get(nom, {"etat": "erreur", "erreur": "domaine non servi"})
+            if etat["etat"] == "pret":
+                return True
+            if etat["etat"] == "vide":
+                return None
+            if etat["etat"] == "erreur":
+                raise ServiceIndisponible(etat.get("erreur"))
+            if time.monotonic() > limite:
+                raise ServiceIndisponible(f"index {nom} toujours en préparation après {ATTENTE_MAX:.0f} s")
+            time.sleep(DUREE_ETAT)
+
+    def stats_premier_fragment(self, nom):
+        return self.etats.get(nom, {}).get("premier_fragment")
+
+    # --- Questions ---
+    def repondre(self, nom, question, stream=False, session=None, en_attente=None):
+        """Comme `Moteur.repondre` : itérateur des fragments, ou None si les fiches ne couvrent pas la question."""
+        reponse = self._requete("/ask", {"domaine": nom, "question": question, "session": session})
+        evenements = _lire_sse(reponse)
+        genre, donnees = next(evenements, ("erreur", {"message": "réponse interrompue"}))
+        while genre == "attente":
+            if en_attente is not None:
+                en_attente(donnees["position"])
+            genre, donnees = next(evenements, ("erreur", {"message": "réponse interrompue"}))
+        if genre == "aucun":
+            reponse.close()
+            return None
+
+        def fragments():
+            evenement = (genre, donnees)
+            with reponse:
+                while evenement[0] == "fragment":
+                    yield evenement[1]["texte"]
+                    evenement = next(evenements, ("erreur", {"message": "réponse interrompue"}))
+            if evenement[0] == "erreur":
+                raise ServiceIndisponible(
+                    f"{evenement[1].get('message')} (réf. {evenement[1].get('reference', '-')})"
+                )
+
+        return fragments() if stream else iter(["".join(fragments())])
+
+    def repondre_plusieurs(self, nom, questions):
+        """Réponses complètes (texte ou None) à un lot de questions, en un seul appel."""
+        with self._requete("/ask_many", {"domaine": nom, "questions": list(questions)}) as reponse:
+            return [r["reponse"] for r in json.load(reponse)["reponses"]]
+
+
+def _lire_sse(reponse):
+    """`(evenement, donnees)` pour chaque événement du flux."""
+    genre, donnees = "message", []
+    for ligne in reponse:
+        ligne = ligne.decode("utf-8").rstrip("\r\n")
+        if ligne.startswith("event:"):
+            genre = ligne[6:].strip()
+        elif ligne.startswith("data:"):
+            donnees.append(ligne[5:].strip())
+        elif not ligne and donnees:
+            yield genre, json.loads("\n".join(donnees))
+            genre, donnees = "message", []
+
+
+_client = None
+_verrou_client = threading.Lock()
+
+
+def obtenir_client(url=URL):
+    global _client
+    with _verrou_client:
+        if _client is None:
+            _client = MoteurDistant(url)
+        return _client
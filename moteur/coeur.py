@@ -0,0 +1,486 @@
+"""
+Le moteur partagé : un seul index (une collection par domaine) et une seule
+instance de chaque modèle d'embedding pour tous les assistants du processus.
+
+Les imports lourds (SDK Google, ChromaDB, NumPy, SentenceTransformer) sont
+différés : l'index est construit en arrière-plan par `prechauffer`, pendant que
+l'interface est déjà affichée.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from . import api_google, index, metriques, ordonnanceur, resilience
+from .cache import CacheLRU, normaliser_question
+from .domaines import DOMAINES
+from .embeddings import obtenir_embeddings
+from .ingestion import RapportIngestion
+
+journal = logging.getLogger(__name__)
+
+# Référence pour mesurer le temps jusqu'à l'interactivité après un (re)démarrage
+DEMARRAGE = time.perf_counter()
+
+# Mode dégradé (Gemini indisponible) : seuil de similarité abaissé pour réutiliser une réponse proche
+SEUIL_SECOURS = float(os.environ.get("CACHE_REPONSES_SEUIL_SECOURS", "0.85"))
+
+
+class Moteur:
+    def __init__(self, dossier_index=index.DOSSIER_INDEX, backend=None):
+        self.dossier_index = dossier_index
+        # "chroma" (HNSW + SQLite) ou "numpy" (recherche exacte + BM25, sans ChromaDB)
+        self.backend = backend or os.environ.get("MOTEUR_INDEX", "chroma")
+        self._client = None
+        self._collections = {}
+        self._verrou = threading.Lock()
+        self._verrous_domaines = {nom: threading.Lock() for nom in DOMAINES}
+        # Embeddings des questions déjà posées (clé : modèle + question normalisée)
+        self.cache_requetes = CacheLRU(
+            taille_max=int(os.environ.get("CACHE_REQUETES_TAILLE", "4096")),
+            ttl=float(os.environ.get("CACHE_REQUETES_TTL", "86400")),
+        )
+        self._caches_reponses = {}
+        self._contextes = {}
+        # Fiches et corpus de chaque index chargé, pour le rechargement à chaud (voir moteur.surveillance)
+        self.signatures = {}
+        self._empreintes = {}
+        # Délai entre la question et le premier fragment affiché (secondes), par domaine
+        self.premiers_fragments = {nom: deque(maxlen=1000) for nom in DOMAINES}
+        self._prechauffages = {}
+        self._pipeline = None
+        self.etats = {nom: {"etat": "attente"} for nom in DOMAINES}
+
+    @property
+    def client(self):
+        with self._verrou:
+            if self._client is None:
+                self._client = index.ouvrir_client(self.dossier_index)
+            return self._client
+
+    def charger(self, nom, progression=None):
+        """
+        Ouvre (et met à jour si besoin) la collection du domaine.
+        Renvoie `(collection, echecs)` ; la collection vaut None si l'index est vide.
+        """
+        domaine = DOMAINES[nom]
+        collection = self._collections.get(nom)
+        if collection is not None:
+            return collection, 0
+        # Un verrou par domaine : deux sessions qui démarrent ensemble n'indexent pas deux fois
+        with self._verrous_domaines[nom]:
+            if nom in self._collections:
+                return self._collections[nom], 0
+
+            # Signature prise avant la lecture : une fiche modifiée pendant l'indexation sera rechargée
+            signature = index.signature_fiches(domaine.chemin, domaine.fichiers)
+            # Première lecture pour les seuls identifiants (empreinte du corpus) ; les textes
+            # ne sont relus, en flux, que s'il faut alimenter l'index
+            ids = index.ids_dossier(domaine.chemin, domaine.fichiers, domaine.decoupage, domaine.modele_embedding)
+            if not ids:
+                return None, 0
+            empreinte_corpus = index.empreinte_ids(ids)
+            del ids
+
+            # Artefact préconstruit (python -m moteur.artefact) : ouverture en mmap, aucun embedding à calculer
+            from . import artefact
+
+            collection, echecs = artefact.ouvrir(nom, domaine.modele_embedding, empreinte_corpus), 0
+            if collection is None:
+                collection = self._ouvrir_collection(nom, domaine.modele_embedding)
+                embeddings = obtenir_embeddings(domaine.modele_embedding)
+                rapport = RapportIngestion()
+                extraits = index.iterer_extraits(domaine.chemin, domaine.fichiers, domaine.decoupage, rapport)
+                _, echecs = index.synchroniser(collection, extraits, embeddings, progression, rapport)
+            if collection.count() == 0:
+                return None, echecs
+
+            # Les réponses en cache ne valent que pour la version du corpus qui les a produites
+            self.cache_reponses(nom).valider_corpus(empreinte_corpus)
+
+            self.signatures[nom], self._empreintes[nom] = signature, empreinte_corpus
+            self._collections[nom] = collection
+            return collection, echecs
+
+    def recharger(self, nom):
+        """
+        Aligne l'index chargé du domaine sur ses fiches actuelles, en flux comme `charger` :
+        seuls les extraits modifiés sont vectorisés, puis l'index bascule en une fois (les
+        recherches en cours gardent l'ancienne version). Vide le cache de réponses et le
+        contexte complet du domaine. Si des lots n'ont pu être vectorisés, les anciens extraits
+        restent et la signature n'est pas retenue : la surveillance réessaiera.
+        Réservé à l'index numpy (MOTEUR_INDEX=numpy ou artefact) : ChromaDB n'a pas de bascule
+        atomique, les recherches verraient anciens et nouveaux extraits mêlés ; les fiches
+        modifiées sont alors prises en compte au prochain démarrage.
+        Renvoie `(ajoutes, supprimes)`, ou None si le domaine n'est pas chargé ou n'a pas changé.
+        """
+        domaine = DOMAINES[nom]
+        with self._verrous_domaines[nom]:
+            collection = self._collections.get(nom)
+            if collection is None:
+                return None
+            signature = index.signature_fiches(domaine.chemin, domaine.fichiers)
+            if not hasattr(collection, "par_lots"):
+                if signature != self.signatures.get(nom):
+                    journal.warning("[%s] fiches modifiées : rechargement à chaud réservé à MOTEUR_INDEX=numpy, "
+                                    "elles seront indexées au prochain démarrage", nom)
+                    self.signatures[nom] = signature  # un seul avertissement par modification
+                return None
+            ids = index.ids_dossier(domaine.chemin, domaine.fichiers, domaine.decoupage, domaine.modele_embedding)
+            if not ids:
+                # Dossier vidé ou en cours de copie : mieux vaut l'ancien index qu'aucun
+                journal.warning("[%s] aucune fiche lisible : index conservé", nom)
+                return None
+            empreinte_corpus = index.empreinte_ids(ids)
+            del ids
+            if empreinte_corpus == self._empreintes.get(nom):
+                self.signatures[nom] = signature
+                return None
+
+            rapport = RapportIngestion()
+            extraits = index.iterer_extraits(domaine.chemin, domaine.fichiers, domaine.decoupage, rapport)
+            with metriques.mesurer("rechargement", nom):
+                ajoutes, echecs = index.synchroniser(
+                    collection, extraits, obtenir_embeddings(domaine.modele_embedding), rapport=rapport,
+                    en_service=True,
+                )
+            supprimes = rapport.supprimes
+            if echecs:
+                journal.warning("[%s] %d extraits non vectorisés : nouvel essai au prochain passage", nom, echecs)
+            else:
+                self.signatures[nom], self._empreintes[nom] = signature, empreinte_corpus
+
+        self.cache_reponses(nom).valider_corpus(empreinte_corpus)
+        with self._verrou:
+            contexte = self._contextes.get(nom)
+        if contexte is not None:
+            contexte.invalider(corpus_modifie=True)
+        journal.info("[%s] fiches rechargées : %d extraits ajoutés, %d supprimés", nom, ajoutes, supprimes)
+        return ajoutes, supprimes
+
+    def prechauffer(self, nom):
+        """Lance la construction de l'index du domaine en arrière-plan (une seule fois par processus)."""
+        with self._verrou:
+            if nom in self._prechauffages:
+                return
+            self.etats[nom] = {"etat": "construction", "debut": time.perf_counter()}
+            fil = threading.Thread(target=self._prechauffer, args=(nom,), name=f"prechauffage-{nom}", daemon=True)
+            self._prechauffages[nom] = fil
+        fil.start()
+
+    def _prechauffer(self, nom):
+        etat = self.etats[nom]
+        try:
+            # Import du SDK Google ici plutôt qu'au premier message
+            api_google.genai()
+            collection, echecs = self.charger(nom, progression=lambda rapport: etat.update(rapport.en_dict()))
+            etat.update(etat="pret" if collection is not None else "vide", echecs=echecs)
+        except Exception as e:
+            journal.exception("Préchauffage de %s impossible", nom)
+            etat.update(etat="erreur", erreur=str(e))
+        etat["duree"] = time.perf_counter() - etat["debut"]
+
+    def attendre(self, nom):
+        """
+        Attend la fin du préchauffage du domaine et renvoie sa collection (ou None).
+        En cas d'échec du préchauffage, retente un chargement direct (l'erreur remonte alors).
+        """
+        self.prechauffer(nom)
+        self._prechauffages[nom].join()
+        if nom not in self._collections and self.etats[nom]["etat"] == "erreur":
+            collection, echecs = self.charger(nom)
+            self.etats[nom].update(etat="pret" if collection is not None else "vide", echecs=echecs)
+            return collection
+        return self._collections.get(nom)
+
+    def _ouvrir_collection(self, nom, modele):
+        if self.backend == "numpy":
+            from .recherche import IndexNumpy
+
+            return IndexNumpy(
+                os.path.join(self.dossier_index, "numpy", f"{index.nom_collection(nom, modele)}.npz"),
+                dtype=obtenir_embeddings(modele).dtype_stockage,
+            )
+        return index.ouvrir_collection(self.client, nom, modele)
+
+    def rechercher(self, nom, question):
+        """Renvoie les extraits les plus proches de la question (liste de textes)."""
+        domaine = DOMAINES[nom]
+        collection, _ = self.charger(nom)
+        if collection is None:
+            return []
+        q_vec = self.vectoriser_requete(domaine.modele_embedding, question, nom)
+        with metriques.mesurer("recherche", nom, k=domaine.n_results):
+            return collection.rechercher(q_vec, question, domaine.n_results)
+
+    def vectoriser_requete(self, modele, question, nom="-"):
+        cle = (modele, normaliser_question(question))
+        q_vec = self.cache_requetes.get(cle)
+        metriques.compter_cache("requetes", nom, q_vec is not None)
+        if q_vec is None:
+            with metriques.mesurer("embedding_requete", nom, modele=modele):
+                q_vec = obtenir_embeddings(modele).vectoriser_requete(question)
+            self.cache_requetes.put(cle, q_vec)
+        return q_vec
+
+    def cache_reponses(self, nom):
+        from .cache_reponses import CacheReponses
+
+        with self._verrou:
+            if nom not in self._caches_reponses:
+                disque = os.environ.get("CACHE_REPONSES_DISQUE") == "1"
+                self._caches_reponses[nom] = CacheReponses(
+                    nom,
+                    seuil=float(os.environ.get("CACHE_REPONSES_SEUIL", "0.95")),
+                    taille_max=int(os.environ.get("CACHE_REPONSES_TAILLE", "500")),
+                    dossier=os.path.join(self.dossier_index, "reponses") if disque else None,
+                )
+            return self._caches_reponses[nom]
+
+    def reponse_en_cache(self, nom, question):
+        """Réponse déjà donnée à une question quasi identique, ou None."""
+        if self.charger(nom)[0] is None:
+            return None
+        q_vec = self.vectoriser_requete(DOMAINES[nom].modele_embedding, question, nom)
+        with metriques.mesurer("cache_reponses", nom):
+            reponse = self.cache_reponses(nom).chercher(q_vec)
+        metriques.compter_cache("reponses", nom, reponse is not None)
+        return reponse
+
+    def memoriser_reponse(self, nom, question, reponse):
+        q_vec = self.vectoriser_requete(DOMAINES[nom].modele_embedding, question, nom)
+        self.cache_reponses(nom).ajouter(normaliser_question(question), q_vec, reponse)
+
+    def contexte_complet(self, nom):
+        from .contexte_complet import ContexteComplet
+
+        with self._verrou:
+            if nom not in self._contextes:
+                self._contextes[nom] = ContexteComplet(nom)
+            return self._contextes[nom]
+
+    def calculer(self, nom, question):
+        """Calcul exact d'une question chiffrée par le moteur local du domaine (voir `moteur.calculs`), ou None."""
+        calculateur = DOMAINES[nom].calculateur
+        if not calculateur:
+            return None
+        from . import calculs
+
+        try:
+            with metriques.mesurer("calcul", nom) as trace:
+                calcul = calculs.detecter(calculateur, question)
+                trace.update(detecte=calcul is not None, direct=bool(calcul and calcul.direct))
+        except Exception as e:
+            # Une question mal comprise par le calculateur reste traitée par Gemini
+            metriques.signaler_erreur("calcul", nom, e)
+            return None
+        return calcul
+
+    def construire_prompt(self, nom, contexte, question):
+        prompt = DOMAINES[nom].consigne.format(contexte=contexte, question=question)
+        metriques.observer_tokens("contexte", nom, metriques.estimer_tokens(contexte))
+        metriques.observer_tokens("prompt", nom, metriques.estimer_tokens(prompt))
+        return prompt
+
+    def generer(self, nom, prompt, stream=False):
+        """
+        Appel à Gemini borné dans le temps (voir `moteur.resilience`) : lève
+        `GeminiIndisponible` si le service ne répond pas à temps ou est suspendu.
+        """
+        from .contexte_complet import QuestionSeule
+
+        if isinstance(prompt, QuestionSeule):
+            model = self.contexte_complet(nom).modele()
+        else:
+            model = api_google.genai().GenerativeModel(DOMAINES[nom].modele_generation)
+        # Chaque requête envoyée (reprise, couverture) prend son tour dans la file du quota Gemini
+        jetons = ordonnanceur.estimer(prompt)
+        if not stream:
+            return resilience.generation.appeler(
+                lambda: model.generate_content(prompt), quota=ordonnanceur.generation, jetons=jetons,
+            )
+        return resilience.generation.flux(
+            lambda: model.generate_content(prompt, stream=True),
+            delai_premier=resilience.DELAI_PREMIER_FRAGMENT, delai_inactivite=resilience.DELAI_INACTIVITE,
+            quota=ordonnanceur.generation, jetons=jetons,
+        )
+
+    def reponse_de_secours(self, nom, question, calcul=None):
+        """
+        Réponse dégradée quand Gemini est indisponible : le calcul exact s'il y en a un (`calcul`,
+        voir `calculer`), sinon la réponse déjà donnée à une question proche, sinon les extraits
+        des fiches les plus pertinents, tels quels. None si rien ne convient.
+        """
+        if calcul is not None:
+            return "⚠️ *Service de génération momentanément indisponible : voici le calcul exact.*\n\n" + calcul.reponse
+        q_vec = self.vectoriser_requete(DOMAINES[nom].modele_embedding, question, nom)
+        proche = self.cache_reponses(nom).chercher(q_vec, seuil=SEUIL_SECOURS)
+        if proche is not None:
+            return ("⚠️ *Service de génération momentanément indisponible : voici la réponse donnée "
+                    "à une question proche.*\n\n" + proche)
+        docs = self.rechercher(nom, question)
+        if not docs:
+            return None
+        extraits = "\n\n".join("> " + doc.replace("\n", "\n> ") for doc in docs)
+        return ("⚠️ *Service de génération momentanément indisponible : voici les passages de nos fiches "
+                "qui correspondent le mieux à votre question.*\n\n" + extraits)
+
+    def preparer(self, nom, question, calcul=None):
+        """
+        Étapes avant la génération : cache sémantique, recherche, prompt ; `calcul` est le
+        résultat de `calculer` pour cette question (calculé une fois, par `repondre`).
+        Renvoie `("cache", reponse)`, `("prompt", prompt)` ou None si aucun extrait n'a été trouvé.
+        """
+        # Une question chiffrée n'est jamais servie par le cache : « 40 000 € » et « 45 000 € »
+        # ont des embeddings quasi identiques mais pas le même résultat
+        if calcul is None:
+            reponse_connue = self.reponse_en_cache(nom, question)
+            if reponse_connue is not None:
+                return "cache", reponse_connue
+
+        # Question chiffrée accompagnée d'explications : Gemini reçoit le résultat exact
+        if calcul is not None:
+            from .calculs import enrichir_question
+
+            tour = enrichir_question(question, calcul)
+        else:
+            tour = question
+
+        # Petits domaines : corpus entier en contexte, sans recherche (None : repli sur le RAG)
+        if DOMAINES[nom].contexte != "rag":
+            prompt = self.contexte_complet(nom).prompt(tour)
+            if prompt is not None:
+                metriques.observer_tokens("prompt", nom, metriques.estimer_tokens(prompt))
+                return "prompt", prompt
+
+        docs = self.rechercher(nom, question)
+        if not docs:
+            return None
+        return "prompt", self.construire_prompt(nom, "\n\n".join(docs), tour)
+
+    def generer_fragments(self, nom, prompt):
+        """Génération en streaming : itérateur (bloquant) des fragments de texte non vides."""
+        from .contexte_complet import QuestionSeule
+
+        produit = False
+        try:
+            for fragment in self._generer_fragments(nom, prompt):
+                produit = True
+                yield fragment
+        except Exception as e:
+            # Contexte en cache expiré ou refusé côté Google : même question avec le préfixe complet
+            if produit or not isinstance(prompt, QuestionSeule) or isinstance(e, resilience.GeminiIndisponible):
+                raise
+            journal.warning("[%s] contexte en cache inutilisable (%s) : envoi du préfixe complet", nom, e)
+            contexte = self.contexte_complet(nom)
+            contexte.invalider(suspendre=True)
+            yield from self._generer_fragments(nom, contexte.prompt_complet(prompt))
+
+    def _generer_fragments(self, nom, prompt):
+        debut = time.perf_counter()
+        caracteres, usage = 0, None
+        with metriques.mesurer("generation", nom) as trace:
+            for chunk in self.generer(nom, prompt, stream=True):
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                if chunk.text:
+                    if not caracteres:
+                        metriques.observer_duree("premier_fragment", nom, time.perf_counter() - debut)
+                    caracteres += len(chunk.text)
+                    yield chunk.text
+            # Décompte exact de l'API quand il est fourni (dernier fragment), sinon estimation
+            tokens = getattr(usage, "candidates_token_count", None) or round(caracteres / 4)
+            total = getattr(usage, "total_token_count", None)
+            if total:
+                ordonnanceur.generation.corriger(total - ordonnanceur.estimer(prompt))
+            metriques.observer_tokens("reponse", nom, tokens)
+            trace.update(caracteres=caracteres, tokens=tokens)
+
+    @property
+    def pipeline(self):
+        from .pipeline import Pipeline
+
+        with self._verrou:
+            if self._pipeline is None:
+                self._pipeline = Pipeline(self)
+            return self._pipeline
+
+    def repondre(self, nom, question, stream=False, session=None, en_attente=None):
+        """
+        Chaîne complète d'une question : calcul exact, cache sémantique, recherche, prompt, génération.
+        Renvoie un itérateur de fragments de texte, ou None si aucun extrait n'a été trouvé.
+        Une question purement chiffrée est servie par le calculateur du domaine, sans Gemini.
+        Les questions identiques (ou quasi identiques) posées en même temps par plusieurs
+        sessions partagent un seul appel à Gemini (voir `moteur.pipeline`).
+        La réponse n'est mise en cache qu'une fois entièrement produite.
+        Quand le quota Gemini est saturé, la question attend son tour (équitable entre les
+        `session`) et `en_attente(position)` est appelé à chaque changement de position,
+        puis avec None (voir `moteur.ordonnanceur`).
+        """
+        debut = time.perf_counter()
+        calcul = self.calculer(nom, question)
+        if calcul is not None and calcul.direct:
+            metriques.compter_question(nom, "calcul")
+            self._noter_premier_fragment(nom, debut)
+            metriques.observer_duree("reponse_complete", nom, time.perf_counter() - debut, longueur_question=len(question))
+            return iter([calcul.reponse])
+
+        fragments = self.pipeline.repondre(nom, question, session, en_attente, calcul)
+        if fragments is None:
+            metriques.observer_duree("reponse_complete", nom, time.perf_counter() - debut, longueur_question=len(question))
+            return None
+
+        def au_fil_de_l_eau():
+            caracteres = 0
+            for i, fragment in enumerate(fragments):
+                if i == 0:
+                    self._noter_premier_fragment(nom, debut)
+                caracteres += len(fragment)
+                yield fragment
+            metriques.observer_duree(
+                "reponse_complete", nom, time.perf_counter() - debut,
+                longueur_question=len(question), caracteres=caracteres,
+            )
+
+        return au_fil_de_l_eau() if stream else iter(["".join(au_fil_de_l_eau())])
+
+    def _noter_premier_fragment(self, nom, debut):
+        delai = time.perf_counter() - debut
+        self.premiers_fragments[nom].append(delai)
+        metriques.observer_duree("reponse_premier_fragment", nom, delai)
+        journal.info("[%s] premier fragment après %.3f s", nom, delai)
+
+    def stats_premier_fragment(self, nom):
+        """Médiane et 95e centile du délai avant le premier fragment (secondes)."""
+        delais = sorted(self.premiers_fragments[nom])
+        if not delais:
+            return None
+        return {
+            "n": len(delais),
+            "p50": delais[len(delais) // 2],
+            "p95": delais[min(len(delais) - 1, int(len(delais) * 0.95))],
+        }
+
+
+_moteur = None
+_verrou_moteur = threading.Lock()
+
+
+def obtenir_moteur(distant=True):
+    """
+    Le moteur unique du processus, partagé par toutes les pages et sessions ; avec
+    MOTEUR_API_URL (et `distant`), un client du service HTTP (voir `moteur.service`).
+    """
+    if distant and os.environ.get("MOTEUR_API_URL"):
+        from .client import obtenir_client
+
+        return obtenir_client()
+    global _moteur
+    with _verrou_moteur:
+        if _moteur is None:
+            _moteur = Moteur()
+            metriques.demarrer_serveur()
+            from . import surveillance
+
+            surveillance.demarrer(_moteur)
+        return _moteur
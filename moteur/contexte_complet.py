@@ -0,0 +1,171 @@
+"""
+Mode « corpus entier » pour les petits domaines (quelques dizaines de Ko de fiches) :
+la consigne et toutes les fiches forment un préfixe fixe, et chaque question n'y ajoute
+que le tour de l'utilisateur. Aucune recherche n'est faite avant la génération.
+
+- `prefixe` : le préfixe est renvoyé à chaque question, identique d'une question à
+  l'autre (ce que Gemini peut mettre en cache de lui-même) ;
+- `cache` : le préfixe est déposé une fois avec l'API de mise en cache de contexte
+  (`CachedContent`, durée de vie CONTEXTE_TTL renouvelée avant expiration) et chaque
+  question n'envoie que le tour de l'utilisateur.
+
+Repli sur le RAG classique si le préfixe dépasse CONTEXTE_MAX_TOKENS, ou si le cache ne
+peut pas être créé (nouvel essai après CONTEXTE_REESSAI secondes). Un cache expiré ou
+supprimé côté Google en cours de génération est remplacé par le préfixe complet.
+"""
+import datetime
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from . import api_google, index, metriques, resilience
+from .domaines import DOMAINES
+
+journal = logging.getLogger(__name__)
+
+TTL = float(os.environ.get("CONTEXTE_TTL", "3600"))
+MAX_TOKENS = int(os.environ.get("CONTEXTE_MAX_TOKENS", "32000"))
+REESSAI = float(os.environ.get("CONTEXTE_REESSAI", "600"))
+
+
+class QuestionSeule(str):
+    """Tour de l'utilisateur à envoyer sur le contexte en cache du domaine (sans consigne ni fiches)."""
+
+
+def corpus_complet(domaine):
+    return "\n\n".join(
+        f"Source [{fichier}] :\n{texte.strip()}" for fichier, texte in index.lire_fiches(domaine.chemin, domaine.fichiers)
+    )
+
+
+class ContexteComplet:
+    def __init__(self, nom):
+        self.nom = nom
+        self._verrou = threading.Lock()  # état seulement : jamais tenu pendant un appel à Google
+        self._prefixe = None
+        self._empreinte = None
+        self._cache = None
+        self._expiration = 0.0
+        self._reessai_apres = 0.0
+        self._en_vol = False  # création ou renouvellement en cours (un seul à la fois)
+        self._version = 0  # incrémentée par `invalider` : un cache obtenu entre-temps est jeté
+
+    def _preparer_prefixe(self):
+        if self._prefixe is None:
+            domaine = DOMAINES[self.nom]
+            # Toutes les consignes se terminent par la question : ce qui précède est le préfixe fixe
+            gabarit, self._suffixe = domaine.consigne.split("{question}", 1)
+            self._prefixe = gabarit.format(contexte=corpus_complet(domaine))
+            self._empreinte = hashlib.sha256(f"{domaine.modele_generation}\n{self._prefixe}".encode("utf-8")).hexdigest()
+        return self._prefixe
+
+    def prompt(self, question):
+        """Ce qu'il faut envoyer à Gemini pour `question`, ou None si le domaine doit passer par le RAG."""
+        with self._verrou:
+            prefixe = self._preparer_prefixe()
+            tokens = metriques.estimer_tokens(prefixe)
+            if tokens > MAX_TOKENS:
+                journal.info("[%s] corpus trop volumineux (%d tokens) : recherche classique", self.nom, tokens)
+                return None
+            tour = question + self._suffixe
+            if DOMAINES[self.nom].contexte != "cache":
+                return prefixe + tour
+            vol = self._reserver()
+        if vol is not None:
+            # Appels à Google hors du verrou : les autres questions continuent (ancien cache ou préfixe)
+            self._assurer_cache(*vol)
+        with self._verrou:
+            disponible = self._cache is not None and time.time() < self._expiration
+        return QuestionSeule(tour) if disponible else prefixe + tour
+
+    def prompt_complet(self, tour):
+        """Préfixe complet + tour de l'utilisateur (repli quand le cache n'est plus utilisable)."""
+        with self._verrou:
+            return self._preparer_prefixe() + tour
+
+    def modele(self):
+        """Modèle Gemini adossé au contexte en cache."""
+        return api_google.genai().GenerativeModel.from_cached_content(cached_content=self._cache)
+
+    def _reserver(self):
+        # Appelé sous `_verrou` : ce qu'il faut pour créer ou renouveler le cache, ou None si
+        # rien n'est à faire (cache frais, opération déjà en vol, nouvel essai pas encore permis)
+        maintenant = time.time()
+        # Renouvellement quand il reste moins d'un cinquième de la durée de vie
+        if self._en_vol or (self._cache is not None and maintenant < self._expiration - TTL / 5):
+            return None
+        if maintenant < self._reessai_apres:
+            return None
+        self._en_vol = True
+        return self._cache, self._prefixe, self._empreinte, self._version
+
+    def _assurer_cache(self, cache, prefixe, empreinte, version):
+        maintenant = time.time()
+        ttl = datetime.timedelta(seconds=TTL)
+        nouveau = None
+        try:
+            if cache is not None:
+                try:
+                    with metriques.mesurer("contexte_renouvellement", self.nom):
+                        resilience.generation.appeler(lambda: cache.update(ttl=ttl), tentatives=1, couvrir=False)
+                    nouveau = cache
+                except Exception as e:
+                    journal.warning("[%s] renouvellement du contexte en cache impossible (%s) : recréation", self.nom, e)
+            if nouveau is None:
+                nouveau = self._creer(prefixe, empreinte, ttl)
+        finally:
+            with self._verrou:
+                self._en_vol = False
+                a_jour = version == self._version
+                if a_jour:
+                    self._cache = nouveau
+                    if nouveau is not None:
+                        self._expiration = maintenant + TTL
+                    else:
+                        self._reessai_apres = maintenant + REESSAI
+        if not a_jour and nouveau is not None:
+            # Fiches modifiées ou cache invalidé pendant l'appel : ce contexte ne sert plus
+            self._supprimer(nouveau)
+
+    def _creer(self, prefixe, empreinte, ttl):
+        genai = api_google.genai()
+        modele = DOMAINES[self.nom].modele_generation
+        try:
+            with metriques.mesurer("contexte_creation", self.nom, tokens=metriques.estimer_tokens(prefixe)):
+                cache = resilience.generation.appeler(
+                    lambda: genai.caching.CachedContent.create(
+                        model=modele if modele.startswith("models/") else f"models/{modele}",
+                        display_name=f"comprendre-{self.nom}-{empreinte[:8]}",
+                        contents=[prefixe],
+                        ttl=ttl,
+                    ),
+                    tentatives=1, couvrir=False,
+                )
+        except Exception as e:
+            journal.warning("[%s] contexte en cache indisponible (%s) : préfixe complet pendant %.0f s",
+                            self.nom, e, REESSAI)
+            return None
+        journal.info("[%s] corpus déposé en contexte (%s)", self.nom, getattr(cache, "name", "?"))
+        return cache
+
+    def _supprimer(self, cache):
+        try:
+            cache.delete()
+        except Exception as e:
+            journal.debug("[%s] suppression du contexte en cache : %s", self.nom, e)
+
+    def invalider(self, corpus_modifie=False, suspendre=False):
+        """
+        Oublie le contexte en cache (et, si les fiches ont changé, le préfixe) ; il sera recréé
+        au besoin, immédiatement ou, avec `suspendre`, après CONTEXTE_REESSAI secondes.
+        """
+        with self._verrou:
+            cache, self._cache = self._cache, None
+            self._version += 1
+            self._reessai_apres = time.time() + REESSAI if suspendre else 0.0
+            if corpus_modifie:
+                self._prefixe = None
+        if cache is not None:
+            self._supprimer(cache)
@@ -0,0 +1,148 @@
+"""
+Découpage des fiches en extraits `(texte, metadonnees)`.
+
+- "fenetre"  : blocs glissants de 1000 caractères (impots, paie)
+- "fichier"  : un extrait par fiche
+- "sections" : un extrait par section en chiffres romains ("I. LE SALAIRE JOURNALIER..."),
+               redécoupé sur les fins de ligne si la section dépasse la taille maximale
+
+`fenetres` et `sections` sont les versions en flux (générateurs) utilisées par
+`index.iterer_extraits` : elles lisent la fiche morceau par morceau et produisent
+exactement les mêmes extraits que `decouper_fenetre` / `decouper_sections`, donc les
+mêmes identifiants dans l'index.
+"""
+import itertools
+import re
+
+TITRE_SECTION = re.compile(r"^\s*([IVXLC]+)\.\s+\S.*$")
+
+
+def fenetres(morceaux, fichier, taille_bloc=1000, chevauchement=100):
+    """Blocs glissants sur un texte lu par `morceaux` (ex. lecture d'un fichier par blocs)."""
+    pas = taille_bloc - chevauchement
+    tampon, debut = "", 0
+    for morceau in morceaux:
+        # Seule la fin non encore découpée est gardée : le tampon reste de l'ordre d'un morceau
+        tampon, debut = tampon[debut:] + morceau, 0
+        while len(tampon) - debut >= taille_bloc:
+            yield from _fenetre(tampon[debut : debut + taille_bloc], fichier)
+            debut += pas
+    while debut < len(tampon):
+        yield from _fenetre(tampon[debut : debut + taille_bloc], fichier)
+        debut += pas
+
+
+def _fenetre(morceau, fichier):
+    if len(morceau.strip()) > 10:
+        yield f"Source [{fichier}] : {morceau}", {"source": fichier}
+
+
+def decouper_fenetre(contenu, fichier, taille_bloc=1000, chevauchement=100):
+    return list(fenetres((contenu,), fichier, taille_bloc, chevauchement))
+
+
+def decouper_fichier(contenu, fichier):
+    return [(contenu, {"source": fichier})] if contenu.strip() else []
+
+
+def _blocs(lignes, taille_max):
+    """Regroupe des lignes en blocs d'au plus `taille_max` caractères (coupe les lignes trop longues)."""
+    courant = ""
+    for ligne in lignes:
+        while len(ligne) > taille_max:
+            if courant:
+                yield courant
+                courant = ""
+            yield ligne[:taille_max]
+            ligne = ligne[taille_max:]
+        if courant and len(courant) + len(ligne) + 1 > taille_max:
+            yield courant
+            courant = ""
+        courant = f"{courant}\n{ligne}" if courant else ligne
+    if courant.strip():
+        yield courant
+
+
+def _rogner(lignes):
+    """Lignes de `"\\n".join(lignes).strip()`, sans tout assembler : blancs de début et de fin retirés."""
+    precedente, blancs = None, []
+    for ligne in lignes:
+        if not ligne.strip():
+            if precedente is not None:
+                blancs.append(ligne)
+            continue
+        if precedente is None:
+            ligne = ligne.lstrip()
+        else:
+            yield precedente
+            yield from blancs
+            blancs = []
+        precedente = ligne
+    if precedente is not None:
+        yield precedente.rstrip()
+
+
+def premier_titre(lignes):
+    """Titre de la première section, "" si la fiche n'en a pas."""
+    return next((ligne.strip() for ligne in lignes if TITRE_SECTION.match(ligne)), "")
+
+
+def sections(lignes, fichier, taille_max=1200, titre=None):
+    """
+    Extraits section par section sur les `lignes` d'une fiche (sans fins de ligne).
+    Le préambule est rattaché à la première section : `titre` (voir `premier_titre`)
+    évite de le garder en mémoire jusqu'à elle ; sans lui, il est mis en attente.
+    """
+    lignes = iter(lignes)
+    if titre is None:
+        preambule = []
+        for ligne in lignes:
+            preambule.append(ligne)
+            if TITRE_SECTION.match(ligne):
+                titre = ligne.strip()
+                break
+        lignes = itertools.chain(preambule, lignes)
+
+    # Le premier titre ouvre la section déjà commencée par le préambule, les suivants une nouvelle
+    titres, vu = [titre or ""], [False]
+
+    def numero(ligne):
+        if TITRE_SECTION.match(ligne):
+            if vu[0]:
+                titres.append(ligne.strip())
+            vu[0] = True
+        return len(titres) - 1
+
+    for i, groupe in itertools.groupby(lignes, numero):
+        titre = titres[i]
+        entete = f"Source [{fichier}] - {titre}" if titre else f"Source [{fichier}]"
+        corps = _rogner(ligne for ligne in groupe if not TITRE_SECTION.match(ligne))
+        blocs = _blocs(corps, max(taille_max - len(entete) - 1, 100))
+        premier = next(blocs, None)
+        if premier is None and not titre:
+            continue
+        suivant = next(blocs, None)
+        # Le numéro de partie n'est ajouté que si la section compte plusieurs blocs
+        for partie, bloc in enumerate(itertools.chain([premier or "", suivant], blocs), start=1):
+            if bloc is None:
+                break
+            meta = {"source": fichier, "section": titre}
+            if suivant is not None:
+                meta["partie"] = partie
+            yield f"{entete}\n{bloc}".rstrip(), meta
+
+
+def decouper_sections(contenu, fichier, taille_max=1200):
+    """
+    Un extrait par section, préfixé par la source et le titre de la section (pour
+    que la recherche « voie » le titre). L'en-tête de la fiche (titre, source officielle)
+    est rattaché à la première section.
+    """
+    return list(sections(contenu.splitlines(), fichier, taille_max))
+
+
+DECOUPAGES = {
+    "fenetre": decouper_fenetre,
+    "fichier": decouper_fichier,
+    "sections": decouper_sections,
+}
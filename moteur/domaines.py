@@ -0,0 +1,170 @@
+"""
+Configuration des cinq assistants : chaque domaine n'est qu'une configuration
+du moteur partagé (dossier de fiches, modèles, consigne du prompt).
+"""
+import os
+from dataclasses import dataclass, replace
+
+from .index import RACINE
+
+MINILM = "all-MiniLM-L6-v2"
+TEXT_EMBEDDING_004 = "models/text-embedding-004"
+
+
+@dataclass(frozen=True)
+class Domaine:
+    nom: str
+    dossier: str
+    consigne: str  # Gabarit du prompt, avec {contexte} et {question}
+    modele_embedding: str = MINILM
+    modele_generation: str = "gemini-2.0-flash-exp"
+    n_results: int = 3
+    fichiers: tuple = ()  # Vide : tous les .txt du dossier
+    decoupage: str = "fenetre"  # "fenetre", "fichier" ou "sections" (voir moteur.decoupage)
+    contexte: str = "rag"  # "rag", "prefixe" ou "cache" : corpus entier en contexte (voir moteur.contexte_complet)
+    calculateur: str = ""  # Module de moteur.calculs pour les questions chiffrées (ex. "impots")
+
+    @property
+    def chemin(self):
+        return os.path.join(RACINE, self.dossier)
+
+
+DOMAINES = {d.nom: d for d in [
+    Domaine(
+        nom="impots",
+        dossier="comprendre-impots",
+        modele_embedding=TEXT_EMBEDDING_004,
+        modele_generation="models/gemini-2.0-flash-exp",
+        n_results=5,
+        calculateur="impots",
+        consigne="""Tu es un Expert Fiscaliste Pédagogue (Assistant DGFiP).
+Ta mission : Aider le contribuable à comprendre son impôt 2025 (sur revenus 2024).
+
+RÈGLES D'OR :
+1. Base tes réponses UNIQUEMENT sur le contexte fourni.
+2. Si on te demande un calcul, utilise le barème 2025 du contexte ; si un RÉSULTAT EXACT du moteur de calcul accompagne la question, reprends ses montants sans les recalculer.
+3. Pour les Micro-Entrepreneurs : sois très vigilant à distinguer le régime "Classique" (Abattement forfaitaire) du "Versement Libératoire".
+4. Sois clair, pédagogique et rassurant.
+5. Rappelle toujours que tu donnes une estimation informative.
+
+CONTEXTE DOCUMENTAIRE :
+{contexte}
+
+QUESTION DU CONTRIBUABLE : {question}""",
+    ),
+    Domaine(
+        nom="paie",
+        dossier="comprendre-paie",
+        modele_embedding=TEXT_EMBEDDING_004,
+        modele_generation="models/gemini-2.0-flash-exp",
+        n_results=5,
+        calculateur="paie",
+        consigne="""Tu es un Expert Paie Pédagogue.
+Réponds à la question en utilisant les barèmes officiels ci-dessous.
+Sois précis sur les chiffres (Taux 2025) et clair dans l'explication.
+Si un RÉSULTAT EXACT du moteur de calcul accompagne la question, reprends ses montants sans les recalculer.
+
+CONTEXTE :
+{contexte}
+
+QUESTION : {question}""",
+    ),
+    Domaine(
+        nom="chomage",
+        dossier="comprendre-chomage",
+        decoupage="sections",
+        fichiers=(
+            "chomage_conditions_eligibilite.txt",
+            "chomage_calcul_montant.txt",
+            "chomage_duree_indemnisation.txt",
+            "chomage_carence_et_differe.txt",
+            "chomage_intermittents_spectacle.txt",
+        ),
+        calculateur="chomage",
+        consigne="""
+Tu es un assistant expert en assurance chômage (France Travail / ex-Pôle Emploi).
+Ta mission est d'aider l'utilisateur à comprendre ses droits (ARE) avec empathie et précision.
+
+RÈGLES IMPORTANTES :
+1. Base tes réponses UNIQUEMENT sur le CONTEXTE fourni ci-dessous.
+2. Si l'information n'est pas dans le contexte, dis que tu ne sais pas et conseille de contacter France Travail.
+3. Ne fais JAMAIS de morale (ex: sur la démission ou la recherche d'emploi). Reste factuel.
+4. PRÉSENTATION : Utilise systématiquement des LISTES à puces. Évite les tableaux.
+5. AVERTISSEMENT : Si la réponse contient des montants financiers (euros), précise bien que ce sont des estimations.
+6. INTERMITTENTS : Si la question concerne les artistes ou techniciens (annexes 8/10), base-toi priorité sur le fichier "chomage_intermittents_spectacle".
+7. CALCULS : Si un RÉSULTAT EXACT du moteur de calcul accompagne la question, reprends ses montants sans les recalculer.
+
+CONTEXTE (Sources Officielles) :
+{contexte}
+
+QUESTION UTILISATEUR :
+{question}
+""",
+    ),
+    Domaine(
+        nom="logement",
+        dossier="comprendre-logement",
+        decoupage="sections",
+        fichiers=(
+            "logement_loi_89_generale.txt",
+            "logement_qui_paye_quoi.txt",
+            "logement_depot_garantie.txt",
+            "logement_preavis_depart.txt",
+            "logement_expulsion_et_impayes.txt",
+            "logement_encadrement_loyers_2025.txt",
+        ),
+        consigne="""
+Tu es un juriste expert en droit du logement français.
+Ta mission est d'informer l'utilisateur sur ses droits et devoirs (Locataire ou Propriétaire).
+
+RÈGLES IMPORTANTES :
+1. Base tes réponses UNIQUEMENT sur le CONTEXTE fourni.
+2. Cite systématiquement les sources (ex: "Selon la Loi de 89...", "D'après le décret de 87...").
+3. Si la question concerne un conflit (caution, travaux), propose une approche amiable d'abord, puis les recours légaux.
+4. Ne donne JAMAIS de conseil illégal (ex: "arrêtez de payer le loyer").
+5. Sois clair et structuré (listes à puces).
+
+CONTEXTE JURIDIQUE :
+{contexte}
+
+QUESTION :
+{question}
+""",
+    ),
+    Domaine(
+        nom="caf",
+        dossier="comprendre-aides-caf",
+        decoupage="sections",
+        fichiers=(
+            "caf_rsa_socle.txt",
+            "caf_prime_activite.txt",
+            "caf_aides_logement_apl.txt",
+            "caf_ressources_a_declarer.txt",
+        ),
+        calculateur="caf",
+        consigne="""
+Tu es un assistant expert CAF (RSA, Prime d'Activité, APL).
+Règles :
+1. Base tes réponses UNIQUEMENT sur le CONTEXTE ci-dessous.
+2. Si tu ne sais pas, dis-le.
+3. Pas de morale.
+4. Utilise des LISTES à puces, pas de tableaux.
+5. AVERTISSEMENT : Si la réponse contient des montants financiers, précise bien que ce sont des estimations. Sinon, inutile de le préciser.
+6. Si un RÉSULTAT EXACT du moteur de calcul accompagne la question, reprends ses montants sans les recalculer.
+
+CONTEXTE :
+{contexte}
+
+QUESTION UTILISATEUR :
+{question}
+""",
+    ),
+]}
+
+# Choix global du modèle d'embedding (ex. MOTEUR_EMBEDDINGS=onnx:all-MiniLM-L6-v2-int8)
+if os.environ.get("MOTEUR_EMBEDDINGS"):
+    DOMAINES = {nom: replace(d, modele_embedding=os.environ["MOTEUR_EMBEDDINGS"]) for nom, d in DOMAINES.items()}
+
+# Choix global du mode de contexte (ex. MOTEUR_CONTEXTE=cache)
+if os.environ.get("MOTEUR_CONTEXTE"):
+    DOMAINES = {nom: replace(d, contexte=os.environ["MOTEUR_CONTEXTE"]) for nom, d in DOMAINES.items()}
@@ -0,0 +1,82 @@
+"""
+Modèles d'embedding partagés : une seule instance par modèle et par processus,
+quel que soit le nombre d'assistants qui l'utilisent.
+"""
+import threading
+
+from . import api_google, ordonnanceur, resilience
+
+
+class EmbeddingsGemini:
+    """Embeddings distants Google (text-embedding-004), soumis au quota de l'API."""
+
+    limiteur = ordonnanceur.ingestion  # quota partagé, après les questions des utilisateurs
+    nb_workers = 4
+    taille_lot = 50  # L'API embed_content accepte jusqu'à 100 textes par requête
+    dtype_stockage = "float32"
+
+    def __init__(self, modele):
+        self.modele = modele
+
+    def vectoriser_documents(self, docs):
+        # Échéance et disjoncteur seulement : les reprises sont gérées lot par lot par l'ingestion
+        res = resilience.embeddings.appeler(
+            lambda: api_google.genai().embed_content(model=self.modele, content=list(docs), task_type="retrieval_document"),
+            tentatives=1, couvrir=False,
+        )
+        return res['embedding']
+
+    def vectoriser_requete(self, question):
+        res = resilience.embeddings.appeler(
+            lambda: api_google.genai().embed_content(model=self.modele, content=question, task_type="retrieval_query"),
+            quota=ordonnanceur.embeddings,
+        )
+        return res['embedding']
+
+
+class EmbeddingsLocaux:
+    """Modèle local SentenceTransformer (MiniLM), gratuit et sans appel réseau."""
+
+    limiteur = None
+    nb_workers = 1  # PyTorch parallélise déjà chaque lot sur les cœurs disponibles
+    taille_lot = 64
+    dtype_stockage = "float32"
+
+    def __init__(self, modele):
+        from sentence_transformers import SentenceTransformer
+
+        self.modele = modele
+        self._st = SentenceTransformer(modele)
+
+    def vectoriser_documents(self, docs):
+        return self._st.encode(list(docs)).tolist()
+
+    def vectoriser_requete(self, question):
+        return self._st.encode([question])[0].tolist()
+
+
+_instances = {}
+_verrou = threading.Lock()
+
+
+def obtenir_embeddings(modele):
+    """
+    Renvoie l'instance partagée du modèle (chargée au premier appel) :
+    "models/..." (Gemini), "onnx:<dossier>" (ONNX int8 local) ou un nom SentenceTransformer.
+    """
+    with _verrou:
+        if modele not in _instances:
+            if modele.startswith("models/"):
+                classe = EmbeddingsGemini
+            elif modele.startswith("onnx:"):
+                from .onnx_local import EmbeddingsOnnx as classe
+            else:
+                classe = EmbeddingsLocaux
+            _instances[modele] = classe(modele)
+        return _instances[modele]
+
+
+def remplacer(modele, instance):
+    """Impose l'instance utilisée pour `modele` (banc d'essai hors ligne)."""
+    with _verrou:
+        _instances[modele] = instance
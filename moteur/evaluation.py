@@ -0,0 +1,189 @@
+"""
+Qualité de la recherche sur un jeu de questions de référence, pour juger les
+optimisations (découpage, `n_results`, modèle d'embedding, caches) sur des chiffres.
+
+Chaque dossier d'assistant contient `questions_reference.json` : des questions dont on
+sait quelle fiche (et quelle section, ou quel passage) doit être retrouvée.
+
+    python -m moteur.evaluation [domaine ...] [--k 1 3 5 10] [--hors-ligne] [--reference ancien.json]
+
+Pour chaque domaine : recall@k, MRR et taille du contexte envoyé à Gemini (en tokens
+estimés, ~4 caractères par token) pour chaque k, dont le `n_results` du domaine.
+Avec `--reference`, le code de sortie vaut 1 si le recall ou le MRR baisse de plus
+de `--tolerance` par rapport à une évaluation précédente.
+
+`--hors-ligne` remplace les embeddings par les doublures déterministes du banc
+(`moteur.faux_google`) : utile pour l'intégration continue, mais seuls les écarts
+entre deux évaluations hors ligne ont un sens.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from . import api_google, index
+from .banc import DOSSIER_RESULTATS, installer_doublures, version_du_code
+from .cache import normaliser_question
+from .domaines import DOMAINES
+from .metriques import estimer_tokens
+
+journal = logging.getLogger(__name__)
+
+FICHIER_REFERENCE = "questions_reference.json"
+KS = (1, 3, 5, 10)
+
+
+def charger_questions(nom):
+    with open(os.path.join(DOMAINES[nom].chemin, FICHIER_REFERENCE), "r", encoding="utf-8") as f:
+        return json.load(f)["questions"]
+
+
+def pertinent(texte, attendu):
+    """
+    Un extrait correspond à un attendu s'il vient de la bonne fiche et, le cas échéant,
+    de la bonne section (« II ») ou s'il contient le passage attendu.
+    """
+    entete = f"Source [{attendu['source']}]"
+    if not texte.startswith(entete):
+        return False
+    if "section" in attendu and not texte.startswith(f"{entete} - {attendu['section']}."):
+        return False
+    if "extrait" in attendu and normaliser_question(attendu["extrait"]) not in normaliser_question(texte):
+        return False
+    return True
+
+
+def verifier_reference(nom, questions):
+    """Attendus qu'aucun extrait du corpus actuel ne peut satisfaire (jeu de référence à mettre à jour)."""
+    domaine = DOMAINES[nom]
+    textes = [t for t, _ in index.decouper_dossier(domaine.chemin, domaine.fichiers, domaine.decoupage)]
+    return [
+        (q["question"], attendu)
+        for q in questions
+        for attendu in q["attendus"]
+        if not any(pertinent(t, attendu) for t in textes)
+    ]
+
+
+def evaluer_domaine(moteur, nom, ks=KS):
+    domaine = DOMAINES[nom]
+    questions = charger_questions(nom)
+    introuvables = verifier_reference(nom, questions)
+    collection, _ = moteur.charger(nom)
+    if collection is None:
+        return {"erreur": "index vide"}
+
+    ks = sorted(set(ks) | {domaine.n_results})
+    rappels = {k: 0.0 for k in ks}
+    tokens = {k: 0 for k in ks}
+    inverses_rangs = 0.0
+    details = []
+    for q in questions:
+        q_vec = moteur.vectoriser_requete(domaine.modele_embedding, q["question"], nom)
+        docs = collection.rechercher(q_vec, q["question"], max(ks))
+        # Rang (à partir de 1) du premier extrait qui satisfait chaque attendu
+        rangs = [next((i + 1 for i, d in enumerate(docs) if pertinent(d, a)), None) for a in q["attendus"]]
+        for k in ks:
+            rappels[k] += sum(1 for r in rangs if r and r <= k) / len(rangs)
+            tokens[k] += estimer_tokens("\n\n".join(docs[:k]))
+        trouves = [r for r in rangs if r]
+        inverses_rangs += 1 / min(trouves) if trouves else 0.0
+        details.append({"question": q["question"], "rangs": rangs})
+
+    n = len(questions)
+    return {
+        "modele_embedding": domaine.modele_embedding,
+        "decoupage": domaine.decoupage,
+        "n_results": domaine.n_results,
+        "questions": n,
+        "recall": {str(k): rappels[k] / n for k in ks},
+        "mrr": inverses_rangs / n,
+        "tokens_contexte": {str(k): tokens[k] / n for k in ks},
+        "attendus_introuvables": [{"question": question, "attendu": a} for question, a in introuvables],
+        "details": details,
+    }
+
+
+def regressions(resultats, reference, tolerance):
+    """Baisses de recall (au `n_results` du domaine) ou de MRR supérieures à la tolérance."""
+    baisses = []
+    for nom, r in resultats.items():
+        ancien = reference.get("domaines", {}).get(nom)
+        if not ancien or "erreur" in r or "erreur" in ancien:
+            continue
+        k = str(r["n_results"])
+        mesures = [("mrr", r["mrr"], ancien["mrr"])]
+        if k in ancien["recall"]:
+            mesures.append((f"recall@{k}", r["recall"][k], ancien["recall"][k]))
+        for mesure, nouveau, avant in mesures:
+            if nouveau < avant - tolerance:
+                baisses.append(f"{nom} : {mesure} {avant:.3f} -> {nouveau:.3f}")
+    return baisses
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Évalue la recherche sur les questions de référence.")
+    parser.add_argument("domaines", nargs="*", default=list(DOMAINES), help="par défaut : tous")
+    parser.add_argument("--k", type=int, nargs="+", default=list(KS))
+    parser.add_argument("--index", choices=("chroma", "numpy"), default=os.environ.get("MOTEUR_INDEX", "chroma"))
+    parser.add_argument("--hors-ligne", action="store_true", help="embeddings simulés, sans réseau")
+    parser.add_argument("--reference", help="évaluation précédente (JSON) à ne pas dégrader")
+    parser.add_argument("--tolerance", type=float, default=0.02)
+    parser.add_argument("--sortie", default=DOSSIER_RESULTATS)
+    args = parser.parse_args(argv)
+
+    from .coeur import Moteur
+
+    with tempfile.TemporaryDirectory(prefix="evaluation-") as temporaire:
+        if args.hors_ligne:
+            # Index et artefacts à part : des vecteurs simulés ne doivent jamais côtoyer les vrais
+            os.environ["MOTEUR_ARTEFACTS"] = os.path.join(temporaire, "artefacts")
+            installer_doublures()
+            moteur = Moteur(dossier_index=temporaire, backend=args.index)
+        else:
+            api_google.configurer(os.environ.get("GOOGLE_API_KEY"))
+            moteur = Moteur(backend=args.index)
+
+        resultats = {}
+        for nom in args.domaines:
+            resultats[nom] = r = evaluer_domaine(moteur, nom, args.k)
+            if "erreur" in r:
+                print(f"{nom} : {r['erreur']}")
+                continue
+            k = str(r["n_results"])
+            print(f"{nom} : recall@{k} {r['recall'][k]:.2f}, MRR {r['mrr']:.2f}, "
+                  f"~{r['tokens_contexte'][k]:.0f} tokens de contexte ({r['questions']} questions)")
+            for manque in r["attendus_introuvables"]:
+                print(f"  attendu introuvable dans le corpus : {manque['attendu']} ({manque['question']})")
+
+    commit, modifie = version_du_code()
+    rapport = {
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "modifications_locales": modifie,
+        "hors_ligne": args.hors_ligne,
+        "index": args.index,
+        "domaines": resultats,
+    }
+    os.makedirs(args.sortie, exist_ok=True)
+    chemin = os.path.join(args.sortie, f"evaluation-{time.strftime('%Y%m%d-%H%M%S')}-{commit or 'inconnu'}.json")
+    with open(chemin, "w", encoding="utf-8") as f:
+        json.dump(rapport, f, ensure_ascii=False, indent=2)
+    print(f"Résultats : {chemin}")
+
+    echec = any(r.get("attendus_introuvables") for r in resultats.values())
+    if args.reference:
+        with open(args.reference, "r", encoding="utf-8") as f:
+            baisses = regressions(resultats, json.load(f), args.tolerance)
+        for baisse in baisses:
+            print(f"RÉGRESSION {baisse}")
+        echec = echec or bool(baisses)
+    return 1 if echec else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""
+Doublures locales des API Google pour le banc d'essai : mêmes appels que le SDK
+(`embed_content`, `GenerativeModel(...).generate_content(..., stream=...)`), sans réseau.
+
+- Embeddings déterministes : somme de vecteurs pseudo-aléatoires par mot (hachage),
+  donc deux textes qui partagent des mots restent proches et la recherche a un sens.
+- Génération en streaming à débit réglable (délai avant le premier token, tokens/s),
+  plus un coût de lecture du prompt par token (ce que le contexte en cache évite).
+- Mise en cache de contexte (`caching.CachedContent`, `GenerativeModel.from_cached_content`).
+- Erreurs injectables avec une probabilité donnée, sur chaque appel.
+"""
+import hashlib
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from .recherche import tokeniser
+
+
+class ErreurSimulee(RuntimeError):
+    """Erreur injectée par une doublure (équivalent d'un 503 / quota dépassé)."""
+
+
+def _echouer_peut_etre(taux, tirage, quoi):
+    if taux and tirage.random() < taux:
+        raise ErreurSimulee(f"{quoi} : erreur simulée")
+
+
+class FauxEmbeddings:
+    """Vecteurs déterministes de dimension `dimension` ; latence par appel et par texte."""
+
+    limiteur = None
+    nb_workers = 1
+    taille_lot = 64
+    dtype_stockage = "float32"
+
+    def __init__(self, modele, dimension=384, latence_appel=0.0, latence_texte=0.0, taux_erreur=0.0, graine=0):
+        self.modele = modele
+        self.dimension = dimension
+        self.latence_appel = latence_appel
+        self.latence_texte = latence_texte
+        self.taux_erreur = taux_erreur
+        self.appels = 0
+        self._tirage = random.Random(graine)
+        self._mots = {}
+        self._verrou = threading.Lock()
+
+    def _vecteur_mot(self, mot):
+        v = self._mots.get(mot)
+        if v is None:
+            graine = int.from_bytes(hashlib.sha256(f"{self.dimension}:{mot}".encode("utf-8")).digest()[:8], "big")
+            v = self._mots[mot] = np.random.default_rng(graine).standard_normal(self.dimension).astype(np.float32)
+        return v
+
+    def vecteur(self, texte):
+        v = np.zeros(self.dimension, dtype=np.float32)
+        for mot in tokeniser(texte):
+            v += self._vecteur_mot(mot)
+        return (v / (np.linalg.norm(v) or 1.0)).tolist()
+
+    def _appel(self, nb_textes):
+        with self._verrou:
+            self.appels += 1
+            _echouer_peut_etre(self.taux_erreur, self._tirage, "embed_content")
+        time.sleep(self.latence_appel + self.latence_texte * nb_textes)
+
+    def vectoriser_documents(self, docs):
+        self._appel(len(docs))
+        return [self.vecteur(d) for d in docs]
+
+    def vectoriser_requete(self, question):
+        self._appel(1)
+        return self.vecteur(question)
+
+
+class _Fragment:
+    def __init__(self, text):
+        self.text = text
+
+
+class _Reponse:
+    """Comme la réponse du SDK : `.text` complet, ou itérable de fragments si `stream=True`."""
+
+    def __init__(self, fragments):
+        self._fragments = fragments
+
+    def __iter__(self):
+        for texte in self._fragments:
+            yield _Fragment(texte)
+
+    @property
+    def text(self):
+        return "".join(self._fragments)
+
+
+class FauxModele:
+    def __init__(self, faux, nom, cache=None):
+        self._faux = faux
+        self.model_name = nom
+        self.cache = cache
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        if self.cache is not None:
+            if self.cache.name not in self._faux.caches:
+                raise _erreur_introuvable(self.cache.name)
+            return self._faux.generer(prompt, stream, tokens_en_cache=self.cache.tokens)
+        return self._faux.generer(prompt, stream)
+
+
+class _FabriqueModeles:
+    """`genai.GenerativeModel(...)` et `genai.GenerativeModel.from_cached_content(...)`."""
+
+    def __init__(self, faux):
+        self._faux = faux
+
+    def __call__(self, nom, **kwargs):
+        return FauxModele(self._faux, nom)
+
+    def from_cached_content(self, cached_content, **kwargs):
+        return FauxModele(self._faux, cached_content.model, cache=cached_content)
+
+
+class NotFound(RuntimeError):
+    """Même nom que l'erreur 404 de google.api_core (non transitoire)."""
+
+
+def _erreur_introuvable(nom):
+    return NotFound(f"{nom} introuvable (expiré ou supprimé)")
+
+
+class FauxContexte:
+    def __init__(self, faux, nom, model, contenu, ttl):
+        self._faux = faux
+        self.name = nom
+        self.model = model
+        self.tokens = round(len(contenu) / 4)
+        self.expire_time = time.time() + ttl.total_seconds()
+
+    def update(self, ttl=None, **kwargs):
+        if self.name not in self._faux.caches:
+            raise _erreur_introuvable(self.name)
+        self.expire_time = time.time() + ttl.total_seconds()
+
+    def delete(self):
+        self._faux.caches.pop(self.name, None)
+
+
+class _FabriqueContextes:
+    def __init__(self, faux):
+        self._faux = faux
+
+    def create(self, model, contents=(), ttl=None, **kwargs):
+        faux = self._faux
+        with faux._verrou:
+            faux.creations_contexte += 1
+            nom = f"cachedContents/faux-{faux.creations_contexte}"
+            faux.caches[nom] = FauxContexte(faux, nom, model, "".join(contents), ttl)
+        return faux.caches[nom]
+
+
+class FauxGenai:
+    """
+    Remplaçant du module `google.generativeai` (à installer avec `api_google.remplacer`).
+    `premier_token` : délai avant le premier fragment (s) ; `tokens_par_s` : débit ensuite ;
+    `taux_erreur_*` : probabilité qu'un appel lève `ErreurSimulee`.
+    """
+
+    def __init__(self, dimension=768, latence_embedding=0.05, premier_token=0.4, tokens_par_s=80.0,
+                 tokens_reponse=120, latence_token_prompt=0.0, taux_erreur_embedding=0.0,
+                 taux_erreur_generation=0.0, graine=0):
+        self.embeddings = FauxEmbeddings(
+            "models/faux", dimension, latence_appel=latence_embedding, taux_erreur=taux_erreur_embedding, graine=graine
+        )
+        self.premier_token = premier_token
+        self.tokens_par_s = tokens_par_s
+        self.tokens_reponse = tokens_reponse
+        self.latence_token_prompt = latence_token_prompt
+        self.taux_erreur_generation = taux_erreur_generation
+        self.generations = 0
+        self.tokens_prompt = 0  # tokens de prompt facturés (hors contexte en cache)
+        self.creations_contexte = 0
+        self.caches = {}
+        self.GenerativeModel = _FabriqueModeles(self)
+        self.caching = SimpleNamespace(CachedContent=_FabriqueContextes(self))
+        self._tirage = random.Random(graine + 1)
+        self._verrou = threading.Lock()
+
+    def configure(self, **kwargs):
+        pass
+
+    def embed_content(self, model, content, task_type=None, **kwargs):
+        if isinstance(content, list):
+            return {"embedding": self.embeddings.vectoriser_documents(content)}
+        return {"embedding": self.embeddings.vectoriser_requete(content)}
+
+    def generer(self, prompt, stream, tokens_en_cache=0):
+        tokens = round(len(prompt) / 4)
+        with self._verrou:
+            self.generations += 1
+            self.tokens_prompt += tokens
+            _echouer_peut_etre(self.taux_erreur_generation, self._tirage, "generate_content")
+        mots = [f"mot{i} " for i in range(self.tokens_reponse)]
+        # Lecture du prompt : le contexte en cache est bien moins coûteux (compté pour un dixième)
+        premier_token = self.premier_token + self.latence_token_prompt * (tokens + tokens_en_cache / 10)
+        if not stream:
+            time.sleep(premier_token + len(mots) / self.tokens_par_s)
+            return _Reponse(mots)
+        return _ReponseStream(mots, premier_token, self.tokens_par_s)
+
+
+class _ReponseStream(_Reponse):
+    def __init__(self, fragments, premier_token, tokens_par_s):
+        super().__init__(fragments)
+        self._premier_token = premier_token
+        self._intervalle = 1.0 / tokens_par_s
+
+    def __iter__(self):
+        time.sleep(self._premier_token)
+        for i, texte in enumerate(self._fragments):
+            if i:
+                time.sleep(self._intervalle)
+            yield _Fragment(texte)
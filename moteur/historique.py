@@ -0,0 +1,77 @@
+"""
+Historique de conversation d'une session, borné en mémoire.
+
+Les HISTORIQUE_MAX derniers messages restent en clair ; au-delà, les plus anciens
+sont archivés par blocs compressés (zlib), eux-mêmes limités à HISTORIQUE_ARCHIVE_MAX
+messages : une longue session n'occupe jamais plus de quelques centaines de Ko.
+L'affichage (voir `interface.afficher_historique`) ne redessine que les
+HISTORIQUE_FENETRE derniers messages ; les précédents se chargent page par page.
+"""
+import json
+import os
+import sys
+import zlib
+from collections import deque
+
+from . import metriques
+
+MAX_MESSAGES = int(os.environ.get("HISTORIQUE_MAX", "40"))
+MAX_ARCHIVE = int(os.environ.get("HISTORIQUE_ARCHIVE_MAX", "400"))
+FENETRE = int(os.environ.get("HISTORIQUE_FENETRE", "10"))
+
+
+class Historique:
+    def __init__(self, nom, accueil=None, max_messages=MAX_MESSAGES, max_archive=MAX_ARCHIVE):
+        self.nom = nom
+        self.max_messages = max(max_messages, 2)
+        self.max_archive = max_archive
+        self._recents = deque()  # (role, contenu)
+        self._archive = deque()  # (nombre de messages, bloc compressé), du plus ancien au plus récent
+        self._archives = 0
+        self.total = 0  # messages ajoutés depuis le début de la session, oubliés compris
+        if accueil:
+            self.ajouter("assistant", accueil)
+
+    def __len__(self):
+        """Messages encore consultables (en clair ou archivés)."""
+        return self._archives + len(self._recents)
+
+    def ajouter(self, role, contenu):
+        self._recents.append((role, contenu))
+        self.total += 1
+        if len(self._recents) > self.max_messages:
+            self._archiver()
+        metriques.observer_historique(self.nom, self.octets())
+
+    def _archiver(self):
+        # Moitié la plus ancienne en un bloc : on ne recompresse pas à chaque message
+        bloc = [self._recents.popleft() for _ in range(self.max_messages // 2)]
+        self._archive.append((len(bloc), zlib.compress(json.dumps(bloc, ensure_ascii=False).encode("utf-8"))))
+        self._archives += len(bloc)
+        while self._archives > self.max_archive and self._archive:
+            nombre, _ = self._archive.popleft()
+            self._archives -= nombre
+
+    def derniers(self, nombre, decalage=0):
+        """Les `nombre` messages qui précèdent les `decalage` derniers, du plus ancien au plus récent."""
+        fin = len(self) - decalage
+        debut = max(fin - nombre, 0)
+        if fin <= debut:
+            return []
+        messages = []
+        if debut < self._archives:
+            # Seuls les blocs concernés sont décompressés
+            position = 0
+            for taille, bloc in self._archive:
+                if position + taille > debut and position < fin:
+                    bloc = json.loads(zlib.decompress(bloc))
+                    messages += [tuple(m) for m in bloc[max(debut - position, 0):fin - position]]
+                position += taille
+        recents = list(self._recents)
+        messages += recents[max(debut - self._archives, 0):max(fin - self._archives, 0)]
+        return messages
+
+    def octets(self):
+        """Mémoire occupée (estimation) : textes en clair et blocs archivés."""
+        return (sys.getsizeof(self._recents) + sum(sys.getsizeof(contenu) + 64 for _, contenu in self._recents)
+                + sum(sys.getsizeof(bloc) for _, bloc in self._archive))
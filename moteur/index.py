@@ -0,0 +1,313 @@
+"""
+Index vectoriel persistant (ChromaDB sur disque).
+
+Chaque extrait est identifié par l'empreinte de son texte et du modèle d'embedding :
+au redémarrage, seuls les extraits nouveaux ou modifiés sont vectorisés et les
+extraits disparus sont supprimés. Plus besoin de changer le nom de la collection
+à la main pour forcer une mise à jour.
+
+L'ingestion se fait en flux (fiches lues par morceaux, extraits vectorisés et écrits
+par vagues bornées) : la mémoire ne dépend pas de la taille du corpus.
+"""
+import hashlib
+import itertools
+import logging
+import math
+import os
+import sys
+import time
+from collections import deque
+from contextlib import nullcontext
+
+from .decoupage import DECOUPAGES, fenetres, premier_titre, sections
+from .ingestion import RapportIngestion, vectoriser_par_lots
+
+journal = logging.getLogger(__name__)
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DOSSIER_INDEX = os.environ.get("CERVEAU_DOSSIER", os.path.join(RACINE, ".cerveau"))
+
+TAILLE_LECTURE = 1 << 20  # caractères lus à la fois dans une fiche
+# Au-delà de ce volume (octets), les fiches sont découpées par un pool de processus
+SEUIL_PARALLELE = int(os.environ.get("INGESTION_SEUIL_PARALLELE", str(8 << 20)))
+NB_PROCESSUS = int(os.environ.get("INGESTION_PROCESSUS", "0")) or min(os.cpu_count() or 1, 4)
+# Seul le découpage par sections (analyse ligne à ligne) coûte plus que le transfert des
+# extraits entre processus ; les fenêtres glissantes restent découpées sur place
+DECOUPAGES_PARALLELES = {"sections"}
+
+
+def empreinte(texte, modele):
+    """Identifiant stable d'un extrait : SHA-256 du modèle et du texte."""
+    return hashlib.sha256(f"{modele}\x00{texte}".encode("utf-8")).hexdigest()
+
+
+def empreinte_corpus(extraits, modele):
+    """Empreinte de l'ensemble du corpus : change dès qu'une fiche est modifiée."""
+    return empreinte_ids(empreinte(texte, modele) for texte, _ in extraits)
+
+
+def empreinte_ids(ids):
+    """Même empreinte, à partir des identifiants des extraits (doublons compris)."""
+    return hashlib.sha256("".join(sorted(ids)).encode("ascii")).hexdigest()
+
+
+def nom_collection(domaine, modele):
+    # Une collection par couple (domaine, modèle) : deux modèles n'ont pas la même dimension
+    return f"{domaine}_{hashlib.sha256(modele.encode('utf-8')).hexdigest()[:8]}"
+
+
+def ouvrir_client(dossier=DOSSIER_INDEX):
+    # --- CORRECTIF POUR LE CLOUD (SQLite trop ancien sur Streamlit Cloud) ---
+    try:
+        __import__('pysqlite3')
+        sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+    except ImportError:
+        pass
+
+    import chromadb
+
+    return chromadb.PersistentClient(path=dossier)
+
+
+class CollectionChroma:
+    """Collection ChromaDB, avec la même méthode `rechercher` que `recherche.IndexNumpy`."""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, nom):
+        return getattr(self._collection, nom)
+
+    def rechercher(self, vecteur, question, k):
+        res = self._collection.query(query_embeddings=[vecteur], n_results=k)
+        return res['documents'][0] if res['documents'] else []
+
+
+def ouvrir_collection(client, domaine, modele):
+    return CollectionChroma(
+        client.get_or_create_collection(nom_collection(domaine, modele), metadata={"modele": modele})
+    )
+
+
+def _fichiers(dossier, fichiers=()):
+    if fichiers:
+        return fichiers
+    try:
+        # requirements.txt est dans chaque dossier mais n'est pas une fiche
+        return sorted(f for f in os.listdir(dossier) if f.endswith(".txt") and f != "requirements.txt")
+    except FileNotFoundError:
+        return []
+
+
+def lire_fiches(dossier, fichiers=()):
+    """Contenu des fiches .txt du dossier (toutes, ou seulement `fichiers`) : liste de `(fichier, texte)`."""
+    fiches = []
+    for fichier in _fichiers(dossier, fichiers):
+        chemin = os.path.join(dossier, fichier)
+        if not os.path.exists(chemin):
+            continue
+        with open(chemin, "r", encoding="utf-8") as f:
+            fiches.append((fichier, f.read()))
+    return fiches
+
+
+def signature_fiches(dossier, fichiers=()):
+    """Date de modification et taille de chaque fiche : change dès qu'une fiche est ajoutée, modifiée ou supprimée."""
+    signature = []
+    for fichier in _fichiers(dossier, fichiers):
+        try:
+            infos = os.stat(os.path.join(dossier, fichier))
+        except FileNotFoundError:
+            continue
+        signature.append((fichier, infos.st_mtime_ns, infos.st_size))
+    return tuple(signature)
+
+
+# --- Lecture en flux ---
+def _morceaux(chemin):
+    with open(chemin, "r", encoding="utf-8") as f:
+        while morceau := f.read(TAILLE_LECTURE):
+            yield morceau
+
+
+def _lignes(chemin):
+    with open(chemin, "r", encoding="utf-8") as f:
+        for ligne in f:
+            yield from ligne.splitlines()
+
+
+def extraits_fiche(chemin, fichier, decoupage="fenetre"):
+    """Extraits d'une fiche, lue au fur et à mesure du découpage (mêmes extraits que `DECOUPAGES`)."""
+    if decoupage == "fenetre":
+        return fenetres(_morceaux(chemin), fichier)
+    if decoupage == "sections":
+        return sections(_lignes(chemin), fichier, titre=premier_titre(_lignes(chemin)))
+    # Un extrait par fiche : la fiche est lue en entier
+    with open(chemin, "r", encoding="utf-8") as f:
+        return iter(DECOUPAGES[decoupage](f.read(), fichier))
+
+
+def _decouper_fiche(chemin, fichier, decoupage):
+    # Exécuté dans un processus du pool : les extraits d'une fiche reviennent en une fois
+    try:
+        return list(extraits_fiche(chemin, fichier, decoupage))
+    except FileNotFoundError:
+        return None
+
+
+def _decouper_en_parallele(fiches, decoupage, nb_processus):
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    # "spawn" : le processus a déjà des threads (Streamlit, préchauffages), un fork n'est pas sûr
+    with ProcessPoolExecutor(nb_processus, mp_context=multiprocessing.get_context("spawn")) as pool:
+        fiches = iter(fiches)
+        en_cours = deque()
+
+        def soumettre(fiche):
+            fichier, chemin, taille = fiche
+            en_cours.append((fichier, taille, pool.submit(_decouper_fiche, chemin, fichier, decoupage)))
+
+        # Au plus deux fiches d'avance par processus : les extraits non consommés restent bornés
+        for fiche in itertools.islice(fiches, 2 * nb_processus):
+            soumettre(fiche)
+        while en_cours:
+            fichier, taille, futur = en_cours.popleft()
+            fiche = next(fiches, None)
+            if fiche is not None:
+                soumettre(fiche)
+            yield fichier, taille, futur.result()
+
+
+def iterer_extraits(dossier, fichiers=(), decoupage="fenetre", rapport=None, nb_processus=NB_PROCESSUS):
+    """
+    Extraits `(texte, metadonnees)` des fiches .txt du dossier (toutes, ou seulement
+    `fichiers`), fiche après fiche, sans jamais charger tout le corpus. Au-delà de
+    SEUIL_PARALLELE octets, les fiches sont découpées en parallèle par un pool de processus
+    (DECOUPAGES_PARALLELES), dans l'ordre des fichiers.
+    `rapport` (`ingestion.RapportIngestion`) reçoit l'avancement de la lecture.
+    """
+    fiches = []
+    for fichier in _fichiers(dossier, fichiers):
+        chemin = os.path.join(dossier, fichier)
+        try:
+            fiches.append((fichier, chemin, os.path.getsize(chemin)))
+        except FileNotFoundError:
+            continue
+    volume = sum(taille for _, _, taille in fiches)
+    if rapport is not None:
+        rapport.fichiers, rapport.octets = len(fiches), volume
+
+    if decoupage in DECOUPAGES_PARALLELES and nb_processus > 1 and len(fiches) > 1 and volume >= SEUIL_PARALLELE:
+        resultats = _decouper_en_parallele(fiches, decoupage, nb_processus)
+    else:
+        resultats = (
+            (fichier, taille, extraits_fiche(chemin, fichier, decoupage)) for fichier, chemin, taille in fiches
+        )
+
+    for fichier, taille, extraits in resultats:
+        try:
+            yield from extraits if extraits is not None else ()
+        except FileNotFoundError:
+            # Fiche supprimée depuis la liste : la surveillance rechargera le domaine
+            journal.warning("Fiche %s disparue pendant la lecture", fichier)
+        if rapport is not None:
+            rapport.fichiers_lus += 1
+            rapport.octets_lus += taille
+
+
+def decouper_dossier(dossier, fichiers=(), decoupage="fenetre"):
+    """
+    Découpe les fiches .txt du dossier (toutes, ou seulement `fichiers`) et renvoie
+    une liste de `(texte, metadonnees)`. Voir `moteur.decoupage` pour les modes,
+    et `iterer_extraits` pour un corpus trop gros pour tenir en mémoire.
+    """
+    return list(iterer_extraits(dossier, fichiers, decoupage, nb_processus=1))
+
+
+def ids_dossier(dossier, fichiers=(), decoupage="fenetre", modele=""):
+    """Identifiants des extraits des fiches (doublons compris), pour `empreinte_ids` ; le texte n'est pas gardé."""
+    return [empreinte(texte, modele) for texte, _ in iterer_extraits(dossier, fichiers, decoupage)]
+
+
+# --- Synchronisation ---
+def synchroniser(collection, extraits, embeddings, progression=None, rapport=None, en_service=False):
+    """
+    Aligne la collection sur `extraits` (tout itérable, parcouru une seule fois) : seuls
+    les extraits nouveaux sont vectorisés, par vagues de `taille_lot × nb_workers`, et
+    chaque lot est écrit dans l'index dès qu'il est prêt : c'est le point de reprise si
+    l'ingestion est interrompue. Les extraits obsolètes sont supprimés à la fin. Seuls
+    une vague et les identifiants restent en mémoire.
+    `en_service` : mise à jour d'un index déjà interrogé, qui doit avoir `par_lots` (IndexNumpy) :
+    ajouts et suppressions sont publiés ensemble à la fin, et si des lots échouent, les extraits obsolètes sont
+    gardés : mieux vaut l'ancienne version d'un passage qu'aucune.
+    `progression(rapport)` reçoit régulièrement le `RapportIngestion`. Renvoie `(ajoutes, echecs)` ;
+    `rapport.supprimes` compte les extraits obsolètes retirés.
+    """
+    if en_service and not hasattr(collection, "par_lots"):
+        raise ValueError("mise à jour en service impossible : la collection ne publie pas ses ajouts en une fois")
+    rapport = rapport or RapportIngestion()
+    deja_indexes = set(collection.get(include=[])["ids"])
+    vus, vague = set(), []
+    taille_vague = embeddings.taille_lot * embeddings.nb_workers
+    signale = time.monotonic()
+
+    def vectoriser(vague):
+        lots = vectoriser_par_lots(
+            [texte for _, texte, _ in vague], embeddings.vectoriser_documents,
+            taille_lot=embeddings.taille_lot, nb_workers=embeddings.nb_workers, limiteur=embeddings.limiteur,
+        )
+        for debut, vecteurs in lots:
+            lot = vague[debut : debut + embeddings.taille_lot]
+            if vecteurs is None:
+                rapport.echecs += len(lot)
+            else:
+                collection.add(
+                    ids=[i for i, _, _ in lot],
+                    documents=[t for _, t, _ in lot],
+                    metadatas=[m for _, _, m in lot],
+                    embeddings=vecteurs,
+                )
+                rapport.vectorises += len(lot)
+            if progression:
+                progression(rapport)
+
+    with _ajouts_groupes(collection, math.inf if en_service else None):
+        for texte, meta in extraits:
+            id_doc = empreinte(texte, embeddings.modele)
+            # Un extrait présent deux fois n'est indexé qu'une fois
+            if id_doc in vus:
+                continue
+            vus.add(id_doc)
+            rapport.extraits += 1
+            if id_doc not in deja_indexes:
+                vague.append((id_doc, texte, meta))
+                rapport.a_vectoriser += 1
+                if len(vague) >= taille_vague:
+                    vectoriser(vague)
+                    vague = []
+            if progression and time.monotonic() - signale >= 1.0:
+                # Reprise d'un index déjà complet : la lecture seule avance
+                progression(rapport)
+                signale = time.monotonic()
+        if vague:
+            vectoriser(vague)
+
+        obsoletes = list(deja_indexes - vus)
+        if obsoletes and not (en_service and rapport.echecs):
+            collection.delete(ids=obsoletes)
+            rapport.supprimes = len(obsoletes)
+    if progression:
+        progression(rapport)
+    if rapport.a_vectoriser:
+        journal.info("Ingestion : %s", rapport)
+    return rapport.vectorises, rapport.echecs
+
+
+def _ajouts_groupes(collection, periode=None):
+    # IndexNumpy publie ses ajouts par paquets pendant une ingestion (voir `IndexNumpy.par_lots`)
+    par_lots = getattr(collection, "par_lots", None)
+    if not par_lots:
+        return nullcontext()
+    return par_lots(periode) if periode is not None else par_lots()
+
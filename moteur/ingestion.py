@@ -0,0 +1,91 @@
+"""
+Vectorisation par lots : requêtes groupées envoyées par un pool de threads borné,
+sous le quota partagé des embeddings (priorité basse, voir `moteur.ordonnanceur`), avec reprise sur erreur (backoff exponentiel).
+`RapportIngestion` suit l'avancement et le débit d'une ingestion (voir `index.synchroniser`).
+"""
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . import ordonnanceur
+
+journal = logging.getLogger(__name__)
+
+TAILLE_LOT = 50  # L'API embed_content accepte jusqu'à 100 textes par requête
+NB_WORKERS = 4
+TENTATIVES = 5
+
+
+class RapportIngestion:
+    """Avancement et débit d'une ingestion, mis à jour au fil de la lecture et de la vectorisation."""
+
+    def __init__(self):
+        self.fichiers = self.octets = 0        # fiches à lire et leur taille
+        self.fichiers_lus = self.octets_lus = 0
+        self.extraits = 0                      # extraits lus (doublons exclus)
+        self.a_vectoriser = 0                  # dont nouveaux ou modifiés
+        self.vectorises = self.echecs = 0
+        self.supprimes = 0                     # extraits obsolètes retirés de l'index
+        self.debut = time.monotonic()
+
+    def en_dict(self):
+        duree = max(time.monotonic() - self.debut, 1e-6)
+        return {
+            "fichiers": self.fichiers, "fichiers_lus": self.fichiers_lus,
+            "octets": self.octets, "octets_lus": self.octets_lus,
+            "extraits": self.extraits, "a_vectoriser": self.a_vectoriser,
+            "vectorises": self.vectorises, "echecs": self.echecs,
+            "octets_par_s": self.octets_lus / duree, "extraits_par_s": self.vectorises / duree,
+        }
+
+    def __str__(self):
+        d = self.en_dict()
+        return (f"{d['fichiers_lus']}/{d['fichiers']} fiches ({d['octets_lus'] / 1e6:.1f}/{d['octets'] / 1e6:.1f} Mo, "
+                f"{d['octets_par_s'] / 1e6:.1f} Mo/s), {d['extraits']} extraits dont {d['vectorises']}/"
+                f"{d['a_vectoriser']} vectorisés ({d['extraits_par_s']:.1f}/s), {d['echecs']} échecs")
+
+
+def avec_reprise(appel, tentatives=TENTATIVES, delai_initial=1.0):
+    """Appelle `appel()` en réessayant avec un backoff exponentiel et de la gigue."""
+    for essai in range(tentatives):
+        try:
+            return appel()
+        except Exception as e:
+            if essai == tentatives - 1:
+                raise
+            delai = delai_initial * 2 ** essai * (1 + random.random())
+            journal.warning("Échec (%s), nouvel essai dans %.1f s", e, delai)
+            time.sleep(delai)
+
+
+def vectoriser_par_lots(documents, vectoriser_lot, taille_lot=TAILLE_LOT, nb_workers=NB_WORKERS,
+                        limiteur=ordonnanceur.ingestion, tentatives=TENTATIVES):
+    """
+    Vectorise `documents` par lots et produit `(debut, vecteurs)` au fil de l'eau,
+    dans l'ordre d'achèvement. Un lot en échec après toutes les tentatives est
+    produit avec `vecteurs=None` : l'appelant ne doit jamais recevoir de listes
+    désalignées.
+    """
+    def traiter(debut):
+        lot = documents[debut : debut + taille_lot]
+
+        def appel():
+            if limiteur:
+                limiteur.acquerir()
+            vecteurs = vectoriser_lot(lot)
+            if len(vecteurs) != len(lot):
+                raise ValueError(f"{len(vecteurs)} vecteurs reçus pour {len(lot)} textes")
+            return vecteurs
+
+        return avec_reprise(appel, tentatives)
+
+    with ThreadPoolExecutor(max_workers=nb_workers) as pool:
+        futurs = {pool.submit(traiter, debut): debut for debut in range(0, len(documents), taille_lot)}
+        for futur in as_completed(futurs):
+            debut = futurs[futur]
+            try:
+                yield debut, futur.result()
+            except Exception as e:
+                journal.error("Lot %d-%d abandonné : %s", debut, debut + taille_lot, e)
+                yield debut, None
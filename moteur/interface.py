@@ -0,0 +1,129 @@
+"""Éléments Streamlit communs aux cinq assistants."""
+import time
+
+import streamlit as st
+
+from . import metriques
+from .coeur import DEMARRAGE
+from .historique import FENETRE, Historique
+
+
+@st.cache_resource(show_spinner=False)
+def _premier_affichage():
+    # Mémorisé une fois par processus : délai entre le démarrage et la première page servie
+    return time.perf_counter() - DEMARRAGE
+
+
+def etat_du_moteur(moteur, nom):
+    """Encadré de la barre latérale : état de l'index du domaine et temps de démarrage."""
+    etat = moteur.etats[nom]
+    with st.sidebar:
+        st.caption(f"⚡ Interface prête {_premier_affichage():.1f} s après le démarrage")
+        if etat["etat"] == "construction":
+            st.caption(f"⏳ Index en préparation, {time.perf_counter() - etat['debut']:.1f} s écoulées")
+            _rapport_ingestion(etat)
+        elif etat["etat"] == "pret":
+            st.caption(f"✅ Index prêt en {etat['duree']:.1f} s")
+            if etat.get("vectorises"):
+                _rapport_ingestion(etat)
+            if etat.get("echecs"):
+                # Les extraits manquants seront repris au prochain démarrage
+                st.warning(f"⚠️ {etat['echecs']} extraits n'ont pas pu être analysés (quota ou réseau).")
+        elif etat["etat"] == "erreur":
+            st.caption(f"❌ Index indisponible : {etat.get('erreur')}")
+
+
+def _rapport_ingestion(etat):
+    # Avancement de la lecture des fiches et débit de la vectorisation (voir ingestion.RapportIngestion)
+    if etat.get("fichiers"):
+        st.caption(f"📄 {etat['fichiers_lus']}/{etat['fichiers']} fiches lues ({etat['octets_lus'] / 1e6:.1f}/"
+                   f"{etat['octets'] / 1e6:.1f} Mo, {etat['octets_par_s'] / 1e6:.1f} Mo/s)")
+    if etat.get("a_vectoriser"):
+        echecs = f", {etat['echecs']} échecs" if etat.get("echecs") else ""
+        st.caption(f"🧮 {etat['vectorises']}/{etat['a_vectoriser']} extraits vectorisés "
+                   f"({etat['extraits_par_s']:.1f}/s){echecs}")
+
+
+def afficher_en_flux(zone, fragments, nom):
+    """
+    Affiche la réponse dans `zone` au fil des fragments (avec un curseur) et renvoie le texte complet.
+    Le temps passé dans Streamlit à redessiner la réponse est mesuré à part de la génération.
+    """
+    reponse, rendu = "", 0.0
+    for fragment in fragments:
+        reponse += fragment
+        debut = time.perf_counter()
+        zone.markdown(reponse + "▌")
+        rendu += time.perf_counter() - debut
+    debut = time.perf_counter()
+    zone.markdown(reponse)
+    metriques.observer_duree("affichage", nom, rendu + time.perf_counter() - debut)
+    return reponse
+
+
+def session_courante():
+    """Identifiant de la session Streamlit : le quota Gemini est partagé à tour de rôle entre sessions."""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    contexte = get_script_run_ctx()
+    return contexte.session_id if contexte else None
+
+
+def suivi_de_file():
+    """
+    Rappel `en_attente` pour `Moteur.repondre` : tant que la question attend son tour
+    dans la file du quota Gemini, sa position s'affiche ici au lieu d'une erreur.
+    """
+    zone = st.empty()
+
+    def en_attente(position):
+        if position:
+            zone.info(f"⏳ Forte affluence : votre question est en position {position} dans la file d'attente.")
+        else:
+            zone.empty()
+
+    return en_attente
+
+
+def historique_de_session(nom, accueil):
+    """
+    Historique de la session pour ce domaine, créé avec le message d'accueil à la première page.
+    Les pages partagent le même st.session_state : chaque domaine a sa propre clé.
+    """
+    cle = f"historique_{nom}"
+    if cle not in st.session_state:
+        st.session_state[cle] = Historique(nom, accueil)
+    return st.session_state[cle]
+
+
+def afficher_historique(historique, avatars=None, fenetre=FENETRE):
+    """
+    Redessine les `fenetre` derniers messages ; les précédents restent repliés et se
+    chargent page par page (« Charger plus »), si bien qu'un rerun ne coûte pas plus
+    cher en fin de longue conversation qu'au début. Le nombre de pages chargées est
+    propre au domaine de l'historique (`historique.nom`).
+    """
+    avatars = avatars or {}
+    anciens = len(historique) - fenetre
+    if anciens > 0:
+        cle_pages = f"historique_pages_{historique.nom}"
+        pages = st.session_state.get(cle_pages, 0)
+        with st.expander(f"📜 {anciens} messages précédents", expanded=pages > 0):
+            if pages * fenetre < anciens and st.button("⬆️ Charger plus", key=f"historique_charger_{historique.nom}"):
+                pages = st.session_state[cle_pages] = pages + 1
+            for role, contenu in historique.derniers(min(pages * fenetre, anciens), decalage=fenetre):
+                st.chat_message(role, avatar=avatars.get(role)).markdown(contenu)
+            if historique.total > len(historique):
+                st.caption(f"{historique.total - len(historique)} messages plus anciens ne sont plus conservés.")
+
+    for role, contenu in historique.derniers(fenetre):
+        st.chat_message(role, avatar=avatars.get(role)).markdown(contenu)
+
+    with st.sidebar:
+        st.caption(f"💬 {historique.total} messages, {historique.octets() / 1024:.0f} Ko en mémoire pour cette session")
+
+
+def signaler_erreur(message, nom, erreur, etape="question"):
+    """Affiche l'erreur avec une référence retrouvable dans les journaux et les métriques."""
+    reference = metriques.signaler_erreur(etape, nom, erreur)
+    st.error(f"{message} : {erreur} (réf. {reference})")
@@ -0,0 +1,46 @@
+"""Seau à jetons (limiteur de débit) ; les quotas de l'API Google sont dans `moteur.ordonnanceur`."""
+import threading
+import time
+
+
+class SeauAJetons:
+    """
+    Seau à jetons thread-safe : `debit` jetons par seconde, au plus `capacite`
+    en réserve. `acquerir` bloque jusqu'à ce que les jetons soient disponibles.
+    """
+
+    def __init__(self, debit, capacite=None):
+        self.debit = float(debit)
+        self.capacite = float(capacite if capacite is not None else debit)
+        self._jetons = self.capacite
+        self._horodatage = time.monotonic()
+        self._verrou = threading.Lock()
+
+    def _remplir(self):
+        maintenant = time.monotonic()
+        self._jetons = min(self.capacite, self._jetons + (maintenant - self._horodatage) * self.debit)
+        self._horodatage = maintenant
+
+    def attente(self, n=1):
+        """Secondes à attendre avant de pouvoir prendre `n` jetons (0 si disponible)."""
+        with self._verrou:
+            self._remplir()
+            return max(0.0, (n - self._jetons) / self.debit)
+
+    def essayer(self, n=1):
+        with self._verrou:
+            self._remplir()
+            if self._jetons >= n:
+                self._jetons -= n
+                return True
+            return False
+
+    def acquerir(self, n=1):
+        while not self.essayer(n):
+            time.sleep(max(self.attente(n), 0.001))
+
+    def prelever(self, n):
+        """Retire `n` jetons sans attendre, quitte à passer en négatif (`n` négatif : jetons rendus)."""
+        with self._verrou:
+            self._remplir()
+            self._jetons = min(self.capacite, self._jetons - n)
@@ -0,0 +1,215 @@
+"""
+Instrumentation du parcours d'une question : durée de chaque étape (embedding,
+recherche, cache, premier fragment Gemini, génération, affichage), tailles du
+prompt et du contexte, tokens de réponse, succès des caches et erreurs.
+
+Deux sorties, toutes deux étiquetées par domaine :
+- histogrammes et compteurs au format texte Prometheus, servis sur
+  http://<hôte>:$METRIQUES_PORT/metrics si la variable est définie ;
+- un événement JSON par étape et par question dans $TRACES_JSONL (fichier
+  tournant : $TRACES_TAILLE_MAX octets, $TRACES_FICHIERS archives).
+Le texte des questions n'est jamais enregistré, seulement sa longueur.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+journal = logging.getLogger(__name__)
+
+BORNES_DUREE = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BORNES_TOKENS = (32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+BORNES_OCTETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# nom -> (type, aide, bornes)
+DEFINITIONS = {
+    "moteur_etape_duree_secondes": ("histogram", "Durée de chaque étape du parcours d'une question", BORNES_DUREE),
+    "moteur_tokens": ("histogram", "Tokens (estimés si l'API ne les donne pas) du prompt, du contexte et de la réponse",
+                      BORNES_TOKENS),
+    "moteur_historique_octets": ("histogram", "Mémoire occupée par l'historique d'une session, à chaque message",
+                                 BORNES_OCTETS),
+    "moteur_cache_total": ("counter", "Consultations des caches (requetes, reponses) par résultat", None),
+    "moteur_questions_total": ("counter", "Questions traitées par origine de la réponse", None),
+    "moteur_erreurs_total": ("counter", "Erreurs par étape et type d'exception", None),
+    "moteur_appels_amont_total": ("counter", "Appels aux API Google par résultat (succes, erreur, delai, "
+                                  "couverture, circuit_ouvert)", None),
+}
+
+
+def estimer_tokens(texte):
+    """~4 caractères par token pour le français (à défaut du décompte de l'API)."""
+    return round(len(texte) / 4)
+
+
+class _Histogramme:
+    def __init__(self, bornes):
+        self.bornes = bornes
+        self.cumuls = [0] * len(bornes)
+        self.somme = 0.0
+        self.nombre = 0
+
+    def observer(self, valeur):
+        for i, borne in enumerate(self.bornes):
+            if valeur <= borne:
+                self.cumuls[i] += 1
+        self.somme += valeur
+        self.nombre += 1
+
+
+def _etiquettes(etiquettes, **en_plus):
+    paires = sorted({**etiquettes, **en_plus}.items())
+    return "{" + ",".join(f'{cle}="{str(val)}"' for cle, val in paires) + "}" if paires else ""
+
+
+class Registre:
+    """Séries en mémoire du processus, partagées par toutes les sessions."""
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._series = {}  # (nom, etiquettes triées) -> _Histogramme ou float
+
+    def observer(self, nom, valeur, **etiquettes):
+        cle = (nom, tuple(sorted(etiquettes.items())))
+        with self._verrou:
+            serie = self._series.get(cle)
+            if serie is None:
+                serie = self._series[cle] = _Histogramme(DEFINITIONS[nom][2])
+            serie.observer(valeur)
+
+    def compter(self, nom, valeur=1, **etiquettes):
+        cle = (nom, tuple(sorted(etiquettes.items())))
+        with self._verrou:
+            self._series[cle] = self._series.get(cle, 0) + valeur
+
+    def exposer(self):
+        """Toutes les séries au format texte d'exposition Prometheus."""
+        lignes = []
+        with self._verrou:
+            for nom, (genre, aide, _) in DEFINITIONS.items():
+                series = [(dict(e), s) for (n, e), s in sorted(self._series.items()) if n == nom]
+                if not series:
+                    continue
+                lignes += [f"# HELP {nom} {aide}", f"# TYPE {nom} {genre}"]
+                for etiquettes, serie in series:
+                    if genre == "counter":
+                        lignes.append(f"{nom}{_etiquettes(etiquettes)} {serie}")
+                        continue
+                    for borne, cumul in zip(serie.bornes, serie.cumuls):
+                        lignes.append(f"{nom}_bucket{_etiquettes(etiquettes, le=borne)} {cumul}")
+                    lignes.append(f"{nom}_bucket{_etiquettes(etiquettes, le='+Inf')} {serie.nombre}")
+                    lignes.append(f"{nom}_sum{_etiquettes(etiquettes)} {serie.somme}")
+                    lignes.append(f"{nom}_count{_etiquettes(etiquettes)} {serie.nombre}")
+        return "\n".join(lignes) + "\n"
+
+
+registre = Registre()
+
+# --- Traces JSONL ---
+_traces = logging.getLogger("moteur.traces")
+_traces.propagate = False
+if os.environ.get("TRACES_JSONL"):
+    _traces.setLevel(logging.INFO)
+    _traces.addHandler(logging.handlers.RotatingFileHandler(
+        os.environ["TRACES_JSONL"],
+        maxBytes=int(os.environ.get("TRACES_TAILLE_MAX", str(10 * 1024 * 1024))),
+        backupCount=int(os.environ.get("TRACES_FICHIERS", "5")),
+        encoding="utf-8",
+    ))
+
+
+def evenement(genre, domaine, **champs):
+    if _traces.handlers:
+        _traces.info(json.dumps({"t": time.time(), "type": genre, "domaine": domaine, **champs}, ensure_ascii=False))
+
+
+# --- API d'instrumentation ---
+def observer_duree(etape, domaine, duree, **champs):
+    registre.observer("moteur_etape_duree_secondes", duree, domaine=domaine, etape=etape)
+    evenement("etape", domaine, etape=etape, duree=duree, **champs)
+
+
+def observer_tokens(genre, domaine, nombre):
+    registre.observer("moteur_tokens", nombre, domaine=domaine, type=genre)
+
+
+def observer_historique(domaine, octets):
+    registre.observer("moteur_historique_octets", octets, domaine=domaine)
+
+
+def compter_cache(cache, domaine, succes):
+    registre.compter("moteur_cache_total", domaine=domaine, cache=cache, resultat="succes" if succes else "echec")
+
+
+def compter_question(domaine, origine):
+    registre.compter("moteur_questions_total", domaine=domaine, origine=origine)
+
+
+def compter_amont(amont, resultat):
+    registre.compter("moteur_appels_amont_total", amont=amont, resultat=resultat)
+
+
+def signaler_erreur(etape, domaine, erreur):
+    """Compte et journalise une erreur ; renvoie une référence courte à montrer à l'utilisateur."""
+    reference = uuid.uuid4().hex[:8]
+    registre.compter("moteur_erreurs_total", domaine=domaine, etape=etape, type=type(erreur).__name__)
+    evenement("erreur", domaine, etape=etape, erreur=type(erreur).__name__, message=str(erreur), reference=reference)
+    journal.error("[%s] erreur %s pendant %s : %s", domaine, reference, etape, erreur)
+    return reference
+
+
+@contextmanager
+def mesurer(etape, domaine, **champs):
+    """Chronomètre le bloc ; une exception est comptée (puis relevée) avant l'enregistrement de la durée."""
+    debut = time.perf_counter()
+    try:
+        yield champs
+    except Exception as e:
+        registre.compter("moteur_erreurs_total", domaine=domaine, etape=etape, type=type(e).__name__)
+        champs["erreur"] = type(e).__name__
+        raise
+    finally:
+        observer_duree(etape, domaine, time.perf_counter() - debut, **champs)
+
+
+# --- Point de collecte Prometheus ---
+class _Collecte(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        corps = registre.exposer().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_serveur = None
+_verrou_serveur = threading.Lock()
+
+
+def demarrer_serveur(port=None):
+    """Sert /metrics sur `port` (ou $METRIQUES_PORT) dans un thread ; une seule fois par processus."""
+    global _serveur
+    port = port or os.environ.get("METRIQUES_PORT")
+    if not port:
+        return None
+    with _verrou_serveur:
+        if _serveur is None:
+            try:
+                _serveur = ThreadingHTTPServer(("0.0.0.0", int(port)), _Collecte)
+            except OSError as e:
+                # Plusieurs apps lancées séparément : seule la première expose ses métriques
+                journal.warning("Métriques non exposées sur le port %s : %s", port, e)
+                return None
+            threading.Thread(target=_serveur.serve_forever, name="metriques", daemon=True).start()
+        return _serveur
@@ -0,0 +1,99 @@
+"""
+Embeddings locaux sur CPU avec ONNX Runtime : MiniLM quantifié en int8, sans
+PyTorch ni appel réseau. Quelques millisecondes par question, un modèle de ~23 Mo
+au lieu de ~90 Mo, et des vecteurs stockés en float16.
+
+Préparation (une fois, télécharge le modèle int8 publié avec all-MiniLM-L6-v2) :
+
+    python -m moteur.onnx_local [--variante avx2|avx512|arm64]
+
+Puis, pour les cinq assistants : MOTEUR_EMBEDDINGS=onnx:all-MiniLM-L6-v2-int8
+"""
+import argparse
+import os
+import shutil
+import sys
+
+from .index import RACINE
+
+DOSSIER_MODELES = os.environ.get("MOTEUR_MODELES", os.path.join(RACINE, "modeles"))
+DEPOT_HF = "sentence-transformers/all-MiniLM-L6-v2"
+VARIANTES = {
+    "avx2": "onnx/model_quint8_avx2.onnx",
+    "avx512": "onnx/model_qint8_avx512.onnx",
+    "arm64": "onnx/model_qint8_arm64.onnx",
+}
+
+
+class EmbeddingsOnnx:
+    """Modèle ONNX int8 (dossier contenant `model.onnx` et `tokenizer.json`)."""
+
+    limiteur = None
+    nb_workers = 1  # ONNX Runtime parallélise déjà chaque lot
+    taille_lot = 64
+    dtype_stockage = "float16"
+    longueur_max = 256
+
+    def __init__(self, modele):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.modele = modele
+        nom = modele.split(":", 1)[1]
+        dossier = nom if os.path.isabs(nom) else os.path.join(DOSSIER_MODELES, nom)
+
+        self._tokenizer = Tokenizer.from_file(os.path.join(dossier, "tokenizer.json"))
+        self._tokenizer.enable_truncation(max_length=self.longueur_max)
+        self._tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = int(os.environ.get("ONNX_THREADS", "0"))  # 0 : tous les cœurs
+        self._session = ort.InferenceSession(
+            os.path.join(dossier, "model.onnx"), options, providers=["CPUExecutionProvider"]
+        )
+        self._entrees = {e.name for e in self._session.get_inputs()}
+
+    def _encoder(self, textes):
+        import numpy as np
+
+        encodages = self._tokenizer.encode_batch(list(textes))
+        ids = np.array([e.ids for e in encodages], dtype=np.int64)
+        masque = np.array([e.attention_mask for e in encodages], dtype=np.int64)
+        entrees = {"input_ids": ids, "attention_mask": masque}
+        if "token_type_ids" in self._entrees:
+            entrees["token_type_ids"] = np.zeros_like(ids)
+
+        etats = self._session.run(None, entrees)[0]
+        # Moyenne des tokens réels (mean pooling de sentence-transformers), puis normalisation
+        poids = masque[:, :, None].astype(np.float32)
+        vecteurs = (etats * poids).sum(axis=1) / np.clip(poids.sum(axis=1), 1e-9, None)
+        return vecteurs / np.linalg.norm(vecteurs, axis=1, keepdims=True)
+
+    def vectoriser_documents(self, docs):
+        return self._encoder(docs).tolist()
+
+    def vectoriser_requete(self, question):
+        return self._encoder([question])[0].tolist()
+
+
+def telecharger(variante="avx2", nom="all-MiniLM-L6-v2-int8", dossier=DOSSIER_MODELES):
+    """Récupère le modèle int8 et le tokenizer publiés sur le Hub Hugging Face."""
+    from huggingface_hub import hf_hub_download
+
+    cible = os.path.join(dossier, nom)
+    os.makedirs(cible, exist_ok=True)
+    shutil.copyfile(hf_hub_download(DEPOT_HF, VARIANTES[variante]), os.path.join(cible, "model.onnx"))
+    shutil.copyfile(hf_hub_download(DEPOT_HF, "tokenizer.json"), os.path.join(cible, "tokenizer.json"))
+    return cible
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Télécharge le modèle d'embedding ONNX int8.")
+    parser.add_argument("--variante", choices=sorted(VARIANTES), default="avx2")
+    args = parser.parse_args(argv)
+    print(f"Modèle prêt dans {telecharger(args.variante)}")
+    print("Activez-le avec MOTEUR_EMBEDDINGS=onnx:all-MiniLM-L6-v2-int8")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""
+Ordonnanceur des appels aux API Google, partagé par tout le processus : le quota
+(requêtes et tokens par minute) est réparti entre les sessions au lieu d'être
+consommé au premier arrivé, jusqu'aux erreurs 429.
+
+- Deux seaux à jetons par service amont : requêtes / minute et tokens / minute
+  (GEMINI_RPM, GEMINI_TPM, EMBEDDINGS_RPM, EMBEDDINGS_TPM ; 0 = pas de limite en tokens).
+- Priorités : les questions des utilisateurs (INTERACTIF) passent avant l'ingestion
+  et les précalculs (FOND).
+- Équité : à priorité égale, les sessions sont servies à tour de rôle ; une session
+  qui envoie dix questions n'en fait pas attendre dix aux autres.
+- Une demande en attente connaît sa position dans la file (voir `Quota.position`),
+  que les pages affichent à la place d'une erreur.
+
+Les tokens sont estimés avant l'appel, puis corrigés avec le décompte de l'API (`corriger`).
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from . import metriques
+from .limiteur import SeauAJetons
+
+INTERACTIF, FOND = 0, 1
+
+# Réserve de capacité des seaux, en secondes de débit (rafale admise après une période calme)
+RAFALE = float(os.environ.get("ORDONNANCEUR_RAFALE", "1"))
+# Tokens réservés pour la réponse, en plus du prompt (corrigés après l'appel)
+RESERVE_REPONSE = int(os.environ.get("ORDONNANCEUR_RESERVE_REPONSE", "512"))
+
+_local = threading.local()
+
+
+@contextmanager
+def demande(domaine="-", session=None, suivi=None):
+    """
+    Attribue les appels faits dans ce bloc (et ce thread) à une session ; `suivi`
+    reçoit l'attribut `attente` = `(quota, ticket)` pendant qu'un appel attend son tour.
+    """
+    precedente = getattr(_local, "demande", None)
+    _local.demande = (domaine, session, suivi)
+    try:
+        yield
+    finally:
+        _local.demande = precedente
+
+
+class _Ticket:
+    __slots__ = ("session", "priorite", "jetons")
+
+    def __init__(self, session, priorite, jetons):
+        self.session = session
+        self.priorite = priorite
+        self.jetons = jetons
+
+
+class Quota:
+    """File d'attente d'un service amont, à priorités et équitable entre sessions."""
+
+    def __init__(self, nom, rpm, tpm=0, rafale=RAFALE):
+        self.nom = nom
+        self.requetes = SeauAJetons(rpm / 60.0, capacite=max(1.0, rpm / 60.0 * rafale))
+        self.tokens = SeauAJetons(tpm / 60.0, capacite=tpm / 60.0 * rafale) if tpm else None
+        self._condition = threading.Condition()
+        # Par priorité : session -> tickets en attente ; l'ordre des sessions est le tour de rôle
+        self._files = (OrderedDict(), OrderedDict())
+
+    def _tete(self):
+        for file in self._files:
+            for tickets in file.values():
+                return tickets[0]
+        return None
+
+    def _attente_jetons(self, ticket):
+        attente = self.requetes.attente(1)
+        if self.tokens is not None:
+            attente = max(attente, self.tokens.attente(ticket.jetons))
+        return attente
+
+    def acquerir(self, jetons=0, priorite=INTERACTIF, session=None):
+        """Bloque jusqu'au tour de l'appel et à la disponibilité du quota ; renvoie les tokens réservés."""
+        domaine, session_courante, suivi = getattr(_local, "demande", None) or ("-", None, None)
+        session = session if session is not None else session_courante
+        jetons = min(jetons, self.tokens.capacite) if self.tokens is not None else 0
+        ticket = _Ticket(session, priorite, jetons)
+        debut = time.monotonic()
+        with self._condition:
+            self._files[priorite].setdefault(session, deque()).append(ticket)
+            if suivi is not None:
+                suivi.attente = (self, ticket)
+            try:
+                while True:
+                    if self._tete() is ticket:
+                        attente = self._attente_jetons(ticket)
+                        if attente <= 0:
+                            self.requetes.essayer(1)
+                            if self.tokens is not None:
+                                self.tokens.prelever(jetons)
+                            break
+                        self._condition.wait(attente)
+                    else:
+                        self._condition.wait()
+            finally:
+                file = self._files[priorite]
+                file[session].remove(ticket)
+                if file[session]:
+                    # Tour de rôle : la session repasse derrière les autres
+                    file.move_to_end(session)
+                else:
+                    del file[session]
+                if suivi is not None:
+                    suivi.attente = None
+                self._condition.notify_all()
+        metriques.observer_duree(f"file_{self.nom}", domaine, time.monotonic() - debut, priorite=priorite)
+        return jetons
+
+    def essayer(self, jetons=0):
+        """Prélève un tour sans attendre, seulement si aucun appel n'attend déjà ; True si accordé."""
+        jetons = min(jetons, self.tokens.capacite) if self.tokens is not None else 0
+        with self._condition:
+            if self._tete() is not None or self._attente_jetons(_Ticket(None, INTERACTIF, jetons)) > 0:
+                return False
+            self.requetes.essayer(1)
+            if self.tokens is not None:
+                self.tokens.prelever(jetons)
+            return True
+
+    def corriger(self, ecart):
+        """Tokens réellement consommés moins ceux réservés (négatif : rendus au seau)."""
+        if self.tokens is not None and ecart:
+            self.tokens.prelever(ecart)
+
+    def position(self, ticket):
+        """Rang (à partir de 1) de l'appel dans l'ordre de service, ou None s'il n'attend plus."""
+        with self._condition:
+            file = self._files[ticket.priorite]
+            tickets = file.get(ticket.session)
+            if not tickets or ticket not in tickets:
+                return None
+            rang = tickets.index(ticket)  # le ticket est servi au tour `rang` de sa session
+            devant = sum(len(t) for f in self._files[:ticket.priorite] for t in f.values())
+            avant = True
+            for session, autres in file.items():
+                if session == ticket.session:
+                    avant = False
+                    continue
+                # Les sessions placées avant servent aussi le tour du ticket, les suivantes non
+                devant += min(len(autres), rang + 1 if avant else rang)
+            return devant + rang + 1
+
+    def en_attente(self):
+        with self._condition:
+            return sum(len(t) for f in self._files for t in f.values())
+
+
+class Priorite:
+    """Vue d'un quota à priorité fixe, avec la méthode `acquerir()` attendue par `ingestion.vectoriser_par_lots`."""
+
+    def __init__(self, quota, priorite):
+        self.quota = quota
+        self.priorite = priorite
+
+    def acquerir(self, jetons=0):
+        return self.quota.acquerir(jetons, priorite=self.priorite)
+
+
+def estimer(prompt):
+    """Tokens à réserver pour une génération : prompt estimé et réserve pour la réponse."""
+    return metriques.estimer_tokens(str(prompt)) + RESERVE_REPONSE
+
+
+# Un quota par service amont, partagé par tout le processus
+generation = Quota(
+    "generation", rpm=float(os.environ.get("GEMINI_RPM", "1000")), tpm=float(os.environ.get("GEMINI_TPM", "4000000")),
+)
+embeddings = Quota(
+    "embeddings", rpm=float(os.environ.get("EMBEDDINGS_RPM", "1500")), tpm=float(os.environ.get("EMBEDDINGS_TPM", "0")),
+)
+ingestion = Priorite(embeddings, FOND)
@@ -0,0 +1,212 @@
+"""
+Pipeline asynchrone partagé par toutes les sessions du processus, avec
+regroupement des requêtes en vol (« singleflight »).
+
+Quand plusieurs sessions posent la même question (au texte normalisé près, ou à
+embedding quasi identique) pendant qu'une réponse est en cours de génération,
+elles s'abonnent toutes à la même génération : un seul appel à Gemini, dont les
+fragments sont diffusés à chaque session (rattrapage des fragments déjà reçus compris).
+
+La coordination tourne sur une boucle asyncio dédiée (un thread) ; les appels
+bloquants du SDK Google s'exécutent dans un pool de threads borné.
+"""
+import asyncio
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from . import metriques, ordonnanceur, resilience
+from .cache import normaliser_question
+from .domaines import DOMAINES
+
+journal = logging.getLogger(__name__)
+
+# Intervalle de mise à jour de la position dans la file du quota (secondes)
+SUIVI_FILE = 0.25
+
+
+class Diffusion:
+    """Une génération en vol et ses abonnés. N'est manipulée que depuis la boucle asyncio."""
+
+    def __init__(self, nom, vecteur, session=None, calcul=None):
+        self.nom = nom
+        self.vecteur = vecteur
+        self.calcul = calcul  # résultat du calculateur du domaine (voir `Moteur.calculer`), ou None
+        self.session = session  # celle de la première question : c'est elle qui attend son tour
+        self.attente = None  # (quota, ticket) tant que l'appel à Gemini attend dans la file
+        self.fragments = []
+        self.fin = None  # ("fin",), ("aucun",) ou ("erreur", exception)
+        self._abonnes = []
+
+    def abonner(self, rappel):
+        for fragment in self.fragments:
+            rappel(("fragment", fragment))
+        if self.fin:
+            rappel(self.fin)
+        else:
+            self._abonnes.append(rappel)
+
+    def publier(self, fragment):
+        self.fragments.append(fragment)
+        for rappel in self._abonnes:
+            rappel(("fragment", fragment))
+
+    def position(self):
+        attente = self.attente
+        return attente[0].position(attente[1]) if attente else None
+
+    def terminer(self, evenement):
+        self.fin = evenement
+        for rappel in self._abonnes:
+            rappel(evenement)
+        self._abonnes.clear()
+
+
+class Pipeline:
+    def __init__(self, moteur, nb_workers=None, seuil=None):
+        self.moteur = moteur
+        self.seuil = seuil or float(os.environ.get("CACHE_REPONSES_SEUIL", "0.95"))
+        self.executeur = ThreadPoolExecutor(
+            max_workers=nb_workers or int(os.environ.get("PIPELINE_WORKERS", "16")),
+            thread_name_prefix="pipeline",
+        )
+        self.en_vol = {}  # (domaine, question normalisée) -> Diffusion
+        self.coalescees = 0  # requêtes servies par une génération déjà en cours
+        self.boucle = asyncio.new_event_loop()
+        threading.Thread(target=self.boucle.run_forever, name="pipeline-asyncio", daemon=True).start()
+
+    # --- API synchrone (threads Streamlit) ---
+    def repondre(self, nom, question, session=None, en_attente=None, calcul=None):
+        """
+        Itérateur bloquant des fragments de la réponse, ou None si aucun extrait
+        n'a été trouvé. Les erreurs de génération sont relevées pendant l'itération.
+        En attendant le premier fragment, `en_attente` reçoit la position dans la file du quota.
+        Une question chiffrée (`calcul`) n'est regroupée qu'avec la même question, au texte près.
+        """
+        file = queue.Queue()
+        diffusion = asyncio.run_coroutine_threadsafe(
+            self._abonner(nom, question, file.put_nowait, session, calcul), self.boucle
+        ).result()
+
+        if en_attente is None:
+            premier = file.get()
+        else:
+            # Appelé depuis le thread de l'appelant (thread du script Streamlit) : il peut afficher
+            position = None
+            while True:
+                try:
+                    premier = file.get(timeout=SUIVI_FILE)
+                    break
+                except queue.Empty:
+                    if diffusion.position() != position:
+                        position = diffusion.position()
+                        en_attente(position)
+            if position is not None:
+                en_attente(None)
+        if premier[0] == "aucun":
+            return None
+        if premier[0] == "erreur":
+            raise premier[1]
+
+        def fragments():
+            evenement = premier
+            while evenement[0] == "fragment":
+                yield evenement[1]
+                evenement = file.get()
+            if evenement[0] == "erreur":
+                raise evenement[1]
+
+        return fragments()
+
+    # --- Boucle asyncio ---
+    async def _abonner(self, nom, question, rappel, session=None, calcul=None):
+        cle = (nom, normaliser_question(question))
+        diffusion = self.en_vol.get(cle)
+        if diffusion is None:
+            # Embedding de la question (souvent déjà en cache) pour reconnaître une
+            # formulation quasi identique d'une question en cours de traitement
+            q_vec = await self.boucle.run_in_executor(
+                self.executeur, self.moteur.vectoriser_requete, DOMAINES[nom].modele_embedding, question, nom
+            )
+            diffusion = self.en_vol.get(cle)
+            if diffusion is None and calcul is None:
+                diffusion = self._proche_en_vol(nom, q_vec)
+            if diffusion is None:
+                diffusion = self.en_vol[cle] = Diffusion(nom, q_vec, session, calcul)
+                self.boucle.create_task(self._produire(cle, diffusion, question))
+                diffusion.abonner(rappel)
+                return diffusion
+        self.coalescees += 1
+        metriques.compter_question(nom, "regroupee")
+        journal.info("[%s] question regroupée avec une génération en cours", nom)
+        diffusion.abonner(rappel)
+        return diffusion
+
+    def _proche_en_vol(self, nom, q_vec):
+        q = np.asarray(q_vec, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        for diffusion in self.en_vol.values():
+            # Une génération enrichie d'un calcul ne vaut que pour ses propres montants
+            if diffusion.nom != nom or diffusion.calcul is not None:
+                continue
+            v = np.asarray(diffusion.vecteur, dtype=np.float32)
+            if float(q @ v) / (np.linalg.norm(v) or 1.0) >= self.seuil:
+                return diffusion
+        return None
+
+    async def _produire(self, cle, diffusion, question):
+        nom = diffusion.nom
+        try:
+            preparation = await self.boucle.run_in_executor(self.executeur, self._preparer, diffusion, question)
+            if preparation is None:
+                metriques.compter_question(nom, "aucun_extrait")
+                diffusion.terminer(("aucun",))
+                return
+            genre, valeur = preparation
+            metriques.compter_question(nom, genre)
+            if genre == "cache":
+                diffusion.publier(valeur)
+            else:
+                try:
+                    await self.boucle.run_in_executor(self.executeur, self._pomper, nom, valeur, diffusion)
+                except resilience.GeminiIndisponible as e:
+                    # Rien n'a encore été affiché : mode dégradé plutôt qu'une erreur (jamais mis en cache)
+                    if diffusion.fragments:
+                        raise
+                    await self._secourir(diffusion, question, e)
+                else:
+                    if diffusion.calcul is None:
+                        # Les réponses chiffrées ne sont pas mises en cache (voir `Moteur.preparer`)
+                        await self.boucle.run_in_executor(
+                            self.executeur, self.moteur.memoriser_reponse, nom, question, "".join(diffusion.fragments)
+                        )
+            diffusion.terminer(("fin",))
+        except Exception as e:
+            metriques.compter_question(nom, "erreur")
+            diffusion.terminer(("erreur", e))
+        finally:
+            self.en_vol.pop(cle, None)
+
+    async def _secourir(self, diffusion, question, erreur):
+        journal.warning("[%s] Gemini indisponible (%s) : réponse de secours", diffusion.nom, erreur)
+        secours = await self.boucle.run_in_executor(
+            self.executeur, self.moteur.reponse_de_secours, diffusion.nom, question, diffusion.calcul
+        )
+        if secours is None:
+            raise erreur
+        metriques.compter_question(diffusion.nom, "secours")
+        diffusion.publier(secours)
+
+    def _preparer(self, diffusion, question):
+        with ordonnanceur.demande(diffusion.nom, diffusion.session, suivi=diffusion):
+            return self.moteur.preparer(diffusion.nom, question, diffusion.calcul)
+
+    def _pomper(self, nom, prompt, diffusion):
+        # Exécuté dans un thread du pool : chaque fragment est republié sur la boucle
+        with ordonnanceur.demande(nom, diffusion.session, suivi=diffusion):
+            for fragment in self.moteur.generer_fragments(nom, prompt):
+                self.boucle.call_soon_threadsafe(diffusion.publier, fragment)
@@ -0,0 +1,238 @@
+"""
+Index en mémoire, sans ChromaDB : recherche exacte par un seul produit
+matrice-vecteur (float32 contigu, vecteurs normalisés), fusionnée avec un index
+BM25 pour les termes exacts (PMSS, TMI, ARE, SJR...).
+
+Pour quelques dizaines ou milliers d'extraits, c'est plus rapide que HNSW + SQLite
+et la dépendance à ChromaDB (et au correctif pysqlite3) disparaît.
+Activé avec MOTEUR_INDEX=numpy.
+"""
+import json
+import math
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+
+from .cache import normaliser_question
+
+K_RRF = 60  # Constante de la fusion par rangs réciproques (valeur usuelle)
+# Ingestion en masse : ajouts publiés (instantané, BM25, .npz) au plus toutes les N secondes
+PUBLICATION = float(os.environ.get("INDEX_PUBLICATION", "30"))
+
+
+def tokeniser(texte):
+    return [mot for mot in normaliser_question(texte).split() if len(mot) > 1 or mot.isdigit()]
+
+
+class BM25:
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.n = len(documents)
+        tokens = [tokeniser(doc) for doc in documents]
+        self.longueurs = np.array([len(t) for t in tokens], dtype=np.float32)
+        self.longueur_moyenne = float(self.longueurs.mean()) if self.n else 0.0
+        # Index inversé : mot -> (indices des documents, fréquences)
+        postings = defaultdict(lambda: ([], []))
+        for i, mots in enumerate(tokens):
+            for mot, tf in Counter(mots).items():
+                postings[mot][0].append(i)
+                postings[mot][1].append(tf)
+        self.postings = {
+            mot: (np.array(idx, dtype=np.int32), np.array(tf, dtype=np.float32))
+            for mot, (idx, tf) in postings.items()
+        }
+
+    def etendre(self, documents):
+        """Nouvel index avec `documents` ajoutés à la suite : seuls ces documents sont tokenisés."""
+        ajout = BM25(documents, self.k1, self.b)
+        etendu = BM25([], self.k1, self.b)
+        etendu.n = self.n + ajout.n
+        etendu.longueurs = np.concatenate([self.longueurs, ajout.longueurs])
+        etendu.longueur_moyenne = float(etendu.longueurs.mean()) if etendu.n else 0.0
+        etendu.postings = dict(self.postings)
+        for mot, (idx, tf) in ajout.postings.items():
+            idx = idx + np.int32(self.n)
+            if mot in etendu.postings:
+                anciens_idx, anciens_tf = etendu.postings[mot]
+                idx, tf = np.concatenate([anciens_idx, idx]), np.concatenate([anciens_tf, tf])
+            etendu.postings[mot] = (idx, tf)
+        return etendu
+
+    def scores(self, question):
+        scores = np.zeros(self.n, dtype=np.float32)
+        if not self.n:
+            return scores
+        for mot in set(tokeniser(question)):
+            if mot not in self.postings:
+                continue
+            idx, tf = self.postings[mot]
+            idf = math.log(1 + (self.n - len(idx) + 0.5) / (len(idx) + 0.5))
+            norme = self.k1 * (1 - self.b + self.b * self.longueurs[idx] / self.longueur_moyenne)
+            scores[idx] += idf * tf * (self.k1 + 1) / (tf + norme)
+        return scores
+
+
+def _rangs(scores):
+    """Rang (0 = meilleur) de chaque document pour ces scores."""
+    rangs = np.empty(len(scores), dtype=np.int64)
+    rangs[np.argsort(-scores, kind="stable")] = np.arange(len(scores))
+    return rangs
+
+
+class _Instantane:
+    """État immuable de l'index : les recherches en cours ne voient jamais une mise à jour partielle."""
+
+    def __init__(self, ids, documents, metadatas, matrice, bm25=None):
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.matrice = matrice
+        self.bm25 = bm25 if bm25 is not None else BM25(documents)
+        self.positions = {id_doc: i for i, id_doc in enumerate(ids)}
+
+
+def _normaliser_lignes(matrice, dtype=np.float32):
+    normes = np.linalg.norm(matrice, axis=1, keepdims=True)
+    normes[normes == 0] = 1.0
+    return np.ascontiguousarray(matrice / normes, dtype=dtype)
+
+
+class IndexNumpy:
+    """
+    Même interface que la collection ChromaDB utilisée par `index.synchroniser`
+    (get / add / delete / count), plus `rechercher`. Sauvegardé dans un .npz.
+    `dtype="float16"` divise par deux la mémoire des vecteurs (les scores restent en float32).
+    """
+
+    def __init__(self, chemin=None, dtype="float32"):
+        self.chemin = chemin
+        self.dtype = np.dtype(dtype)
+        self._verrou = threading.Lock()
+        self._etat = _Instantane([], [], [], np.zeros((0, 0), dtype=self.dtype))
+        self._en_attente = None  # ajouts pas encore publiés, pendant `par_lots`
+        if chemin and os.path.exists(chemin):
+            self._lire()
+
+    # --- Interface commune avec ChromaDB ---
+    def count(self):
+        return len(self._etat.ids)
+
+    def get(self, ids=None, include=None):
+        etat = self._etat
+        if ids is None:
+            return {"ids": list(etat.ids)}
+        return {"ids": [i for i in ids if i in etat.positions]}
+
+    def add(self, ids, documents, embeddings, metadatas=None):
+        nouveaux = _normaliser_lignes(np.asarray(embeddings, dtype=np.float32), self.dtype)
+        metadatas = metadatas or [{} for _ in ids]
+        with self._verrou:
+            if self._en_attente is not None:
+                attente = self._en_attente
+                attente["ids"] += ids
+                attente["documents"] += documents
+                attente["metadatas"] += metadatas
+                attente["matrices"].append(nouveaux)
+                if time.monotonic() - attente["publie"] >= attente["periode"]:
+                    self._publier()
+                return
+            etat = self._etat
+            matrice = nouveaux if not etat.ids else np.vstack([etat.matrice, nouveaux])
+            self._etat = _Instantane(
+                etat.ids + list(ids), etat.documents + list(documents), etat.metadatas + list(metadatas),
+                np.ascontiguousarray(matrice), etat.bm25.etendre(list(documents)),
+            )
+            self._ecrire()
+
+    def delete(self, ids):
+        with self._verrou:
+            # Pendant `par_lots`, les ajouts en attente sont publiés avec les suppressions
+            self._publier(set(ids))
+
+    @contextmanager
+    def par_lots(self, periode=PUBLICATION):
+        """
+        Ingestion en masse (voir `index.synchroniser`) : les ajouts s'accumulent et sont
+        publiés en une fois au plus toutes les `periode` secondes, puis à la sortie du bloc,
+        au lieu de recopier la matrice, refaire BM25 et réécrire le .npz à chaque lot.
+        """
+        with self._verrou:
+            self._en_attente = {"ids": [], "documents": [], "metadatas": [], "matrices": [],
+                                "periode": periode, "publie": time.monotonic()}
+        try:
+            yield self
+        finally:
+            with self._verrou:
+                self._publier()
+                self._en_attente = None
+
+    def _publier(self, supprimer=None):
+        # Appelé sous `_verrou` : ajouts en attente et suppressions forment un seul instantané
+        attente = self._en_attente or {"ids": [], "documents": [], "metadatas": [], "matrices": []}
+        if not attente["ids"] and not supprimer:
+            return
+        etat = self._etat
+        if supprimer:
+            garder = [i for i, id_doc in enumerate(etat.ids) if id_doc not in supprimer]
+            ids, documents = [etat.ids[i] for i in garder], [etat.documents[i] for i in garder]
+            metadatas, matrices = [etat.metadatas[i] for i in garder], [etat.matrice[garder]]
+            bm25 = None  # reconstruit par `_Instantane`
+        else:
+            ids, documents, metadatas = etat.ids, etat.documents, etat.metadatas
+            matrices = [etat.matrice] if etat.ids else []
+            bm25 = etat.bm25.etendre(attente["documents"])
+        if attente["ids"]:
+            matrices = [m for m in matrices if len(m)] + attente["matrices"]
+        self._etat = _Instantane(
+            ids + attente["ids"], documents + attente["documents"], metadatas + attente["metadatas"],
+            np.ascontiguousarray(np.vstack(matrices)), bm25,
+        )
+        attente.update(ids=[], documents=[], metadatas=[], matrices=[], publie=time.monotonic())
+        self._ecrire()
+
+    # --- Recherche hybride ---
+    def rechercher(self, vecteur, question, k):
+        """Top-k exact (cosinus) fusionné avec BM25 par rangs réciproques. Renvoie les textes."""
+        etat = self._etat
+        if not etat.ids:
+            return []
+        q = np.asarray(vecteur, dtype=np.float32)
+        q = (q / (np.linalg.norm(q) or 1.0)).astype(etat.matrice.dtype)
+        denses = (etat.matrice @ q).astype(np.float32)
+        lexicaux = etat.bm25.scores(question)
+
+        fusion = 1.0 / (K_RRF + _rangs(denses))
+        # Un document sans aucun mot commun avec la question n'a pas de rang lexical
+        pertinents = lexicaux > 0
+        fusion[pertinents] += 1.0 / (K_RRF + _rangs(lexicaux)[pertinents])
+
+        k = min(k, len(etat.ids))
+        meilleurs = np.argpartition(-fusion, k - 1)[:k]
+        meilleurs = meilleurs[np.argsort(-fusion[meilleurs])]
+        return [etat.documents[i] for i in meilleurs]
+
+    # --- Sauvegarde ---
+    def _lire(self):
+        with np.load(self.chemin, allow_pickle=False) as donnees:
+            textes = json.loads(str(donnees["textes"]))
+            self._etat = _Instantane(
+                textes["ids"], textes["documents"], textes["metadatas"],
+                np.ascontiguousarray(donnees["matrice"], dtype=self.dtype),
+            )
+
+    def _ecrire(self):
+        if not self.chemin:
+            return
+        etat = self._etat
+        textes = json.dumps(
+            {"ids": etat.ids, "documents": etat.documents, "metadatas": etat.metadatas}, ensure_ascii=False
+        )
+        os.makedirs(os.path.dirname(self.chemin), exist_ok=True)
+        temporaire = f"{self.chemin}.{os.getpid()}.tmp.npz"
+        np.savez(temporaire, matrice=etat.matrice, textes=np.array(textes))
+        os.replace(temporaire, self.chemin)
@@ -0,0 +1,276 @@
+"""
+Appels aux API Google bornés dans le temps : une session ne reste jamais bloquée
+par une réponse lente ou un service saturé.
+
+- Échéance par appel (et, en streaming, pour le premier fragment puis entre deux fragments).
+- Requête couverte (« hedging ») : si la première tentative dépasse le 95e centile des
+  latences récentes, une seconde part en parallèle et la plus rapide l'emporte.
+- Reprises bornées avec gigue (« full jitter »), seulement pour les erreurs transitoires
+  et tant que l'échéance le permet.
+- Quota (voir `moteur.ordonnanceur`) : chaque requête envoyée au service, reprise ou
+  couverture comprise, prend son propre tour dans la file ; une couverture n'est lancée
+  que si un tour est libre tout de suite.
+- Disjoncteur : après `seuil` échecs consécutifs, les appels sont refusés pendant `pause`
+  secondes (erreur immédiate `CircuitOuvert`), puis un seul appel d'essai est autorisé.
+
+Un appel abandonné (échéance dépassée, requête couverte perdante) ne peut pas être
+interrompu : il se termine en arrière-plan dans le pool de threads, sans être attendu.
+"""
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeout
+
+from . import metriques
+
+journal = logging.getLogger(__name__)
+
+# Erreurs transitoires (par nom, pour ne pas importer google.api_core au chargement)
+ERREURS_TRANSITOIRES = {
+    "ServiceUnavailable", "ResourceExhausted", "TooManyRequests", "DeadlineExceeded",
+    "InternalServerError", "GatewayTimeout", "Aborted", "ErreurSimulee",
+}
+
+
+class GeminiIndisponible(RuntimeError):
+    """Le service n'a pas répondu à temps ou est en panne : les apps passent en mode dégradé."""
+
+
+class DelaiDepasse(GeminiIndisponible, TimeoutError):
+    pass
+
+
+class AttenteQuotaDepassee(DelaiDepasse):
+    """Échéance atteinte dans notre propre file du quota : le service n'y est pour rien (disjoncteur intact)."""
+
+
+class CircuitOuvert(GeminiIndisponible):
+    pass
+
+
+class EchecsRepetes(GeminiIndisponible):
+    pass
+
+
+def transitoire(erreur):
+    return isinstance(erreur, (TimeoutError, ConnectionError)) or type(erreur).__name__ in ERREURS_TRANSITOIRES
+
+
+class Disjoncteur:
+    def __init__(self, nom, seuil=5, pause=30.0):
+        self.nom = nom
+        self.seuil = seuil
+        self.pause = pause
+        self.etat = "ferme"
+        self._echecs = 0
+        self._ouvert_depuis = 0.0
+        self._essai_en_cours = False
+        self._verrou = threading.Lock()
+
+    def autoriser(self):
+        with self._verrou:
+            if self.etat == "ouvert" and time.monotonic() - self._ouvert_depuis >= self.pause:
+                self.etat = "demi-ouvert"
+                self._essai_en_cours = False
+            if self.etat == "demi-ouvert":
+                # Un seul appel d'essai à la fois
+                if self._essai_en_cours:
+                    return False
+                self._essai_en_cours = True
+                return True
+            return self.etat == "ferme"
+
+    def succes(self):
+        with self._verrou:
+            if self.etat != "ferme":
+                journal.info("Disjoncteur %s refermé", self.nom)
+            self.etat = "ferme"
+            self._echecs = 0
+
+    def abandonner(self):
+        """Appel autorisé mais jamais envoyé : libère l'essai du demi-ouvert, sans verdict."""
+        with self._verrou:
+            self._essai_en_cours = False
+
+    def echec(self):
+        with self._verrou:
+            self._echecs += 1
+            if self.etat == "demi-ouvert" or (self.etat == "ferme" and self._echecs >= self.seuil):
+                journal.warning("Disjoncteur %s ouvert pour %.0f s après %d échecs", self.nom, self.pause, self._echecs)
+                self.etat = "ouvert"
+                self._ouvert_depuis = time.monotonic()
+
+
+_pool = ThreadPoolExecutor(max_workers=int(os.environ.get("RESILIENCE_WORKERS", "32")), thread_name_prefix="amont")
+_FIN = object()
+
+
+class ClientResilient:
+    """Exécute les appels vers un service amont (`nom`) avec échéance, couverture, reprises et disjoncteur."""
+
+    def __init__(self, nom, delai, tentatives=3, couverture_initiale=2.0, couverture_min=0.2,
+                 pause_initiale=0.25, pause_max=4.0, seuil_disjoncteur=5, pause_disjoncteur=30.0):
+        self.nom = nom
+        self.delai = delai
+        self.tentatives = tentatives
+        self.couverture_initiale = couverture_initiale
+        self.couverture_min = couverture_min
+        self.pause_initiale = pause_initiale
+        self.pause_max = pause_max
+        self.disjoncteur = Disjoncteur(nom, seuil_disjoncteur, pause_disjoncteur)
+        self._latences = deque(maxlen=200)
+
+    def seuil_couverture(self):
+        """95e centile des latences récentes (valeur initiale tant qu'il y a moins de 20 mesures)."""
+        latences = sorted(self._latences)
+        if len(latences) < 20:
+            return self.couverture_initiale
+        return max(self.couverture_min, latences[int(len(latences) * 0.95) - 1])
+
+    def _compter(self, resultat):
+        metriques.compter_amont(self.nom, resultat)
+
+    def _tenter(self, fonction, echeance, couvrir, quota=None, jetons=0, servi=False):
+        """
+        Une tentative, couverte au besoin par une seconde requête ; renvoie le premier succès.
+        `servi` : le tour de la première requête a déjà été pris dans `quota`.
+        """
+        if quota is not None and not servi:
+            quota.acquerir(jetons)
+            if time.monotonic() >= echeance:
+                self._compter("delai")
+                raise AttenteQuotaDepassee(f"{self.nom} : échéance dépassée dans la file du quota")
+        debut = time.monotonic()
+        futurs = [_pool.submit(fonction)]
+        erreur = None
+        try:
+            if couvrir:
+                try:
+                    next(as_completed(futurs, timeout=max(min(self.seuil_couverture(), echeance - debut), 0)))
+                except FuturesTimeout:
+                    # La couverture ne double pas la file : sans tour libre, on attend la première requête
+                    if time.monotonic() < echeance and (quota is None or quota.essayer(jetons)):
+                        self._compter("couverture")
+                        futurs.append(_pool.submit(fonction))
+            for futur in as_completed(futurs, timeout=max(echeance - time.monotonic(), 0)):
+                if futur.exception() is None:
+                    self._latences.append(time.monotonic() - debut)
+                    return futur.result()
+                erreur = futur.exception()
+        except FuturesTimeout:
+            self._compter("delai")
+            raise DelaiDepasse(f"{self.nom} : pas de réponse en {echeance - debut:.1f} s") from None
+        raise erreur
+
+    def appeler(self, fonction, delai=None, tentatives=None, couvrir=True, quota=None, jetons=0):
+        """
+        Renvoie `fonction()` ; lève `GeminiIndisponible` (ou l'erreur non transitoire d'origine).
+        Avec `quota`, chaque requête envoyée réserve un tour et `jetons` tokens ; l'attente
+        du premier tour ne compte pas dans l'échéance.
+        """
+        echeance = None
+        tentatives = tentatives or self.tentatives
+        for essai in range(tentatives):
+            if not self.disjoncteur.autoriser():
+                self._compter("circuit_ouvert")
+                raise CircuitOuvert(f"{self.nom} : service suspendu après des échecs répétés")
+            servi = echeance is None and quota is not None
+            if servi:
+                quota.acquerir(jetons)
+            if echeance is None:
+                echeance = time.monotonic() + (delai or self.delai)
+            try:
+                resultat = self._tenter(fonction, echeance, couvrir, quota, jetons, servi)
+            except AttenteQuotaDepassee:
+                self.disjoncteur.abandonner()
+                raise
+            except DelaiDepasse:
+                self.disjoncteur.echec()
+                raise
+            except Exception as e:
+                if not transitoire(e):
+                    # Le service a répondu (clé invalide, requête refusée...) : il n'est pas en panne
+                    self.disjoncteur.succes()
+                    raise
+                self.disjoncteur.echec()
+                self._compter("erreur")
+                pause = random.uniform(0, min(self.pause_max, self.pause_initiale * 2 ** essai))
+                if essai == tentatives - 1 or time.monotonic() + pause >= echeance:
+                    raise EchecsRepetes(f"{self.nom} : {e}") from e
+                journal.warning("%s : %s, nouvel essai dans %.2f s", self.nom, e, pause)
+                time.sleep(pause)
+            else:
+                self.disjoncteur.succes()
+                self._compter("succes")
+                return resultat
+
+    def flux(self, ouvrir, delai_premier, delai_inactivite, delai=None, quota=None, jetons=0):
+        """
+        Itérateur borné sur un flux : `ouvrir()` renvoie un itérable (réponse en streaming).
+        L'obtention du premier élément est couverte et reprise comme un appel simple ;
+        ensuite, l'itération échoue si un élément tarde plus de `delai_inactivite`.
+        """
+        debut = time.monotonic()
+        echeance = debut + (delai or self.delai)
+
+        def premier():
+            iterateur = iter(ouvrir())
+            return next(iterateur, _FIN), iterateur
+
+        element, iterateur = self.appeler(premier, delai=delai_premier, quota=quota, jetons=jetons)
+        if element is _FIN:
+            return
+        yield element
+
+        file = queue.Queue()
+
+        def pomper():
+            try:
+                for e in iterateur:
+                    file.put(("element", e))
+                file.put(("fin", None))
+            except Exception as e:
+                file.put(("erreur", e))
+
+        _pool.submit(pomper)
+        while True:
+            reste = echeance - time.monotonic()
+            try:
+                genre, valeur = file.get(timeout=max(min(delai_inactivite, reste), 0))
+            except queue.Empty:
+                self.disjoncteur.echec()
+                self._compter("delai")
+                raise DelaiDepasse(f"{self.nom} : flux interrompu après {time.monotonic() - debut:.1f} s") from None
+            if genre == "fin":
+                return
+            if genre == "erreur":
+                if transitoire(valeur):
+                    self.disjoncteur.echec()
+                    raise EchecsRepetes(f"{self.nom} : {valeur}") from valeur
+                raise valeur
+            yield valeur
+
+
+# Un client par service amont, partagé par tout le processus
+generation = ClientResilient(
+    "generation",
+    delai=float(os.environ.get("GEMINI_DELAI", "60")),
+    couverture_initiale=float(os.environ.get("GEMINI_COUVERTURE_INITIALE", "3.0")),
+    seuil_disjoncteur=int(os.environ.get("GEMINI_DISJONCTEUR_SEUIL", "5")),
+    pause_disjoncteur=float(os.environ.get("GEMINI_DISJONCTEUR_PAUSE", "30")),
+)
+DELAI_PREMIER_FRAGMENT = float(os.environ.get("GEMINI_DELAI_PREMIER_FRAGMENT", "15"))
+DELAI_INACTIVITE = float(os.environ.get("GEMINI_DELAI_INACTIVITE", "10"))
+
+embeddings = ClientResilient(
+    "embeddings",
+    delai=float(os.environ.get("EMBEDDINGS_DELAI", "10")),
+    couverture_initiale=float(os.environ.get("EMBEDDINGS_COUVERTURE_INITIALE", "1.0")),
+    seuil_disjoncteur=int(os.environ.get("EMBEDDINGS_DISJONCTEUR_SEUIL", "5")),
+    pause_disjoncteur=float(os.environ.get("EMBEDDINGS_DISJONCTEUR_PAUSE", "30")),
+)
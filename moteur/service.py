@@ -0,0 +1,258 @@
+"""
+Service HTTP du moteur (ASGI, sans framework) : le parcours d'une question des cinq
+assistants, accessible à d'autres interfaces que Streamlit et déployable en plusieurs
+instances derrière un répartiteur de charge.
+
+    python -m moteur.service --port 8000            # uvicorn, s'il est installé
+    uvicorn moteur.service:application --workers 4  # ou tout autre serveur ASGI
+
+- POST /ask      {"domaine": "impots", "question": "...", "session": "..."} : réponse en
+                 Server-Sent Events (`attente` avec la position dans la file du quota Gemini,
+                 `fragment` au fil de la génération, puis `fin`, `aucun` ou `erreur`) ;
+- POST /ask_many {"domaine": "impots", "questions": [...]} : réponses complètes en JSON ;
+- GET  /healthz  : le processus répond (vivacité) ;
+- GET  /readyz   : index des domaines prêts (503 sinon ; `?domaine=impots` pour un seul) ;
+- GET  /metrics  : métriques Prometheus (voir `moteur.metriques`).
+
+Les pages Streamlit deviennent des clients de ce service quand MOTEUR_API_URL est
+défini (voir `moteur.client`). La clé Gemini du service est lue dans $GOOGLE_API_KEY.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from urllib.parse import parse_qs
+
+from . import api_google, metriques
+from .coeur import obtenir_moteur
+from .domaines import DOMAINES
+
+journal = logging.getLogger(__name__)
+
+TAILLE_CORPS_MAX = int(os.environ.get("SERVICE_TAILLE_CORPS_MAX", str(64 * 1024)))
+LOT_MAX = int(os.environ.get("SERVICE_LOT_MAX", "32"))
+# Domaines servis par cette instance (tous par défaut), préchauffés au démarrage
+SERVIS = [nom for nom in os.environ.get("SERVICE_DOMAINES", ",".join(DOMAINES)).split(",") if nom in DOMAINES]
+
+_FIN = object()
+
+
+class ErreurRequete(Exception):
+    def __init__(self, statut, message):
+        super().__init__(message)
+        self.statut = statut
+
+
+# --- Réponses HTTP ---
+async def _envoyer_json(send, statut, corps):
+    donnees = json.dumps(corps, ensure_ascii=False).encode("utf-8")
+    await send({"type": "http.response.start", "status": statut, "headers": [
+        (b"content-type", b"application/json; charset=utf-8"), (b"content-length", str(len(donnees)).encode()),
+    ]})
+    await send({"type": "http.response.body", "body": donnees})
+
+
+def _evenement_sse(genre, donnees):
+    return f"event: {genre}\ndata: {json.dumps(donnees, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+async def _lire_json(receive):
+    corps = b""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise ErreurRequete(400, "connexion interrompue")
+        corps += message.get("body", b"")
+        if len(corps) > TAILLE_CORPS_MAX:
+            raise ErreurRequete(413, f"corps de requête limité à {TAILLE_CORPS_MAX} octets")
+        if not message.get("more_body"):
+            break
+    try:
+        return json.loads(corps or b"{}")
+    except ValueError:
+        raise ErreurRequete(400, "corps JSON invalide")
+
+
+def _domaine(requete):
+    nom = requete.get("domaine")
+    if nom not in SERVIS:
+        raise ErreurRequete(404, f"domaine inconnu ou non servi : {nom!r}")
+    return nom
+
+
+def _question(texte):
+    if not isinstance(texte, str) or not texte.strip():
+        raise ErreurRequete(400, "question manquante")
+    return texte
+
+
+# --- Parcours d'une question ---
+def _preparer(nom):
+    """Attend l'index du domaine (préchauffé au démarrage) ; False si le domaine n'a aucune fiche."""
+    return obtenir_moteur(distant=False).attendre(nom) is not None
+
+
+def _repondre_complet(nom, question, session=None):
+    """Réponse entière (ou None), pour /ask_many ; les erreurs sont rendues avec leur référence."""
+    try:
+        if not _preparer(nom):
+            return {"reponse": None}
+        fragments = obtenir_moteur(distant=False).repondre(nom, question, session=session)
+        return {"reponse": None if fragments is None else "".join(fragments)}
+    except Exception as e:
+        return {"reponse": None, "erreur": str(e), "reference": metriques.signaler_erreur("question", nom, e)}
+
+
+async def _ask(scope, receive, send):
+    requete = await _lire_json(receive)
+    nom, question = _domaine(requete), _question(requete.get("question"))
+
+    await send({"type": "http.response.start", "status": 200, "headers": [
+        (b"content-type", b"text/event-stream; charset=utf-8"), (b"cache-control", b"no-cache"),
+        (b"x-accel-buffering", b"no"),  # pas de mise en tampon par un proxy nginx
+    ]})
+
+    async def envoyer(genre, donnees, fin=False):
+        await send({"type": "http.response.body", "body": _evenement_sse(genre, donnees), "more_body": not fin})
+
+    boucle = asyncio.get_running_loop()
+
+    def en_attente(position):
+        # Appelé depuis le thread qui attend le premier fragment
+        asyncio.run_coroutine_threadsafe(envoyer("attente", {"position": position}), boucle).result()
+
+    def repondre():
+        if not _preparer(nom):
+            return None
+        return obtenir_moteur(distant=False).repondre(
+            nom, question, stream=True, session=requete.get("session"), en_attente=en_attente
+        )
+
+    try:
+        fragments = await asyncio.to_thread(repondre)
+        if fragments is None:
+            await envoyer("aucun", {}, fin=True)
+            return
+        # Un fragment à la fois dans un thread : si le client se déconnecte, l'envoi échoue et on s'arrête
+        while (fragment := await asyncio.to_thread(next, fragments, _FIN)) is not _FIN:
+            await envoyer("fragment", {"texte": fragment})
+        await envoyer("fin", {}, fin=True)
+    except OSError:
+        journal.info("[%s] client déconnecté pendant la réponse", nom)
+    except Exception as e:
+        await envoyer("erreur", {"message": str(e), "reference": metriques.signaler_erreur("question", nom, e)},
+                      fin=True)
+
+
+async def _ask_many(scope, receive, send):
+    requete = await _lire_json(receive)
+    nom, questions = _domaine(requete), requete.get("questions")
+    if not isinstance(questions, list) or not questions:
+        raise ErreurRequete(400, "liste de questions manquante")
+    if len(questions) > LOT_MAX:
+        raise ErreurRequete(413, f"{LOT_MAX} questions au plus par requête")
+    questions = [_question(q) for q in questions]
+    # Questions traitées en parallèle ; les doublons n'appellent Gemini qu'une fois (voir moteur.pipeline)
+    reponses = await asyncio.gather(
+        *(asyncio.to_thread(_repondre_complet, nom, q, requete.get("session")) for q in questions)
+    )
+    await _envoyer_json(send, 200, {"domaine": nom, "reponses": reponses})
+
+
+def etat_des_domaines(noms):
+    """État de l'index de chaque domaine, au format de `Moteur.etats` (durées relatives)."""
+    moteur = obtenir_moteur(distant=False)
+    etats = {}
+    for nom in noms:
+        etat = dict(moteur.etats[nom])
+        # `debut` est une horloge propre au processus : le client reçoit le temps écoulé
+        debut = etat.pop("debut", None)
+        if debut is not None and "duree" not in etat:
+            etat["ecoule"] = time.perf_counter() - debut
+        etat["premier_fragment"] = moteur.stats_premier_fragment(nom)
+        etats[nom] = etat
+    return etats
+
+
+async def _healthz(scope, receive, send):
+    await _envoyer_json(send, 200, {"statut": "ok"})
+
+
+async def _readyz(scope, receive, send):
+    demandes = parse_qs(scope.get("query_string", b"").decode()).get("domaine") or SERVIS
+    if any(nom not in SERVIS for nom in demandes):
+        raise ErreurRequete(404, "domaine inconnu ou non servi")
+    etats = etat_des_domaines(demandes)
+    pret = all(etat["etat"] == "pret" for etat in etats.values())
+    await _envoyer_json(send, 200 if pret else 503, {"pret": pret, "domaines": etats})
+
+
+async def _metrics(scope, receive, send):
+    corps = metriques.registre.exposer().encode("utf-8")
+    await send({"type": "http.response.start", "status": 200, "headers": [
+        (b"content-type", b"text/plain; version=0.0.4; charset=utf-8"),
+    ]})
+    await send({"type": "http.response.body", "body": corps})
+
+
+ROUTES = {
+    ("POST", "/ask"): _ask,
+    ("POST", "/ask_many"): _ask_many,
+    ("GET", "/healthz"): _healthz,
+    ("GET", "/readyz"): _readyz,
+    ("GET", "/metrics"): _metrics,
+}
+
+
+def demarrer():
+    """Préchauffage des index servis, dès le démarrage de l'instance (et non à la première question)."""
+    if os.environ.get("GOOGLE_API_KEY"):
+        api_google.configurer(os.environ["GOOGLE_API_KEY"])
+    moteur = obtenir_moteur(distant=False)
+    for nom in SERVIS:
+        moteur.prechauffer(nom)
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                demarrer()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    chemin = scope["path"].rstrip("/") or "/"
+    try:
+        traitement = ROUTES.get((scope["method"], chemin))
+        if traitement is None:
+            connu = any(chemin == route for _, route in ROUTES)
+            raise ErreurRequete(405 if connu else 404, f"{scope['method']} {scope['path']} : route inconnue")
+        await traitement(scope, receive, send)
+    except ErreurRequete as e:
+        await _envoyer_json(send, e.statut, {"erreur": str(e)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Service HTTP du moteur des assistants")
+    parser.add_argument("--hote", default=os.environ.get("SERVICE_HOTE", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("SERVICE_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=1, help="processus (chacun avec son propre index)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s : %(message)s")
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("uvicorn n'est pas installé : pip install uvicorn (ou lancez moteur.service:application "
+                         "avec un autre serveur ASGI)")
+    uvicorn.run("moteur.service:application", host=args.hote, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
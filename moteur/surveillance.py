@@ -0,0 +1,78 @@
+"""
+Rechargement à chaud des fiches : un fil surveille les dossiers des domaines déjà
+chargés et, quand une fiche est ajoutée, modifiée ou supprimée, met l'index à jour
+sans redémarrage (`Moteur.recharger`). Seul l'index numpy bascule en une fois : avec
+ChromaDB, la modification est signalée et prise en compte au prochain démarrage.
+
+Simple scrutation des dates de modification (aucune dépendance, fonctionne aussi sur
+les volumes montés où inotify ne remonte rien). Une modification n'est prise en compte
+qu'une fois les fiches stables pendant une période : une copie en cours n'est pas indexée
+à moitié.
+
+SURVEILLANCE_PERIODE=0 désactive la surveillance.
+"""
+import logging
+import os
+import threading
+
+from . import index
+from .domaines import DOMAINES
+
+journal = logging.getLogger(__name__)
+
+PERIODE = float(os.environ.get("SURVEILLANCE_PERIODE", "5"))
+
+
+class Surveillant:
+    def __init__(self, moteur, periode=PERIODE):
+        self.moteur = moteur
+        self.periode = periode
+        self._vues = {}  # dernière signature observée par domaine, en attente de stabilité
+        self._arret = threading.Event()
+        self._fil = None
+
+    def verifier(self):
+        """Un passage de surveillance ; renvoie les domaines rechargés."""
+        recharges = []
+        for nom, signature_chargee in list(self.moteur.signatures.items()):
+            domaine = DOMAINES[nom]
+            signature = index.signature_fiches(domaine.chemin, domaine.fichiers)
+            if signature == signature_chargee:
+                self._vues.pop(nom, None)
+                continue
+            if self._vues.get(nom) != signature:
+                # Première observation du changement : on attend qu'il soit stable
+                self._vues[nom] = signature
+                continue
+            self._vues.pop(nom, None)
+            try:
+                if self.moteur.recharger(nom) is not None:
+                    recharges.append(nom)
+            except Exception:
+                # L'index en service reste intact ; nouvel essai à la prochaine modification
+                journal.exception("[%s] rechargement des fiches impossible", nom)
+                self.moteur.signatures[nom] = signature
+        return recharges
+
+    def _boucle(self):
+        while not self._arret.wait(self.periode):
+            self.verifier()
+
+    def demarrer(self):
+        if self._fil is None:
+            self._fil = threading.Thread(target=self._boucle, name="surveillance-fiches", daemon=True)
+            self._fil.start()
+
+    def arreter(self):
+        self._arret.set()
+        if self._fil is not None:
+            self._fil.join()
+
+
+def demarrer(moteur, periode=PERIODE):
+    """Lance la surveillance des fiches du moteur (sauf si la période vaut 0) ; renvoie le surveillant."""
+    if periode <= 0:
+        return None
+    surveillant = Surveillant(moteur, periode)
+    surveillant.demarrer()
+    return surveillant